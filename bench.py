@@ -0,0 +1,60 @@
+import argparse
+import json
+import sys
+
+from core.benchmark import (
+    BENCHMARKS, DEFAULT_BASELINE_FILE, DEFAULT_HISTORY_FILE, DEFAULT_MIN_SECONDS, DEFAULT_ROW_COUNTS,
+    DEFAULT_TOLERANCE, NOISE_FLOOR_SECONDS, append_history, compare, load_json, run_suite, save_json,
+)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the generators and output writers")
+    parser.add_argument('--rows', default=','.join(str(rows) for rows in DEFAULT_ROW_COUNTS),
+                        help="comma-separated row counts to run each case at")
+    parser.add_argument('--only', default='', help=f"comma-separated cases to run: {', '.join(BENCHMARKS)}")
+    parser.add_argument('--repeat', type=int, default=3, help="least runs per case; the fastest one counts")
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_SECONDS,
+                        help="seconds each case's runs must add up to, repeating short cases as needed")
+    parser.add_argument('--noise-floor', type=float, default=NOISE_FLOOR_SECONDS,
+                        help="cases faster than this many seconds are not compared on speed")
+    parser.add_argument('--history', default=DEFAULT_HISTORY_FILE, help="JSON file every run is appended to")
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE_FILE, help="JSON file of the run to compare against")
+    parser.add_argument('--save-baseline', action='store_true', help="make this run the new baseline")
+    parser.add_argument('--tolerance', type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed drop in rows/s and growth in peak memory, as a fraction")
+    args = parser.parse_args()
+
+    with open('config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    row_counts = [int(rows) for rows in args.rows.split(',') if rows]
+    names = [name for name in args.only.split(',') if name] or None
+
+    print(f"Benchmarking at {', '.join(f'{rows:,}' for rows in row_counts)} rows...")
+    run = run_suite(config, names, row_counts, max(1, args.repeat), args.min_time)
+    append_history(run, args.history)
+
+    if args.save_baseline:
+        save_json(args.baseline, run)
+        print(f"Saved baseline to {args.baseline}")
+        return 0
+
+    baseline = load_json(args.baseline, None)
+    if baseline is None:
+        print(f"No baseline at {args.baseline}; run with --save-baseline to record one")
+        return 0
+
+    regressions = compare(run, baseline, args.tolerance, args.noise_floor)
+    if regressions:
+        print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%} of the baseline:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+
+    print(f"No regressions beyond {args.tolerance:.0%} of the baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
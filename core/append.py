@@ -0,0 +1,92 @@
+import json
+import os
+import threading
+
+
+HIGH_WATER_MARKS_FILE = '.high-water-marks.json'
+
+# Tables an append extends; catalog tables are reused as they are
+APPENDABLE_TABLES = (
+    'customers', 'customer_address',
+    'sale_order_web', 'sale_order_web_items', 'sale_order_web_address',
+    'sale_order_pos', 'sale_order_pos_items',
+)
+
+
+def scan_ids(chunks):
+    """Largest id and row count of a table streamed back as row chunks"""
+    max_id = 0
+    rows = 0
+    for chunk in chunks:
+        rows += len(chunk)
+        for row in chunk:
+            if row.get('id') not in (None, ''):
+                max_id = max(max_id, int(row['id']))
+    return max_id, rows
+
+
+class HighWaterMarks:
+    """Largest id and row count of each written table, kept in a small manifest
+
+    An entry is trusted while the table's files still have the size and
+    modification time it was recorded with. Otherwise, for instance after
+    the files were edited by hand, the table's ids are scanned once and the
+    entry refreshed; an append only reads the tables it extends then.
+    """
+
+    def __init__(self, output_folder):
+        self.manifest_file = os.path.join(output_folder, HIGH_WATER_MARKS_FILE)
+        self.marks = {}
+        self.lock = threading.Lock()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        folder = os.path.dirname(self.manifest_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        temp_file = self.manifest_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.manifest_file)
+
+    def file_stamps(self, files):
+        stamps = {}
+        for path in files:
+            stat = os.stat(path)
+            stamps[path] = [stat.st_size, stat.st_mtime_ns]
+        return stamps
+
+    def get(self, table_name, files, read_chunks):
+        """(largest id, row count) of a table; read_chunks streams it back when the manifest is stale"""
+        if not files:
+            return 0, 0
+
+        with self.lock:
+            entry = self.load_manifest().get(table_name)
+        if entry and entry['files'] == self.file_stamps(files):
+            self.marks[table_name] = (entry['max_id'], entry['rows'])
+            return self.marks[table_name]
+
+        print(f"Scanning {table_name} for its last id...")
+        max_id, rows = scan_ids(read_chunks())
+        self.record(table_name, max_id, rows, files)
+        return max_id, rows
+
+    def extend(self, table_name, first_id, rows_written, files):
+        """Move a table's mark past rows appended from first_id, after get() was called for it"""
+        _, rows = self.marks.get(table_name, (0, 0))
+        self.record(table_name, first_id + rows_written - 1, rows + rows_written, files)
+
+    def record(self, table_name, max_id, rows, files):
+        """Remember a table's largest id and row count along with the current state of its files"""
+        with self.lock:
+            self.marks[table_name] = (max_id, rows)
+            manifest = self.load_manifest()
+            manifest[table_name] = {'max_id': max_id, 'rows': rows, 'files': self.file_stamps(files)}
+            self.save_manifest(manifest)
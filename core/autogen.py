@@ -1,96 +1,728 @@
-import pandas as pd
+import os
+import shutil
+from array import array
+from contextlib import ExitStack
+from functools import partial
+from core import columnar
+from core.schema import get_schema
+from core.stream import DEFAULT_CHUNK_SIZE, drain
+from core.append import APPENDABLE_TABLES, HighWaterMarks
+from core.cache import BuildCache
+from core.keys import KeyRegistry
+from core.metrics import BuildMetrics, add_rows, mark_cached, phase, timed_iter
+from core.output import CsvTableWriter, create_writer, get_writer_class
+from core.partition import TablePartitioner, merge_by_id
+from core.references import ReferenceStore
+from core.rng import append_seed
+from core.scale import apply_scale_factor, report_estimates
+from core.scheduler import StageScheduler
+from core.sharding import ShardRunner
+from core.validate import IntegrityValidator
 from core.catalog.product.simple import SimpleProductGenerator
 from core.catalog.product.configurable import ConfigurableProductGenerator
 from core.customer.entity import CustomerGenerator
 from core.customer.address import CustomerAddressGenerator
 from core.catalog.category.entity import CategoryGenerator
+from core.catalog.category.index import CategoryMatcher
 from core.catalog.category.product import CategoryProductGenerator
 from core.catalog.product.stock_inventory import StockInventoryGenerator
+from core.order.base import OrderReferences
+from core.order.events import OrderEventGenerator
+from core.order.web import WebOrderGenerator
+from core.order.pos import PosOrderGenerator
 
 
 class AutoGen:
     def __init__(self, config):
+        # With a scale_factor every table size is derived from it
+        config = apply_scale_factor(config)
         self.config = config
+        self.output_config = config.get('output', {})
+        self.writer_class = get_writer_class(self.output_config.get('format', 'csv'))
+        self.shard_runner = ShardRunner(config)
+        self.build_cache = BuildCache(config, self.output_config.get('folder', 'outputs'))
+        self.metrics = BuildMetrics(config)
+        self.high_water_marks = HighWaterMarks(self.output_config.get('folder', 'outputs'))
+        # Columns of the tables orders point at, kept so appends do not read those tables back
+        self.references = ReferenceStore(
+            self.output_config.get('folder', 'outputs'), self.high_water_mark, self.read_table)
+        self.partitioner = TablePartitioner(config)
+        self.validator = IntegrityValidator(config)
+        # Ids that upstream stages register for downstream tables to point at
+        self.keys = KeyRegistry()
+
+    def report_estimates(self):
+        """Print the expected rows and size of every table"""
+        return report_estimates(self.config)
+
+    def scheduler_workers(self):
+        workers = self.config.get('scheduler', {}).get('workers', 1)
+        if self.writer_class.shared_output:
+            # Tables written into one shared file (a database) are written one at a time
+            workers = 1
+        if self.metrics.profile:
+            # Only one profiler can be active at a time
+            workers = 1
+        return workers
+
+    def generate(self):
+        """Build every table, running stages that do not depend on each other concurrently"""
+        # Rows appended to earlier builds are replaced along with the tables
+        self.clear_appended()
+        
+        scheduler = StageScheduler(self.scheduler_workers())
+        tables = self.add_table_stages(scheduler)
+        # Cache keys chain through the same dependencies the stages wait for
+        self.build_cache.link_stages(scheduler, tables)
+        self.add_validation_stage(scheduler)
+        
+        self.metrics.start()
+        results = scheduler.run()
+        self.metrics.finish()
+        return results
+
+    def add_table_stages(self, scheduler):
+        """Schedule the stages of a full build; returns {table name: stage writing it}"""
+        measure = self.metrics.wrap
+        scheduler.add('category', measure('category', self.generate_category))
+        scheduler.add('product', measure('product', self.generate_product), needs=('category',))
+        # category_product reads the product table back, so it also waits for it
+        scheduler.add('category_product', measure('category_product', self.generate_category_product),
+                      needs=('category',), after=('product',))
+        scheduler.add('stock_inventory', measure('stock_inventory', self.generate_stock_inventory), needs=('product',))
+        scheduler.add('customers', measure('customers', self.generate_customer_entities))
+        scheduler.add('customer_address', measure('customer_address', self.generate_customer_addresses),
+                      needs=('customers',))
+        
+        generators = self.order_generators()
+        events_enabled = self.config.get('order', {}).get('events', {}).get('enable', False)
+        if generators or events_enabled:
+            stage = partial(self.load_pending_order_references, generators, events_enabled)
+            scheduler.add('order_references', measure('order_references', stage),
+                          after=('product', 'customers', 'customer_address'))
+            for generator in generators:
+                stage = measure(generator.order_table, partial(self.generate_order_tables, generator))
+                scheduler.add(generator.order_table, stage, needs=('order_references',))
+            if events_enabled:
+                scheduler.add('order_events', measure('order_events', self.generate_order_events),
+                              needs=('order_references',))
+        
+        tables = {table_name: table_name for table_name in (
+            'category', 'product', 'category_product', 'stock_inventory', 'customers', 'customer_address')}
+        for generator in (WebOrderGenerator(self.config), PosOrderGenerator(self.config)):
+            tables.update(dict.fromkeys(generator.table_names, generator.order_table))
+        return tables
+
+    def link_cache(self):
+        """Give the build cache a full build's stage graph when stages are run one by one, outside generate()"""
+        if self.build_cache.enabled and not self.build_cache.upstream:
+            scheduler = StageScheduler()
+            self.build_cache.link_stages(scheduler, self.add_table_stages(scheduler))
+
+    def append(self):
+        """Add new customers, their addresses and orders after the rows already written
+
+        Ids continue from each table's high-water mark and new rows draw from
+        their own seeds, so repeated appends never repeat earlier rows. The
+        catalog is left as it is; new orders point at all products, customers
+        and addresses, old and new, taken from the stored reference columns,
+        which the new customers and addresses are added to as they are written.
+        """
+        measure = self.metrics.wrap
+        scheduler = StageScheduler(self.scheduler_workers())
+        scheduler.add('customers', measure('customers', self.append_customer_entities))
+        scheduler.add('customer_address', measure('customer_address', self.append_customer_addresses),
+                      needs=('customers',))
+        
+        generators = [WebOrderGenerator(self.config), PosOrderGenerator(self.config)]
+        generators = [generator for generator in generators if generator.is_enabled()]
+        if generators:
+            scheduler.add('order_references', measure('order_references', self.load_order_references),
+                          after=('customers', 'customer_address'))
+            for generator in generators:
+                stage = measure(generator.order_table, partial(self.append_order_tables, generator))
+                scheduler.add(generator.order_table, stage, needs=('order_references',))
+        
+        self.add_validation_stage(scheduler)
+        
+        self.metrics.start()
+        results = scheduler.run()
+        self.metrics.finish()
+        return results
+
+    def add_validation_stage(self, scheduler):
+        """Check the keys of every table once all stages have written them"""
+        if self.validator.enabled:
+            scheduler.add('validate', self.metrics.wrap('validate', self.validate), after=tuple(scheduler.stages))
+
+    def validate(self):
+        """Check primary and foreign keys across the written tables; returns the report"""
+        schema = get_schema(self.config.get('schema', 'schema/full_schema.xml'))
+        table_names = [table_name for table_name in schema.tables if self.table_files(table_name)]
+        return self.validator.validate(table_names, self.read_table)
+
+    def append_customer_entities(self):
+        """Append customer.entity.limit new customers; returns (first new id, count), or None"""
+        customer_generator = CustomerGenerator(self.config)
+        if not customer_generator.customer_config.get('enable', False):
+            print("Customer generation disabled in config")
+            return None
+        
+        count = customer_generator.customer_config.get('limit', 100)
+        start_id = self.high_water_mark('customers')[0] + 1
+        seed = append_seed(self.config, 'customers', start_id)
+        addresses = self.plan_appended_addresses(start_id, count)
+        chunks = customer_generator.build_shard(start_id, count, seed, addresses)
+        self.export_referenced_chunks(chunks, 'customers', start_id)
+        return start_id, count
+
+    def plan_appended_addresses(self, customer_start, customer_count):
+        """Register the address ids of appended customers, numbered after the existing addresses"""
+        address_generator = CustomerAddressGenerator(self.config)
+        if not address_generator.address_config.get('enable', False):
+            return None
+        
+        start_id = self.high_water_mark('customer_address')[0] + 1
+        seed = append_seed(self.config, 'customer_address', start_id)
+        shards = [{'customer_start': customer_start, 'customer_count': customer_count, 'start_id': start_id, 'seed': seed}]
+        return self.keys.register('customer_address', address_generator.owned_keys(shards))
+
+    def append_customer_addresses(self, new_customers):
+        """Give each newly appended customer the addresses planned for it"""
+        addresses = self.keys.get('customer_address')
+        if new_customers is None or addresses is None:
+            return
+        
+        address_generator = CustomerAddressGenerator(self.config)
+        shards = list(address_generator.shards_of(addresses))
+        self.export_referenced_chunks(
+            self.planned_addresses(address_generator, shards), 'customer_address', shards[0]['start_id'])
+
+    def append_order_tables(self, generator, references):
+        """Append order.<channel>.limit new orders of one channel with their items"""
+        if not generator.check_references(references):
+            return
+        
+        # Each table continues from its own last id; web order addresses share the order ids
+        start_ids = {table_name: self.high_water_mark(table_name)[0] + 1 for table_name in generator.table_names}
+        start_id = start_ids[generator.order_table]
+        seed = append_seed(self.config, generator.order_table, start_id)
+        count = generator.order_config.get('limit', 100)
+        batches = generator.build_shard(references, start_id, count, start_ids[generator.item_table], seed)
+        self.export_table_chunks(batches, generator.table_names, start_ids)
+
+    def reads_high_water_marks(self):
+        """Whether the table files themselves tell where a table ends, as a SQLite database does"""
+        # Tables written only as buckets have no table file to ask
+        return hasattr(self.writer_class, 'high_water_mark') and not self.partitioner.buckets_only
+
+    def high_water_mark(self, table_name):
+        """(largest id, row count) of a written table"""
+        if self.reads_high_water_marks():
+            output_file = self.get_output_file(table_name)
+            if not os.path.exists(output_file):
+                return 0, 0
+            return self.writer_class.high_water_mark(output_file, table_name)
+        
+        return self.high_water_marks.get(table_name, self.table_files(table_name), partial(self.read_table, table_name))
+
+    def record_high_water_mark(self, table_name, rows_written, append_from=None):
+        """Remember where a table ends, so the next append does not have to read it"""
+        if table_name not in APPENDABLE_TABLES or self.reads_high_water_marks():
+            return
+        
+        if append_from is None:
+            # A full build numbers its rows from 1
+            self.high_water_marks.record(table_name, rows_written, rows_written, self.table_files(table_name))
+        else:
+            self.high_water_marks.extend(table_name, append_from, rows_written, self.table_files(table_name))
+
+    def appended_folder(self, table_name):
+        """Folder of the files holding rows appended to a table that cannot be extended in place"""
+        return os.path.join(os.path.dirname(self.get_output_file(table_name)), f'{table_name}.appends')
+
+    def clear_appended(self):
+        """Remove appended rows before a full build, including folders left by runs in another format"""
+        for table_name in APPENDABLE_TABLES:
+            shutil.rmtree(self.appended_folder(table_name), ignore_errors=True)
 
     def generate_products(self):
-        # Generate categories first
+        categories = self.generate_category()
+        product_ids = self.generate_product(categories)
+        self.generate_category_product(categories)
+        self.generate_stock_inventory(product_ids)
+
+    def generate_category(self):
+        """Category stage; returns the categories and registers their leaves for products"""
+        # Categories are bounded by their fixture and needed whole for matching, even when cached
         category_generator = CategoryGenerator(self.config)
-        categories = category_generator.generate()
+        categories = category_generator.build_categories()
+        self.keys.register('leaf_category', category_generator.leaf_keys(categories))
         
-        # Generate simple products
-        simple_generator = SimpleProductGenerator(self.config)
-        simple_products = simple_generator.generate()
+        if not self.restore_cached('category'):
+            self.store_cached('category', self.export_chunks([categories], 'category'))
+        return categories
+
+    def generate_product(self, categories=None):
+        """Product stage; returns the ids of the products it wrote"""
+        if self.restore_cached('product'):
+            return None
         
-        # Generate configurable products
-        configurable_generator = ConfigurableProductGenerator(self.config)
-        configurable_products = configurable_generator.generate()
+        # Products are streamed: each chunk is written as it passes and only its id is kept
+        product_ids = array('q')
         
-        # Combine all products
-        all_products = simple_products + configurable_products
-        # Export to CSV
-        file = 'outputs/product.csv'
-        self.export_to_csv(all_products, file, 'product')
-        print(f"Exported {len(all_products)} products to: {file}")
+        with self.create_writer('product') as product_writer:
+            drain(self.iter_product_chunks(product_writer, product_ids, categories))
+        
+        print(f"Exported {product_writer.rows_written} products to: {product_writer.output_file}")
+        self.store_cached('product', product_writer.rows_written)
+        return product_ids
+
+    def generate_category_product(self, categories):
+        """Match the written products to categories"""
+        if self.restore_cached('category_product'):
+            return
+        
+        if categories is None:
+            categories = CategoryGenerator(self.config).build_categories()
         
-        # Generate category-product relationships
         category_product_generator = CategoryProductGenerator(self.config)
-        category_product_generator.generate(all_products, categories)
+        rows_written = self.export_chunks(
+            category_product_generator.iter_chunks(self.read_table('product'), categories), 'category_product')
+        self.store_cached('category_product', rows_written)
+
+    def generate_stock_inventory(self, product_ids):
+        """Stock inventory stage, from the product ids handed over by the product stage"""
+        if self.restore_cached('stock_inventory'):
+            return
+        
+        if product_ids is None:
+            # Products came from the cache, so their ids are read back
+            product_ids = array('q')
+            drain(self.iter_cached_chunks(product_ids))
         
-        # Generate stock inventory
         stock_generator = StockInventoryGenerator(self.config)
-        stock_generator.generate(all_products)
+        if self.shard_runner.enabled:
+            shards = stock_generator.plan_shards(
+                product_ids, self.shard_runner.shard_size, self.shard_runner.seed_for('stock_inventory'))
+            rows_written = self.export_sharded(StockInventoryGenerator, 'stock_inventory', shards)
+        else:
+            rows_written = self.export_chunks(stock_generator.iter_column_chunks(product_ids), 'stock_inventory')
+        self.store_cached('stock_inventory', rows_written)
+
+    def iter_cached_chunks(self, product_ids):
+        """Stream a cached product table back, collecting its ids"""
+        for chunk in self.read_table('product'):
+            product_ids.extend(int(product['id']) for product in chunk)
+            yield chunk
+
+    def iter_product_chunks(self, product_writer, product_ids, categories=None):
+        """Stream simple then configurable products, writing each chunk as it passes"""
+        simple_generator = SimpleProductGenerator(self.config)
+        configurable_generator = ConfigurableProductGenerator(self.config)
+        
+        # Products are placed in the leaf category their name matches, else in a registered leaf
+        cache_folder = self.config.get('cache', {}).get('folder', '.cache')
+        category_kwargs = {
+            'matcher': CategoryMatcher(categories, cache_folder) if categories else None,
+            'leaves': self.keys.get('leaf_category'),
+        }
+        
+        for chunk in simple_generator.iter_chunks(**category_kwargs):
+            with phase('export'):
+                product_writer.write_chunk(chunk)
+            product_ids.extend(product['id'] for product in chunk)
+            yield chunk
+        
+        # Configurable ids continue after the simple products
+        next_id = product_ids[-1] + 1 if product_ids else 1
+        
+        if self.shard_runner.enabled:
+            shards = configurable_generator.plan_shards(
+                next_id, self.shard_runner.shard_size, self.shard_runner.seed_for('product.configurable'))
+            configurable_chunks = self.shard_runner.iter_chunks(
+                ConfigurableProductGenerator, 'product', shards, category_kwargs)
+        else:
+            configurable_chunks = configurable_generator.iter_chunks(start_id=next_id, **category_kwargs)
+        
+        for chunk in configurable_chunks:
+            with phase('export'):
+                product_writer.write_chunk(chunk)
+            product_ids.extend(product['id'] for product in chunk)
+            yield chunk
 
     def generate_customers(self):
-        # Generate customer entities
+        customer_count = self.generate_customer_entities()
+        self.generate_customer_addresses(customer_count)
+
+    def generate_customer_entities(self):
+        """Customer stage; returns the number of customers"""
         customer_generator = CustomerGenerator(self.config)
-        customers = customer_generator.generate()
+        customer_count = self.config.get('customer', {}).get('entity', {}).get('limit', 100)
+        runner = self.shard_runner
+        
+        # Addresses are planned first, so customers' default addresses are among their own
+        addresses = self.plan_customer_addresses(customer_count)
         
-        # Generate customer addresses
+        if not self.restore_cached('customers'):
+            if runner.enabled:
+                shards = customer_generator.plan_shards(runner.shard_size, runner.seed_for('customers'))
+                rows_written = self.export_sharded(CustomerGenerator, 'customers', shards, {'addresses': addresses})
+            else:
+                rows_written = self.export_chunks(customer_generator.iter_column_chunks(addresses=addresses), 'customers')
+            self.store_cached('customers', rows_written)
+        
+        return customer_count
+
+    def plan_customer_addresses(self, customer_count):
+        """Register which address ids each customer will have; None when addresses are disabled"""
         address_generator = CustomerAddressGenerator(self.config)
-        customer_count = self.config.get('customer', {}).get('entity', {}).get('limit', 100)
-        address_generator.generate(customer_count)
+        if not address_generator.address_config.get('enable', False):
+            return None
+        
+        runner = self.shard_runner
+        if runner.enabled:
+            shards = address_generator.plan_shards(customer_count, runner.shard_size, runner.seed_for('customer_address'))
+        else:
+            shards = address_generator.plan_chunks(customer_count)
+        return self.keys.register('customer_address', address_generator.owned_keys(shards))
+
+    def generate_customer_addresses(self, customer_count):
+        """Address stage, building the addresses planned for customer_count customers"""
+        if self.restore_cached('customer_address'):
+            return
+        
+        address_generator = CustomerAddressGenerator(self.config)
+        addresses = self.keys.get('customer_address')
+        if addresses is None:
+            addresses = self.plan_customer_addresses(customer_count)
+        if addresses is None:
+            print("Customer address generation disabled in config")
+        
+        shards = list(address_generator.shards_of(addresses)) if addresses is not None else []
+        if self.shard_runner.enabled:
+            rows_written = self.export_sharded(CustomerAddressGenerator, 'customer_address', shards)
+        else:
+            rows_written = self.export_chunks(self.planned_addresses(address_generator, shards), 'customer_address')
+        self.store_cached('customer_address', rows_written)
+
+    def planned_addresses(self, address_generator, shards):
+        """Build planned shards of addresses in this process, in order"""
+        for shard in shards:
+            yield from address_generator.build_shard(**shard)
 
     def generate_orders(self):
-        pass
+        generators = self.order_generators()
+        references = self.load_pending_order_references(generators, False)
+        for generator in generators:
+            self.generate_order_tables(generator, references)
+
+    def order_generators(self):
+        """Enabled order generators"""
+        generators = [WebOrderGenerator(self.config), PosOrderGenerator(self.config)]
+        return [generator for generator in generators if generator.is_enabled()]
+
+    def order_tables_cached(self, generator):
+        """Whether every table of an order channel can be reused from the cache, without restoring them"""
+        self.link_cache()
+        return all(self.build_cache.contains(table_name, self.get_output_file(table_name))
+                   for table_name in generator.table_names)
+
+    def load_pending_order_references(self, generators, events_enabled):
+        """Order references, or None when every order table is reused from the cache and no events are built"""
+        if not events_enabled and all(self.order_tables_cached(generator) for generator in generators):
+            return None
+        return self.load_order_references()
+
+    def load_order_references(self):
+        """Products, customers and addresses that orders point at, from their stored columns"""
+        table_names = ('product', 'customers', 'customer_address')
+        for table_name in table_names:
+            self.references.ensure(table_name)
+        return OrderReferences(*(self.references.load(table_name) for table_name in table_names))
+
+    def generate_order_tables(self, generator, references):
+        """Build the tables of one order channel, unless they are all reused from the cache"""
+        # Order tables of a channel are built together, so they are reused together
+        if all([self.restore_cached(table_name) for table_name in generator.table_names]):
+            return
+        
+        if references is None:
+            references = self.load_order_references()
+        if not generator.check_references(references):
+            return
+        
+        if self.shard_runner.enabled:
+            rows_written = self.export_sharded_tables(generator, references)
+        else:
+            rows_written = self.export_table_chunks(
+                generator.iter_column_chunks(references), generator.table_names)
+        
+        for table_name in generator.table_names:
+            self.store_cached(table_name, rows_written[table_name])
+
+    def table_files(self, table_name):
+        """Files holding a generated table, in row order: its output or unmerged part files, then appended rows
+
+        Tables written only as buckets are held by their bucket files instead,
+        each in id order.
+        """
+        if self.partitioner.buckets_only:
+            return self.partitioner.bucket_files(table_name)
+        
+        output_file = self.get_output_file(table_name)
+        parts_folder = self.shard_runner.parts_folder(table_name, output_file)
+        
+        if self.shard_runner.enabled and not self.shard_runner.merge and os.path.isdir(parts_folder):
+            input_files = [os.path.join(parts_folder, name) for name in sorted(os.listdir(parts_folder))]
+        elif os.path.exists(output_file):
+            input_files = [output_file]
+        else:
+            input_files = []
+        
+        # Only files the configured writer can read, not leftovers of a run in another format
+        options = self.output_config.get(self.output_config.get('format', 'csv'), {})
+        extension = self.writer_class.file_extension(options)
+        appended_folder = self.appended_folder(table_name)
+        if os.path.isdir(appended_folder):
+            input_files += [os.path.join(appended_folder, name) for name in sorted(os.listdir(appended_folder))
+                            if name.endswith(extension)]
+        return input_files
+
+    def generate_order_events(self, references):
+        """Write each order channel's event stream, partitioned into one folder per table and day"""
+        events_config = self.config.get('order', {}).get('events', {})
+        folder = events_config.get('folder', os.path.join(self.output_config.get('folder', 'outputs'), 'events'))
+        
+        for channel in ('web', 'pos'):
+            generator = OrderEventGenerator(self.config, channel)
+            if not generator.is_enabled():
+                continue
+            
+            print(f"Generating {channel} order events...")
+            # Partitions of an earlier run may cover other days
+            for table_name in generator.table_names:
+                shutil.rmtree(os.path.join(folder, table_name), ignore_errors=True)
+            
+            rows_written, days = self.export_partitions(generator.iter_days(references), generator.table_names, folder)
+            for table_name, rows in rows_written.items():
+                add_rows(table_name, rows)
+                print(f"Exported {rows} records to: {os.path.join(folder, table_name)} ({days} days)")
+
+    def export_partitions(self, batches, table_names, folder):
+        """Write (partition, {table name: chunk}) batches to <folder>/<table>/date=<partition>/, one partition open at a time"""
+        schema = get_schema(self.config.get('schema', 'schema/full_schema.xml'))
+        options = self.output_config.get(self.output_config.get('format', 'csv'), {})
+        rows_written = dict.fromkeys(table_names, 0)
+        partitions = 0
+        
+        with ExitStack() as stack:
+            current = None
+            writers = {}
+            for partition, batch in batches:
+                if partition != current:
+                    # Batches come in partition order, so the previous partition is complete
+                    stack.close()
+                    current = partition
+                    partitions += 1
+                    writers = {}
+                    for table_name in table_names:
+                        partition_folder = os.path.join(folder, table_name, f'date={partition}')
+                        output_file = self.writer_class.output_path(partition_folder, table_name, options)
+                        writers[table_name] = stack.enter_context(
+                            create_writer(self.output_config, output_file, schema.get_table(table_name)))
+                
+                with phase('export'):
+                    for table_name, chunk in batch.items():
+                        writers[table_name].write_chunk(chunk)
+                        rows_written[table_name] += columnar.row_count(chunk)
+        
+        return rows_written, partitions
+
+    def read_table(self, table_name):
+        """Stream a generated table back from the files holding it"""
+        chunk_size = self.output_config.get('chunk_size', DEFAULT_CHUNK_SIZE)
+        streams = [timed_iter(self.writer_class.read_chunks(input_file, table_name, chunk_size), 'read')
+                   for input_file in self.table_files(table_name)]
+        if self.partitioner.buckets_only:
+            # Every bucket file holds its rows in id order, so merging them gives the table back
+            yield from merge_by_id(streams, chunk_size)
+            return
+        
+        for stream in streams:
+            yield from stream
 
     def get_schema_columns(self, table_name):
-        """Parse XML schema to get column names for a table"""
-        import xml.etree.ElementTree as ET
+        """Get column names for a table from the shared schema registry"""
+        schema = get_schema(self.config.get('schema', 'schema/full_schema.xml'))
+        return list(schema.get_column_names(table_name))
+
+    def get_output_file(self, table_name):
+        """Output path for a table inside the configured output folder"""
+        folder = self.output_config.get('folder', 'outputs')
+        options = self.output_config.get(self.output_config.get('format', 'csv'), {})
+        return self.writer_class.output_path(folder, table_name, options)
+
+    def get_append_file(self, table_name, append_from):
+        """Where rows appended from id append_from go: the output itself, or a new file beside it"""
+        if self.writer_class.appends_in_place:
+            return self.get_output_file(table_name)
+        # Zero-padded so the files sort in id order
+        options = self.output_config.get(self.output_config.get('format', 'csv'), {})
+        extension = self.writer_class.file_extension(options)
+        return os.path.join(self.appended_folder(table_name), f'{append_from:012d}{extension}')
+
+    def create_writer(self, table_name, append_from=None):
+        """Writer for a table's output file in the configured format, or for rows appended from an id
+
+        With partitioning the writer splits each chunk into the table's buckets as it is written.
+        """
+        schema = get_schema(self.config.get('schema', 'schema/full_schema.xml'))
+        if append_from is None:
+            output_file = self.get_output_file(table_name)
+        else:
+            output_file = self.get_append_file(table_name, append_from)
+        return self.partitioner.create_writer(table_name, output_file, schema.get_table(table_name), append_from)
+
+    def restore_cached(self, table_name):
+        """Reuse a table from the build cache when none of its inputs changed"""
+        self.link_cache()
+        output_file = self.get_output_file(table_name)
+        if not self.build_cache.restore(table_name, output_file):
+            return False
         
-        schema_path = self.config.get('schema', 'schema/full_schema.xml')
-        tree = ET.parse(schema_path)
-        root = tree.getroot()
+        print(f"Reused cached {table_name}: {output_file}")
+        mark_cached(table_name)
+        self.references.discard(table_name)
+        if self.partitioner.enabled:
+            # Only table files are cached, so the buckets are split again from the restored file
+            schema = get_schema(self.config.get('schema', 'schema/full_schema.xml'))
+            self.partitioner.partition(table_name, self.read_table(table_name), schema.get_table(table_name))
+        return True
+
+    def store_cached(self, table_name, rows_written):
+        """Count the rows of a freshly generated table and save it in the build cache"""
+        self.link_cache()
+        add_rows(table_name, rows_written)
+        self.record_high_water_mark(table_name, rows_written)
+        self.references.discard(table_name)
+        # Nothing was written, so the output file may be left over from another build
+        if rows_written:
+            self.build_cache.store(table_name, self.get_output_file(table_name))
+
+    def export_chunks(self, chunks, table_name, append_from=None):
+        """Write a stream of row or column chunks to the table's output file as they arrive
+
+        With append_from the rows, whose ids start there, are added after the
+        table's existing rows instead of replacing them.
+        """
+        with self.create_writer(table_name, append_from) as writer:
+            for chunk in chunks:
+                with phase('export'):
+                    writer.write_chunk(chunk)
+            rows_written = writer.rows_written
         
-        columns = []
-        for table in root.findall('table'):
-            if table.get('name') == table_name:
-                for column in table.findall('column'):
-                    col_name = column.get('name')
-                    columns.append(col_name)
-                break
+        if not rows_written:
+            print(f"No data to export for {table_name}")
+            return 0
         
-        return columns
+        if append_from is None:
+            print(f"Exported {rows_written} records to: {writer.output_file}")
+        else:
+            add_rows(table_name, rows_written)
+            self.record_high_water_mark(table_name, rows_written, append_from)
+            print(f"Appended {rows_written} records to: {writer.output_file}")
+        return rows_written
+
+    def export_referenced_chunks(self, chunks, table_name, append_from):
+        """Append rows to a table orders point at, adding them to its stored reference columns as they pass"""
+        # The stored columns must hold the rows already there before new ones are added
+        self.references.ensure(table_name)
+        rows_written = self.export_chunks(self.references.extend(table_name, chunks), table_name, append_from)
+        self.references.commit(table_name)
+        return rows_written
+
+    def export_table_chunks(self, batches, table_names, append_from=None):
+        """Write a stream of {table name: chunk} batches to several tables at once
+
+        append_from maps each table to the id its rows start at when they are
+        added after the existing rows.
+        """
+        with ExitStack() as stack:
+            writers = {
+                table_name: stack.enter_context(
+                    self.create_writer(table_name, append_from[table_name] if append_from else None))
+                for table_name in table_names
+            }
+            for batch in batches:
+                with phase('export'):
+                    for table_name, chunk in batch.items():
+                        writers[table_name].write_chunk(chunk)
+        
+        rows_written = {table_name: writer.rows_written for table_name, writer in writers.items()}
+        if append_from is None:
+            self.report_rows(rows_written)
+            return rows_written
+        
+        for table_name, rows in rows_written.items():
+            if rows:
+                add_rows(table_name, rows)
+                self.record_high_water_mark(table_name, rows, append_from[table_name])
+                print(f"Appended {rows} records to: {writers[table_name].output_file}")
+        return rows_written
+
+    def export_sharded_tables(self, generator, references):
+        """Build related tables together shard by shard in worker processes"""
+        runner = self.shard_runner
+        schema = get_schema(self.config.get('schema', 'schema/full_schema.xml'))
+        shards = generator.plan_shards(runner.shard_size, runner.seed_for(generator.order_table))
+        output_files = {table_name: self.get_output_file(table_name) for table_name in generator.table_names}
+        schema_tables = {table_name: schema.get_table(table_name) for table_name in generator.table_names}
+        
+        rows_written = runner.export_tables(
+            type(generator), shards, output_files, schema_tables, {'references': references})
+        self.report_rows(rows_written)
+        return rows_written
+
+    def report_rows(self, rows_written):
+        for table_name, rows in rows_written.items():
+            if not rows:
+                print(f"No data to export for {table_name}")
+                continue
+            
+            print(f"Exported {rows} records to: {self.output_location(table_name)}")
+
+    def output_location(self, table_name):
+        """Where a written table is: its output file, its unmerged part files or its buckets"""
+        output_file = self.get_output_file(table_name)
+        if self.partitioner.buckets_only:
+            return self.partitioner.table_folder(table_name)
+        if self.shard_runner.enabled and not self.shard_runner.merge:
+            return self.shard_runner.parts_folder(table_name, output_file)
+        return output_file
+
+    def export_sharded(self, generator_class, table_name, shards, shared_kwargs=None):
+        """Build a table shard by shard in worker processes and write it out"""
+        output_file = self.get_output_file(table_name)
+        schema = get_schema(self.config.get('schema', 'schema/full_schema.xml'))
+        rows_written = self.shard_runner.export(
+            generator_class, table_name, shards, output_file, schema.get_table(table_name), shared_kwargs)
+        
+        if not rows_written:
+            print(f"No data to export for {table_name}")
+            return 0
+        
+        print(f"Exported {rows_written} records to: {self.output_location(table_name)}")
+        return rows_written
 
     def export_to_csv(self, data, output_file, table_name):
-        """Export data to CSV file using pandas"""
+        """Export rows to a CSV file, columns in schema order"""
         if not data:
             print("No data to export")
             return
         
-        import os
         os.makedirs('outputs', exist_ok=True)
         
-        # Convert to DataFrame
-        df = pd.DataFrame(data)
-        
-        # Get schema columns for ordering
-        schema_columns = self.get_schema_columns(table_name)
-        
-        if schema_columns:
-            # Reorder columns based on schema, only include columns that exist in data
-            existing_columns = [col for col in schema_columns if col in df.columns]
-            df = df[existing_columns]
-        
-        # Export to CSV
-        df.to_csv(output_file, index=False, encoding='utf-8')
-        print(f"Exported {len(df)} records to: {output_file}")
\ No newline at end of file
+        with CsvTableWriter(output_file, self.get_schema_columns(table_name)) as writer:
+            writer.write_chunk(data)
+        print(f"Exported {writer.rows_written} records to: {output_file}")
\ No newline at end of file
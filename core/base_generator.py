@@ -1,19 +1,55 @@
+import json
+
+from core.fixtures import get_fixture_store
+from core.sampling import build_sampler
+from core.schema import get_schema
+from core.stream import DEFAULT_CHUNK_SIZE
+
 
 class BaseGenerator:
     def __init__(self, config, fixture_path, output_folder):
         self.config = config
         self.fixture_path = fixture_path
         self.output_folder = output_folder
-        self.fixture_cache = {}
-    
+        self.samplers = {}
+        self.schema = get_schema(config.get('schema', 'schema/full_schema.xml'))
+
+    @property
+    def fixtures(self):
+        """The process-wide fixture store, shared by every generator"""
+        return get_fixture_store(self.config)
+
     def load_fixture(self, fixture_path):
-        pass
-    
-    def extract_fixture_values(self):
-        pass
-    
+        """Parsed JSON of a fixture file"""
+        return self.fixtures.load(fixture_path)
+
+    def extract_fixture_values(self, fixture_path):
+        """Values of a fixture file, read from the fixture snapshot"""
+        return self.fixtures.values(fixture_path)
+
+    def get_sampler(self, name, spec, values=None, size=None):
+        """Alias table drawing positions of values under a distribution spec, built once; None for uniform"""
+        key = (name, json.dumps(spec, sort_keys=True))
+        if key not in self.samplers:
+            self.samplers[key] = build_sampler(spec, len(values) if size is None else size, values)
+        return self.samplers[key]
+
+    def get_schema_columns(self, table_name):
+        """Return column descriptors for a table from the shared schema registry"""
+        return self.schema.get_columns(table_name)
+
+    def get_chunk_size(self):
+        """Rows per chunk for streaming generation"""
+        return self.config.get('output', {}).get('chunk_size', DEFAULT_CHUNK_SIZE)
+
+    def iter_chunks(self):
+        """Yield the generated rows in chunks - to be implemented by subclasses"""
+        raise NotImplementedError("Subclasses must implement iter_chunks()")
+
     def generate(self):
-        pass
-    
+        """Generate every row at once - to be implemented by subclasses"""
+        raise NotImplementedError("Subclasses must implement generate()")
+
     def export_to_csv(self, data):
-        pass
\ No newline at end of file
+        """Write generated rows to CSV - to be implemented by subclasses"""
+        raise NotImplementedError("Subclasses must implement export_to_csv()")
@@ -0,0 +1,270 @@
+import copy
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import time
+from collections.abc import Mapping
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+import numpy as np
+from core import columnar
+from core.catalog.category.entity import CategoryGenerator
+from core.catalog.category.product import CategoryProductGenerator
+from core.catalog.product.configurable import ConfigurableProductGenerator
+from core.catalog.product.simple import SimpleProductGenerator
+from core.catalog.product.stock_inventory import StockInventoryGenerator
+from core.customer.address import CustomerAddressGenerator
+from core.customer.entity import CustomerGenerator
+from core.metrics import peak_rss
+from core.output import create_writer, get_writer_class
+from core.sharding import available_cpus
+
+
+DEFAULT_ROW_COUNTS = (1000, 10000, 100000)
+DEFAULT_TOLERANCE = 0.2
+# Cases are repeated until their runs add up to this long, so short ones are timed many times
+DEFAULT_MIN_SECONDS = 0.5
+MAX_REPEAT = 1000
+# Runs faster than this are mostly timer and scheduling noise, so their speed is not compared
+NOISE_FLOOR_SECONDS = 0.05
+DEFAULT_HISTORY_FILE = 'benchmarks/history.json'
+DEFAULT_BASELINE_FILE = 'benchmarks/baseline.json'
+
+
+def count_rows(chunks):
+    """Consume a stream of row or column chunks and count its rows"""
+    rows = 0
+    for chunk in chunks:
+        rows += columnar.row_count(chunk) if isinstance(chunk, Mapping) else len(chunk)
+    return rows
+
+
+def configurable_config(config, rows):
+    """Config whose configurable rules produce about rows products"""
+    config = copy.deepcopy(config)
+    generator = ConfigurableProductGenerator(config)
+    rules = config['catalog']['product']['configurable']['rules']
+    for rule in rules:
+        rule['limit'] = max(1, rows // len(rules) // generator.count_rows_per_parent(rule))
+    return config
+
+
+# Each case sets up its inputs and returns the timed part, which gives (rows, bytes written)
+
+def bench_simple_products(config, rows, folder):
+    # Bounded by its fixture, so rows is only an upper limit
+    generator = SimpleProductGenerator(config)
+    return lambda: (count_rows(generator.iter_chunks()), 0)
+
+
+def bench_configurable_products(config, rows, folder):
+    generator = ConfigurableProductGenerator(configurable_config(config, rows))
+    return lambda: (count_rows(generator.iter_chunks()), 0)
+
+
+def bench_categories(config, rows, folder):
+    # Bounded by its fixture
+    generator = CategoryGenerator(config)
+    return lambda: (count_rows(generator.iter_chunks()), 0)
+
+
+def bench_category_products(config, rows, folder):
+    products = list(ConfigurableProductGenerator(configurable_config(config, rows)).iter_chunks())
+    categories = CategoryGenerator(config).build_categories()
+    generator = CategoryProductGenerator(config)
+    return lambda: (count_rows(generator.iter_chunks(iter(products), categories)), 0)
+
+
+def bench_stock_inventory(config, rows, folder):
+    # Products have (1 + warehouses) / 2 stock rows on average
+    warehouses = config.get('catalog', {}).get('stock_inventory', {}).get('warehouses', 3)
+    product_ids = np.arange(1, max(1, rows * 2 // (1 + warehouses)) + 1)
+    generator = StockInventoryGenerator(config)
+    return lambda: (count_rows(generator.iter_column_chunks(product_ids)), 0)
+
+
+def bench_customers(config, rows, folder):
+    config = copy.deepcopy(config)
+    config['customer']['entity']['limit'] = rows
+    generator = CustomerGenerator(config)
+    return lambda: (count_rows(generator.iter_column_chunks()), 0)
+
+
+def bench_customer_addresses(config, rows, folder):
+    max_addresses = config.get('customer', {}).get('address', {}).get('max_address_per_customer', 2)
+    customer_count = max(1, rows * 2 // (1 + max_addresses))
+    generator = CustomerAddressGenerator(config)
+    return lambda: (count_rows(generator.iter_column_chunks(customer_count)), 0)
+
+
+def writer_case(output_format):
+    """Case writing rows customers, built beforehand, in one output format"""
+    def bench_writer(config, rows, folder):
+        get_writer_class(output_format)  # fails early when the format's package is missing
+        customer_config = copy.deepcopy(config)
+        customer_config['customer']['entity']['limit'] = rows
+        generator = CustomerGenerator(customer_config)
+        chunks = list(generator.iter_column_chunks())
+
+        output_config = dict(config.get('output', {}), format=output_format)
+        writer_class = get_writer_class(output_format)
+        options = output_config.get(output_format, {})
+        output_file = writer_class.output_path(folder, 'customers', options)
+
+        def write():
+            with create_writer(output_config, output_file, generator.schema.get_table('customers')) as writer:
+                rows_written = writer.write_chunks(chunks)
+            return rows_written, os.path.getsize(output_file)
+
+        return write
+
+    return bench_writer
+
+
+BENCHMARKS = {
+    'simple_products': bench_simple_products,
+    'configurable_products': bench_configurable_products,
+    'categories': bench_categories,
+    'category_products': bench_category_products,
+    'stock_inventory': bench_stock_inventory,
+    'customers': bench_customers,
+    'customer_addresses': bench_customer_addresses,
+    'writer_csv': writer_case('csv'),
+    'writer_parquet': writer_case('parquet'),
+    'writer_sqlite': writer_case('sqlite'),
+}
+
+
+def run_case(name, config, rows, repeat, min_seconds=DEFAULT_MIN_SECONDS):
+    """Run one case in this process at least repeat times and for min_seconds in all; the fastest run is kept"""
+    with tempfile.TemporaryDirectory() as folder:
+        config = copy.deepcopy(config)
+        config['output']['folder'] = folder
+        try:
+            timed = BENCHMARKS[name](config, rows, folder)
+        except ImportError as error:
+            return {'case': name, 'rows_requested': rows, 'skipped': str(error)}
+
+        runs = []
+        while len(runs) < repeat or (sum(runs) < min_seconds and len(runs) < MAX_REPEAT):
+            start = time.perf_counter()
+            rows_built, bytes_written = timed()
+            runs.append(time.perf_counter() - start)
+
+    seconds = min(runs)
+    return {
+        'case': name,
+        'rows_requested': rows,
+        'rows': rows_built,
+        'runs': len(runs),
+        'seconds': round(seconds, 6),
+        'median_seconds': round(float(np.median(runs)), 6),
+        'rows_per_sec': round(rows_built / seconds, 1) if seconds else None,
+        'peak_rss_bytes': peak_rss(),
+        'bytes_written': bytes_written,
+    }
+
+
+def run_suite(config, names=None, row_counts=DEFAULT_ROW_COUNTS, repeat=1, min_seconds=DEFAULT_MIN_SECONDS):
+    """Run each case at each row count, each in a fresh process so peak memory is its own"""
+    config = copy.deepcopy(config)
+    config.setdefault('cache', {})['enable'] = False
+    config.setdefault('sharding', {})['enable'] = False
+    config.setdefault('output', {})
+
+    results = []
+    context = multiprocessing.get_context('spawn')
+    for name in names or BENCHMARKS:
+        if name not in BENCHMARKS:
+            raise ValueError(f"Unknown benchmark '{name}'; expected one of {', '.join(BENCHMARKS)}")
+        for rows in row_counts:
+            with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                result = executor.submit(run_case, name, config, rows, repeat, min_seconds).result()
+            print_result(result)
+            results.append(result)
+
+    return {
+        'timestamp': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpus': available_cpus(),
+        'results': results,
+    }
+
+
+def git_commit():
+    try:
+        output = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.stdout.strip()
+
+
+def print_result(result):
+    if 'skipped' in result:
+        print(f"  {result['case']:<24} {result['rows_requested']:>9,}  skipped: {result['skipped']}")
+        return
+
+    rss = f"{result['peak_rss_bytes'] / 1024 ** 2:.0f} MB" if result['peak_rss_bytes'] else '-'
+    written = f"{result['bytes_written'] / 1024:.0f} KB" if result['bytes_written'] else '-'
+    print(f"  {result['case']:<24} {result['rows']:>9,} rows  {result['seconds']:>8.3f}s  "
+          f"{result['rows_per_sec']:>12,.0f} rows/s  x{result.get('runs', 1):<4} peak {rss:>7}  written {written:>9}")
+
+
+def load_json(path, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return default
+
+
+def save_json(path, data):
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+
+
+def append_history(run, history_file=DEFAULT_HISTORY_FILE):
+    """Add a suite run to the history file"""
+    history = load_json(history_file, [])
+    history.append(run)
+    save_json(history_file, history)
+
+
+def compare(run, baseline, tolerance=DEFAULT_TOLERANCE, noise_floor=NOISE_FLOOR_SECONDS):
+    """Regressions of a run against a baseline run: slower, or using more memory, beyond tolerance
+
+    Speed is compared on the fastest run of each case, and only for cases
+    whose fastest run takes noise_floor seconds or more in both runs.
+    """
+    expected = {(result['case'], result['rows_requested']): result for result in baseline.get('results', [])}
+    regressions = []
+
+    for result in run['results']:
+        before = expected.get((result['case'], result['rows_requested']))
+        if before is None or 'skipped' in result or 'skipped' in before:
+            continue
+
+        timed_long_enough = min(result['seconds'], before['seconds']) >= noise_floor
+        if timed_long_enough and before['rows_per_sec'] and \
+                result['rows_per_sec'] < before['rows_per_sec'] * (1 - tolerance):
+            regressions.append(
+                f"{result['case']} @ {result['rows_requested']:,}: "
+                f"{result['rows_per_sec']:,.0f} rows/s vs {before['rows_per_sec']:,.0f} in the baseline")
+
+        if before['peak_rss_bytes'] and result['peak_rss_bytes'] and \
+                result['peak_rss_bytes'] > before['peak_rss_bytes'] * (1 + tolerance):
+            regressions.append(
+                f"{result['case']} @ {result['rows_requested']:,}: "
+                f"peak {result['peak_rss_bytes'] / 1024 ** 2:.0f} MB vs "
+                f"{before['peak_rss_bytes'] / 1024 ** 2:.0f} MB in the baseline")
+
+    return regressions
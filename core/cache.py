@@ -0,0 +1,282 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from functools import lru_cache
+
+from core.output import get_writer_class
+from core.schema import get_schema
+
+
+# Bump when the way tables are cached changes; changes to the generating code are hashed into every key
+CACHE_VERSION = 3
+
+# Package holding the generators and writers
+CODE_FOLDER = os.path.dirname(os.path.abspath(__file__))
+
+# Config sections (with their fixtures) each table is built from; upstream tables come from the stage graph
+TABLE_INPUTS = {
+    'category': [('catalog', 'category')],
+    'product': [('catalog', 'product', 'simple'), ('catalog', 'product', 'configurable'),
+                ('catalog', 'product', 'distribution')],
+    'category_product': [('catalog', 'category_product')],
+    'stock_inventory': [('catalog', 'stock_inventory')],
+    # Default addresses point at the addresses planned for each customer
+    'customers': [('customer', 'entity'), ('customer', 'address')],
+    'customer_address': [('customer', 'address')],
+    'sale_order_web': [('order', 'web')],
+    'sale_order_web_items': [('order', 'web')],
+    'sale_order_web_address': [('order', 'web')],
+    'sale_order_pos': [('order', 'pos')],
+    'sale_order_pos_items': [('order', 'pos')],
+}
+
+
+def config_section(config, path):
+    """Nested config section for a key path, or None when it is missing"""
+    section = config
+    for key in path:
+        if not isinstance(section, dict):
+            return None
+        section = section.get(key)
+    return section
+
+
+@lru_cache(maxsize=None)
+def code_hash(folder=CODE_FOLDER):
+    """Hash of the Python source under a folder, so tables built by older code are not reused"""
+    digest = hashlib.sha256()
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(name for name in dirs if name != '__pycache__')
+        for name in sorted(files):
+            if not name.endswith('.py'):
+                continue
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, folder).replace(os.sep, '/').encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(hashlib.sha256(f.read()).digest())
+    return digest.hexdigest()
+
+
+def find_fixtures(section):
+    """All fixture paths referenced anywhere inside a config section"""
+    fixtures = []
+
+    if isinstance(section, dict):
+        for key, value in section.items():
+            if key == 'fixture' and isinstance(value, str):
+                fixtures.append(value)
+            elif key == 'fixture' and isinstance(value, dict):
+                fixtures.extend(path for path in value.values() if isinstance(path, str))
+            else:
+                fixtures.extend(find_fixtures(value))
+    elif isinstance(section, list):
+        for value in section:
+            fixtures.extend(find_fixtures(value))
+
+    return fixtures
+
+
+class BuildCache:
+    """Content-addressed store of generated tables
+
+    Each table is keyed by a hash of its config sections, fixture files,
+    schema definition, the source of the generating code and the keys of
+    its upstream tables, so a table is only regenerated when something it
+    is built from has changed. Upstream tables are those written by the
+    stages its own stage waits for, taken from the build's scheduler by
+    link_stages.
+    """
+
+    def __init__(self, config, output_folder='outputs'):
+        self.config = config
+        cache_config = config.get('cache', {})
+        sharding_config = config.get('sharding', {})
+        # Unmerged shards leave part folders rather than a single table file
+        merged = not sharding_config.get('enable', False) or sharding_config.get('merge', True)
+        # Tables sharing one output file, like a SQLite database, cannot be swapped in one by one
+        writer_class = get_writer_class(config.get('output', {}).get('format', 'csv'))
+        # Tables partitioned without table_files are only written as bucket folders
+        partitioning_config = config.get('output', {}).get('partitioning', {})
+        buckets_only = partitioning_config.get('enable', False) and not partitioning_config.get('table_files', False)
+        self.enabled = cache_config.get('enable', False) and merged and not writer_class.shared_output and not buckets_only
+        if cache_config.get('enable', False) and not self.enabled:
+            if not merged:
+                reason = 'unmerged shards leave part folders'
+            elif buckets_only:
+                reason = 'partitioned tables are only written as buckets'
+            else:
+                reason = f"{config.get('output', {}).get('format', 'csv')} writes every table into one shared output"
+            print(f"Build cache disabled: {reason}, so tables cannot be swapped in one by one")
+        self.folder = cache_config.get('folder', '.cache')
+        self.schema = get_schema(config.get('schema', 'schema/full_schema.xml'))
+        self.manifest_path = os.path.join(output_folder, '.build-keys.json')
+        self.fixture_hashes = {}
+        self.keys = {}
+        self.upstream = {}
+        # Tables built at the same time update the manifest from several threads
+        self.manifest_lock = threading.Lock()
+
+    def link_stages(self, scheduler, tables):
+        """Take each table's upstream tables from the stage graph; tables maps table names to their stages"""
+        stage_tables = {}
+        for table_name, stage_name in tables.items():
+            stage_tables.setdefault(stage_name, []).append(table_name)
+
+        for table_name, stage_name in tables.items():
+            if stage_name not in scheduler.stages:
+                continue
+
+            # Stages that write no table, like loading order references, are looked through
+            upstream = set()
+            pending = list(scheduler.dependencies(stage_name))
+            seen = set()
+            while pending:
+                name = pending.pop()
+                if name in seen:
+                    continue
+                seen.add(name)
+                if name in stage_tables:
+                    upstream.update(stage_tables[name])
+                else:
+                    pending.extend(scheduler.dependencies(name))
+            self.upstream[table_name] = sorted(upstream)
+        self.keys = {}
+
+    def global_inputs(self):
+        """Settings that change the data of every table"""
+        sharding_config = dict(self.config.get('sharding', {}))
+        # Worker count and part-file merging never change the data itself
+        sharding_config.pop('workers', None)
+        sharding_config.pop('merge', None)
+
+        # The output folder only moves files around, and buckets hold the same rows as the table files
+        output_config = dict(self.config.get('output', {}))
+        output_config.pop('folder', None)
+        output_config.pop('partitioning', None)
+
+        return {
+            'version': CACHE_VERSION,
+            'code': code_hash(),
+            'seed': self.config.get('seed'),
+            'output': output_config,
+            'sharding': sharding_config,
+        }
+
+    def hash_fixture(self, fixture_path):
+        """Hash of a fixture file's bytes, memoized per build"""
+        if fixture_path not in self.fixture_hashes:
+            digest = hashlib.sha256()
+            try:
+                with open(f'fixtures/{fixture_path}', 'rb') as f:
+                    for block in iter(lambda: f.read(1024 * 1024), b''):
+                        digest.update(block)
+            except OSError:
+                digest.update(b'missing')
+            self.fixture_hashes[fixture_path] = digest.hexdigest()
+
+        return self.fixture_hashes[fixture_path]
+
+    def table_key(self, table_name):
+        """Content key of a table, derived from everything it is built from"""
+        if table_name in self.keys:
+            return self.keys[table_name]
+
+        sections = [config_section(self.config, path) for path in TABLE_INPUTS[table_name]]
+        fixtures = sorted({fixture for section in sections for fixture in find_fixtures(section)})
+        table = self.schema.get_table(table_name)
+
+        inputs = {
+            'table': table_name,
+            'global': self.global_inputs(),
+            'config': sections,
+            'fixtures': {fixture: self.hash_fixture(fixture) for fixture in fixtures},
+            'schema': table.to_dict() if table else None,
+            'upstream': {name: self.table_key(name) for name in self.upstream[table_name]},
+        }
+
+        encoded = json.dumps(inputs, sort_keys=True, default=str).encode('utf-8')
+        self.keys[table_name] = hashlib.sha256(encoded).hexdigest()
+        return self.keys[table_name]
+
+    def cache_file(self, table_name, output_file):
+        key = self.table_key(table_name)
+        extension = os.path.splitext(output_file)[1]
+        return os.path.join(self.folder, key[:2], f'{key}{extension}')
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        folder = os.path.dirname(self.manifest_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.manifest_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+
+    def file_stamp(self, path):
+        stat = os.stat(path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def holds(self, table_name, output_file):
+        """Whether output_file already holds this exact build of the table"""
+        with self.manifest_lock:
+            entry = self.load_manifest().get(output_file)
+        return bool(entry) and entry['key'] == self.table_key(table_name) and \
+            os.path.exists(output_file) and entry['stamp'] == self.file_stamp(output_file)
+
+    def contains(self, table_name, output_file):
+        """Whether restore would find the table, without touching the output"""
+        if not self.enabled:
+            return False
+        return self.holds(table_name, output_file) or os.path.exists(self.cache_file(table_name, output_file))
+
+    def restore(self, table_name, output_file):
+        """Make output_file hold the cached table; returns False on a cache miss"""
+        if not self.enabled:
+            return False
+
+        # The output already holds this exact build: nothing to do
+        if self.holds(table_name, output_file):
+            return True
+
+        key = self.table_key(table_name)
+        cache_file = self.cache_file(table_name, output_file)
+        if not os.path.exists(cache_file):
+            return False
+
+        folder = os.path.dirname(output_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        shutil.copyfile(cache_file, output_file)
+
+        self.record(output_file, key)
+        return True
+
+    def store(self, table_name, output_file):
+        """Copy a freshly generated table into the cache"""
+        if not self.enabled or not os.path.exists(output_file):
+            return
+
+        key = self.table_key(table_name)
+        cache_file = self.cache_file(table_name, output_file)
+        os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+
+        # Write under a temporary name so an interrupted copy is never reused
+        temp_file = cache_file + '.tmp'
+        shutil.copyfile(output_file, temp_file)
+        os.replace(temp_file, cache_file)
+
+        self.record(output_file, key)
+
+    def record(self, output_file, key):
+        """Note in the manifest which build an output file holds"""
+        with self.manifest_lock:
+            manifest = self.load_manifest()
+            manifest[output_file] = {'key': key, 'stamp': self.file_stamp(output_file)}
+            self.save_manifest(manifest)
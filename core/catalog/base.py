@@ -1,73 +1,63 @@
-import json
-import csv
 import os
-import xml.etree.ElementTree as ET
+import numpy as np
 from core.base_generator import BaseGenerator
+from core.output import CsvTableWriter
 
 
 class BaseProductGenerator(BaseGenerator):
     """Base class for product generators"""
     
     def __init__(self, config):
-        self.config = config
-        self.fixture_cache = {}
-        self.schema_path = config.get('schema', 'schema/full_schema.xml')
+        super().__init__(config, None, config.get('output', {}).get('folder', 'outputs'))
         
-    def load_fixture(self, fixture_path):
-        """Load fixture data from JSON file with caching"""
-        if fixture_path in self.fixture_cache:
-            return self.fixture_cache[fixture_path]
+    def random_category_id(self):
+        """A category id from 1 to 10, skewed when the product config has a distribution spec for it"""
+        spec = self.config.get('catalog', {}).get('product', {}).get('distribution', {}).get('category_id')
+        if spec is None:
+            return self.random.randint(1, 10)
+        return 1 + self.get_sampler('category_id', spec, size=10).choice(self.random)
+    
+    def assign_categories(self, chunks, rng, matcher=None, leaves=None):
+        """Set the category_id of each chunk of products in one batch
         
-        full_path = f'fixtures/{fixture_path}'
-        with open(full_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.fixture_cache[fixture_path] = data
-            return data
+        A product gets the first leaf category its name matches, which is
+        also its category_product link, or else one drawn from the leaf ids
+        registered by the category stage. Without registered leaves the ids
+        are random, as when the generator runs on its own.
+        """
+        for chunk in chunks:
+            if chunk and 'category_id' in chunk[0]:
+                if leaves is None:
+                    for product in chunk:
+                        product['category_id'] = self.random_category_id()
+                else:
+                    category_ids = self.leaf_category_ids(rng, [product['name'] for product in chunk], matcher, leaves)
+                    for product, category_id in zip(chunk, category_ids.tolist()):
+                        product['category_id'] = category_id
+            yield chunk
     
-    def extract_fixture_values(self, fixture_path):
-        """Extract values from fixture file based on its structure"""
-        data = self.load_fixture(fixture_path)
+    def leaf_category_ids(self, rng, names, matcher, leaves):
+        """Leaf category id for each product name: its first matching leaf, else one drawn from leaves"""
+        category_ids = np.zeros(len(names), dtype=np.int64)
         
-        # If data is already a list, return it directly
-        if isinstance(data, list):
-            return data
+        if matcher is not None:
+            ids = np.array([category['id'] for category in matcher.categories], dtype=np.int64)
+            leaf_ids = set(ids[leaves.contains(ids)].tolist())
+            for row, name in enumerate(names):
+                category_ids[row] = next(
+                    (category['id'] for category in matcher.match(name) if category['id'] in leaf_ids), 0)
         
-        # Handle different fixture structures
-        if 'brands' in data:
-            return [item['brand'] for item in data['brands']]
-        elif 'materials' in data:
-            return [item['Material'] for item in data['materials']]
-        elif 'gender' in data:
-            return data['gender']
-        elif 'EU_size' in data:
-            return data['EU_size']
-        elif 'UK_size' in data:
-            return data['UK_size']
-        elif 'styles' in data:
-            return data['styles']
-        elif 'products' in data:
-            return data['products']
-        else:
-            # Return first array found
-            for key, value in data.items():
-                if isinstance(value, list):
-                    return value
-            return []
+        # Products stay without a category (0) only when there are no leaves at all
+        unmatched = np.flatnonzero(category_ids == 0)
+        if len(unmatched) and len(leaves):
+            spec = self.config.get('catalog', {}).get('product', {}).get('distribution', {}).get('category_id')
+            sampler = self.get_sampler('category_id', spec, size=len(leaves)) if spec is not None else None
+            category_ids[unmatched] = leaves.sample(rng, len(unmatched), sampler)
+        return category_ids
     
     def get_schema_columns(self, table_name):
-        """Parse XML schema to get column names for a table"""
-        tree = ET.parse(self.schema_path)
-        root = tree.getroot()
-        
-        columns = []
-        for table in root.findall('table'):
-            if table.get('name') == table_name:
-                for column in table.findall('column'):
-                    col_name = column.get('name')
-                    columns.append(col_name)
-                break
-        
-        return columns
+        """Get column names for a table from the shared schema registry"""
+        return list(self.schema.get_column_names(table_name))
     
     def generate(self):
         """Generate products - to be implemented by subclasses"""
@@ -81,20 +71,9 @@ class BaseProductGenerator(BaseGenerator):
             
         os.makedirs('outputs', exist_ok=True)
         
-        # Get schema columns for product table
-        schema_columns = self.get_schema_columns('product')
-        
-        # If schema not found, use product keys
-        if not schema_columns:
-            fieldnames = list(products[0].keys())
-        else:
-            # Use schema columns, but only include those present in products
-            fieldnames = [col for col in schema_columns if col in products[0]]
-        
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction='ignore')
-            writer.writeheader()
-            writer.writerows(products)
+        # Schema column order, keeping only columns present in products; product keys without a schema
+        with CsvTableWriter(output_file, self.get_schema_columns('product')) as writer:
+            writer.write_chunk(products)
         
         print(f"Exported {len(products)} products to: {output_file}")
 
@@ -102,7 +81,6 @@ class BaseProductGenerator(BaseGenerator):
 class CategoryGenerator(BaseGenerator):
     def __init__(self, config):
         self.config = config
-        self.fixture_cache = {}
     
     def generate(self):
         pass
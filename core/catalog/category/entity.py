@@ -1,62 +1,17 @@
-import json
-import csv
 import os
-import random
-import xml.etree.ElementTree as ET
 from core.base_generator import BaseGenerator
+from core.keys import KeyRanges
+from core.output import CsvTableWriter
+from core.stream import chunked
 
 
 class CategoryGenerator(BaseGenerator):
     """Generator for product categories from schema and fixtures"""
     
     def __init__(self, config):
-        self.config = config
-        self.fixture_cache = {}
         self.category_config = config.get('catalog', {}).get('category', {})
-        self.schema_path = config.get('schema', 'schema/full_schema.xml')
-        
-    def load_fixture(self, fixture_path):
-        """Load fixture data from JSON file with caching"""
-        if fixture_path in self.fixture_cache:
-            return self.fixture_cache[fixture_path]
-        
-        full_path = f'fixtures/{fixture_path}'
-        with open(full_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.fixture_cache[fixture_path] = data
-            return data
-    
-    def extract_fixture_values(self, fixture_path):
-        """Extract values from fixture file based on its structure"""
-        data = self.load_fixture(fixture_path)
-        
-        # If data is already a list, return it directly
-        if isinstance(data, list):
-            return data
-        
-        # Handle different fixture structures
-        for key, value in data.items():
-            if isinstance(value, list):
-                return value
+        super().__init__(config, self.category_config.get('fixture', ''), config.get('output', {}).get('folder', 'outputs'))
         
-        return []
-    
-    def get_schema_columns(self, table_name):
-        """Parse XML schema to get column names for a table"""
-        tree = ET.parse(self.schema_path)
-        root = tree.getroot()
-        
-        columns = []
-        for table in root.findall('table'):
-            if table.get('name') == table_name:
-                for column in table.findall('column'):
-                    col_name = column.get('name')
-                    col_type = column.get('{http://www.w3.org/2001/XMLSchema-instance}type')
-                    columns.append({'name': col_name, 'type': col_type})
-                break
-        
-        return columns
-    
     def generate_slug(self, name):
         """Generate URL-friendly slug from category name"""
         return name.lower().replace(' ', '-').replace('&', 'and')
@@ -68,7 +23,25 @@ class CategoryGenerator(BaseGenerator):
             return []
         
         print("Generating categories...")
+        categories = self.build_categories()
+        
+        print(f"Generated {len(categories)} categories")
+        
+        # Export to CSV
+        self.export_to_csv(categories, 'outputs/category.csv')
         
+        return categories
+    
+    def iter_chunks(self, chunk_size=None):
+        """Yield categories in chunks"""
+        if not self.category_config.get('enable', False):
+            print("Category generation disabled in config")
+            return
+        
+        yield from chunked(self.build_categories(), chunk_size or self.get_chunk_size())
+    
+    def build_categories(self):
+        """Build the category tree; bounded by the fixture, so it is kept whole"""
         # Get schema columns
         columns = self.get_schema_columns('category')
         if not columns:
@@ -96,13 +69,13 @@ class CategoryGenerator(BaseGenerator):
         if limit > 0:
             categories = categories[:limit]
         
-        print(f"Generated {len(categories)} categories")
-        
-        # Export to CSV
-        self.export_to_csv(categories, 'outputs/category.csv')
-        
         return categories
     
+    def leaf_keys(self, categories):
+        """Ids of the categories without children, the ones products are placed in"""
+        parent_ids = {category.get('parent_id') for category in categories}
+        return KeyRanges.from_ids([category['id'] for category in categories if category['id'] not in parent_ids])
+    
     def parse_hierarchical_categories(self, data, columns):
         """Parse hierarchical category structure from fixture (3 levels)"""
         categories = []
@@ -162,8 +135,8 @@ class CategoryGenerator(BaseGenerator):
         category = {}
         
         for col in columns:
-            col_name = col['name']
-            col_type = col['type']
+            col_name = col.name
+            col_type = col.type
             
             if col_name == 'id':
                 category[col_name] = cat_id
@@ -190,10 +163,7 @@ class CategoryGenerator(BaseGenerator):
         
         os.makedirs('outputs', exist_ok=True)
         
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = list(categories[0].keys())
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(categories)
+        with CsvTableWriter(output_file) as writer:
+            writer.write_chunk(categories)
         
         print(f"Exported {len(categories)} categories to: {output_file}")
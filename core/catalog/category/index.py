@@ -0,0 +1,170 @@
+import hashlib
+import os
+import pickle
+from collections import deque
+
+
+INDEX_VERSION = 1
+DEFAULT_CACHE_FOLDER = '.cache'
+
+# Process-wide indexes keyed by the hash of their category names
+_indexes = {}
+
+
+class CategoryMatchIndex:
+    """Precomputed matcher over lowercase category names
+
+    A word matches a category when it equals the name, or when either one
+    contains the other. Matches are ranked exact first, then by the order of
+    the names, which is the same order a linear scan over the names gives.
+
+    Names contained in the word are found with an Aho-Corasick automaton over
+    the names; names containing the word are found through a map of every
+    substring of every name. Results are memoized per word.
+    """
+
+    def __init__(self, names):
+        self.names = list(names)
+        self.positions = {name: position for position, name in reversed(list(enumerate(self.names)))}
+        self.substrings = self.build_substrings()
+        self.goto, self.fail, self.outputs = self.build_automaton()
+        self.memo = {}
+
+    @staticmethod
+    def names_key(names):
+        digest = hashlib.sha256(f'{INDEX_VERSION}\n'.encode('utf-8'))
+        for name in names:
+            digest.update(name.encode('utf-8') + b'\0')
+        return digest.hexdigest()
+
+    def build_substrings(self):
+        """Map every substring of every name to the positions of the names containing it"""
+        substrings = {}
+        for position, name in enumerate(self.names):
+            seen = set()
+            for start in range(len(name)):
+                for end in range(start + 1, len(name) + 1):
+                    seen.add(name[start:end])
+            for substring in seen:
+                substrings.setdefault(substring, []).append(position)
+        return substrings
+
+    def build_automaton(self):
+        """Aho-Corasick automaton: goto tables, fail links and the names ending at each state"""
+        goto = [{}]
+        outputs = [[]]
+
+        for position, name in enumerate(self.names):
+            state = 0
+            for char in name:
+                if char not in goto[state]:
+                    goto.append({})
+                    outputs.append([])
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            outputs[state].append(position)
+
+        # Breadth-first fail links; outputs are merged along them so a state lists every name ending there
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in goto[state].items():
+                queue.append(next_state)
+                fallback = fail[state]
+                while fallback and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                fail[next_state] = goto[fallback].get(char, 0) if state else 0
+                outputs[next_state] = outputs[next_state] + outputs[fail[next_state]]
+
+        return goto, fail, outputs
+
+    def names_in(self, word):
+        """Positions of the names that occur inside word"""
+        found = set(self.outputs[0])
+        state = 0
+        for char in word:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found.update(self.outputs[state])
+        return found
+
+    def match_all(self, word):
+        """Positions of every name matching word: the exact name first, then in name order"""
+        if word in self.memo:
+            return self.memo[word]
+
+        partial = self.names_in(word)
+        partial.update(self.substrings.get(word, ()))
+
+        exact = self.positions.get(word)
+        if exact is not None:
+            partial.discard(exact)
+            result = [exact] + sorted(partial)
+        else:
+            result = sorted(partial)
+
+        self.memo[word] = result
+        return result
+
+    def match(self, word):
+        """Position of the best matching name, or None"""
+        result = self.match_all(word)
+        return result[0] if result else None
+
+    def __getstate__(self):
+        # Memoized words depend on the products of a run, so they are not cached
+        state = self.__dict__.copy()
+        state['memo'] = {}
+        return state
+
+    @classmethod
+    def load(cls, names, cache_folder=DEFAULT_CACHE_FOLDER):
+        """Index for a list of names, reused within the process and across runs"""
+        names = list(names)
+        key = cls.names_key(names)
+        if key in _indexes:
+            return _indexes[key]
+
+        cache_file = os.path.join(cache_folder, 'category_index', f'{key}.pickle')
+        try:
+            with open(cache_file, 'rb') as f:
+                index = pickle.load(f)
+        except (OSError, pickle.PickleError, EOFError, AttributeError):
+            index = cls(names)
+            try:
+                os.makedirs(os.path.dirname(cache_file), exist_ok=True)
+                temp_file = cache_file + '.tmp'
+                with open(temp_file, 'wb') as f:
+                    pickle.dump(index, f, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temp_file, cache_file)
+            except OSError:
+                # A read-only checkout just rebuilds the index each run
+                pass
+
+        _indexes[key] = index
+        return index
+
+
+class CategoryMatcher:
+    """Categories matching a product name, by the last word of the name
+
+    The exact name comes first, then names that contain the word or are
+    contained in it, in category order. Categories sharing a name are
+    matched as the last of them.
+    """
+
+    def __init__(self, categories, cache_folder=DEFAULT_CACHE_FOLDER):
+        category_map = {category['name'].lower(): category for category in categories}
+        self.categories = list(category_map.values())
+        self.index = CategoryMatchIndex.load(category_map.keys(), cache_folder)
+
+    def match(self, product_name, limit=None):
+        """Categories matching a product name, best first; at most limit of them when given"""
+        words = product_name.strip().split()
+        if not words:
+            return []
+
+        positions = self.index.match_all(words[-1].lower())
+        return [self.categories[position] for position in positions[:limit]]
@@ -1,6 +1,10 @@
 import random
-import itertools
 from core.catalog.product import BaseProductGenerator
+from core.catalog.product.template import NameTemplate
+from core.catalog.product.variants import VariantSpace
+from core import columnar
+from core.rng import COLUMNS_STREAM, numpy_rng, python_rng, python_seed, stream_seed
+from core.stream import chunked
 
 
 class ConfigurableProductGenerator(BaseProductGenerator):
@@ -9,6 +13,14 @@ class ConfigurableProductGenerator(BaseProductGenerator):
     def __init__(self, config):
         super().__init__(config)
         self.configurable_config = config.get('catalog', {}).get('product', {}).get('configurable', {})
+        self.random = python_rng(config, 'product.configurable')
+        self.name_templates = {}
+        self.rule_templates = {}
+        
+        # Compile every rule up front so a bad template fails before any rows are written
+        if self.configurable_config.get('enable', False):
+            for rule_item in self.configurable_config.get('rules', []):
+                self.get_name_template(rule_item)
     
     def generate_variants(self, rule_config):
         """Generate all possible variants based on rule configuration"""
@@ -25,52 +37,67 @@ class ConfigurableProductGenerator(BaseProductGenerator):
         
         return attributes, variant_counts
     
-    def get_variant_combinations(self, attributes, variant_counts):
-        """Get all possible combinations of variants"""
-        # Prepare variant lists for each attribute
-        variant_lists = {}
+    def variant_samplers(self, rule_config, attributes):
+        """Alias tables for the attributes whose rule config has a distribution spec"""
+        samplers = {}
+        for attr_name, attr_config in rule_config.items():
+            spec = attr_config.get('distribution')
+            if spec is not None and len(attributes[attr_name]):
+                fixture_values = self.extract_fixture_values(attr_config['fixture'])
+                samplers[attr_name] = self.get_sampler(attr_config['fixture'], spec, fixture_values)
+        return samplers
+    
+    def get_variant_combinations(self, attributes, variant_counts, samplers=None):
+        """Pick each attribute's values for a parent and return the lazy space of their combinations"""
+        attr_names = list(attributes.keys())
+        value_lists = []
+        samplers = samplers or {}
         
-        for attr_name, all_values in attributes.items():
+        for attr_name in attr_names:
+            all_values = attributes[attr_name]
             variant_count = variant_counts.get(attr_name, 0)
+            sampler = samplers.get(attr_name)
             
             if variant_count == 0:
                 # Single value - pick one random value for all combinations
-                variant_lists[attr_name] = [random.choice(all_values)]
+                if sampler is None:
+                    value_lists.append([self.random.choice(all_values)])
+                else:
+                    value_lists.append([all_values[sampler.choice(self.random)]])
             else:
                 # Multiple values - select random subset
                 count = min(variant_count, len(all_values))
-                variant_lists[attr_name] = random.sample(all_values, count)
+                if sampler is None:
+                    value_lists.append(self.random.sample(all_values, count))
+                else:
+                    value_lists.append([all_values[index] for index in sampler.sample(self.random, count)])
         
-        # Generate all combinations
-        attr_names = list(variant_lists.keys())
-        attr_values = [variant_lists[name] for name in attr_names]
-        
-        combinations = []
-        for combo in itertools.product(*attr_values):
-            combination_dict = dict(zip(attr_names, combo))
-            combinations.append(combination_dict)
-        
-        return combinations
+        return VariantSpace(attr_names, value_lists)
     
     def generate_product_name(self, rule_template, selected_values):
         """Generate a product name based on rule template with selected attribute values"""
-        name = rule_template
-        
-        for attr_name, value in selected_values.items():
-            name = name.replace(f'{{{{{attr_name}}}}}', str(value))
-        
-        return name.strip()
+        if rule_template not in self.name_templates:
+            self.name_templates[rule_template] = NameTemplate(rule_template)
+        return self.name_templates[rule_template].render(selected_values)
+    
+    def get_name_template(self, rule_item):
+        """Compile a rule's template once, checking its placeholders against the rule's attributes"""
+        rule_name = rule_item['name']
+        if rule_name not in self.rule_templates:
+            fields = rule_item.get('rules', [{}])[0].keys()
+            self.rule_templates[rule_name] = NameTemplate(rule_item['rule'], fields, rule_name)
+        return self.rule_templates[rule_name]
     
     def build_product_from_schema(self, product_data):
         """Build product dictionary based on schema columns"""
-        schema_columns = self.get_schema_columns('product')
+        schema_columns = self.schema.get_column_names('product')
         product = {}
         
         for col in schema_columns:
             if col in product_data:
                 product[col] = product_data[col]
             elif col == 'category_id':
-                product[col] = random.randint(1, 10)
+                product[col] = 0  # Set a chunk at a time by assign_categories
             elif col == 'tax_percent':
                 product[col] = 10
             elif col == 'created_at':
@@ -87,54 +114,142 @@ class ConfigurableProductGenerator(BaseProductGenerator):
             return []
         
         print("Generating configurable products...")
-        all_products = []
+        all_products = [product for chunk in self.iter_chunks() for product in chunk]
+        
+        print(f"Generated {len(all_products)} configurable product variants")
+        
+        return all_products
+    
+    def iter_chunks(self, start_id=1, chunk_size=None, matcher=None, leaves=None):
+        """Yield configurable parents and their children in chunks, with leaf categories when given"""
+        if not self.configurable_config.get('enable', False):
+            print("Configurable products disabled in config")
+            return
+        
+        chunks = chunked(self.iter_rows(start_id), chunk_size or self.get_chunk_size())
+        yield from self.assign_categories(chunks, numpy_rng(self.config, 'product.configurable'), matcher, leaves)
+    
+    def iter_rows(self, start_id=1):
+        """Yield each parent followed by its child products, numbering ids from start_id"""
+        product_id = start_id
+        rules_list = self.configurable_config.get('rules', [])
+        
+        for rule_index, rule_item in enumerate(rules_list):
+            limit = rule_item.get('limit', 100)
+            parent_offset = self.parent_offset(rule_index)
+            
+            for product in self.iter_rule_rows(rule_item, 0, limit, product_id, parent_offset):
+                yield product
+                product_id += 1
+    
+    def parent_offset(self, rule_index):
+        """Parents of the rules before rule_index, so parent skus keep counting across rules"""
         rules_list = self.configurable_config.get('rules', [])
+        return sum(rule_item.get('limit', 100) for rule_item in rules_list[:rule_index])
+    
+    def plan_shards(self, start_id, shard_size, seed_for):
+        """Split each rule's parents into ranges of about shard_size rows"""
+        if not self.configurable_config.get('enable', False):
+            print("Configurable products disabled in config")
+            return
+        
+        product_id = start_id
+        index = 0
         
-        for rule_item in rules_list:
-            rule_name = rule_item['name']
-            rule_template = rule_item['rule']
-            rule_configs = rule_item.get('rules', [{}])[0]  # Get first rule config
+        for rule_index, rule_item in enumerate(self.configurable_config.get('rules', [])):
             limit = rule_item.get('limit', 100)
+            rows_per_parent = self.count_rows_per_parent(rule_item)
+            parents_per_shard = max(1, shard_size // rows_per_parent)
+            
+            for parent_start in range(0, limit, parents_per_shard):
+                parent_count = min(parents_per_shard, limit - parent_start)
+                yield {'rule_index': rule_index, 'parent_start': parent_start,
+                       'parent_count': parent_count, 'start_id': product_id,
+                       'seed': seed_for(index)}
+                product_id += parent_count * rows_per_parent
+                index += 1
+    
+    def count_rows_per_parent(self, rule_item):
+        """A parent plus one child per variant combination, or per sampled combination"""
+        attributes, variant_counts = self.generate_variants(rule_item.get('rules', [{}])[0])
+        
+        combinations = 1
+        for attr_name, values in attributes.items():
+            variant_count = variant_counts.get(attr_name, 0)
+            combinations *= 1 if variant_count == 0 else min(variant_count, len(values))
+        
+        max_variants = rule_item.get('max_variants', 0)
+        if max_variants:
+            combinations = min(combinations, max_variants)
+        
+        return 1 + combinations
+    
+    def build_shard(self, rule_index, parent_start, parent_count, start_id, seed, matcher=None, leaves=None):
+        """Build one range of parents of a rule, with a generator seeded for the shard"""
+        self.random = random.Random(python_seed(seed))
+        rule_item = self.configurable_config['rules'][rule_index]
+        rows = self.iter_rule_rows(rule_item, parent_start, parent_count, start_id, self.parent_offset(rule_index))
+        rng = columnar.new_rng(stream_seed(seed, COLUMNS_STREAM))
+        yield from self.assign_categories(chunked(rows, self.get_chunk_size()), rng, matcher, leaves)
+    
+    def iter_rule_rows(self, rule_item, parent_start, parent_count, start_id, parent_offset=0):
+        """Yield parents parent_start .. parent_start + parent_count - 1 of one rule with their children
+        
+        parent_offset is the number of parents of earlier rules, which parent skus are numbered after.
+        """
+        product_id = start_id
+        rule_name = rule_item['name']
+        name_template = self.get_name_template(rule_item)
+        rule_configs = rule_item.get('rules', [{}])[0]  # Get first rule config
+        max_variants = rule_item.get('max_variants', 0)
+        
+        # Generate variants configuration
+        attributes, variant_counts = self.generate_variants(rule_configs)
+        samplers = self.variant_samplers(rule_configs, attributes)
+        
+        # Generate parent configurable products
+        for i in range(parent_start, parent_start + parent_count):
+            parent_sku = f"G2IL-{parent_offset + i + 1:05d}"
             
-            # Generate variants configuration
-            attributes, variant_counts = self.generate_variants(rule_configs)
+            # Get all variant combinations for this parent
+            combinations = self.get_variant_combinations(attributes, variant_counts, samplers)
             
-            # Generate parent configurable products
-            for i in range(limit):
-                parent_sku = f"G2IL-{i+1:05d}"
-                
-                # Get all variant combinations for this parent
-                combinations = self.get_variant_combinations(attributes, variant_counts)
-                
-                # Create parent configurable product
-                # Use first combination to get brand for parent name
-                first_combo = combinations[0] if combinations else {}
-                parent_name = self.generate_product_name(rule_template, first_combo)
-                parent_brand = first_combo.get('brand', '')
-                
-                parent_data = {
-                    'id': len(all_products) + 1,
-                    'sku': parent_sku,
-                    'name': parent_name,
-                    'brand': parent_brand,
-                    'price': 0,  # Parent products typically don't have price
-                    'status': 'Enabled',
-                    'visibility': 'Catalog, Search',
-                    'product_type': 'configurable'
-                }
-                
-                all_products.append(self.build_product_from_schema(parent_data))
+            # Create parent configurable product
+            # Use first combination to get brand for parent name
+            first_combo = combinations.combination(0) if len(combinations) else {}
+            parent_name = name_template.render(first_combo)
+            parent_brand = first_combo.get('brand', '')
+            
+            parent_data = {
+                'id': product_id,
+                'sku': parent_sku,
+                'name': parent_name,
+                'brand': parent_brand,
+                'price': 0,  # Parent products typically don't have price
+                'status': 'Enabled',
+                'visibility': 'Catalog, Search',
+                'product_type': 'configurable'
+            }
+            
+            yield self.build_product_from_schema(parent_data)
+            product_id += 1
+            
+            # Generate child products for each combination, or for max_variants of them drawn at random
+            for indices in combinations.indices(self.random, max_variants):
+                columns = combinations.columns(indices)
+                names = name_template.render_columns(columns, len(indices))
+                brands = columns.get('brand')
                 
-                # Generate child products for each combination
-                for j, selected_values in enumerate(combinations, 1):
-                    product_name = self.generate_product_name(rule_template, selected_values)
+                for k, index in enumerate(indices.tolist()):
+                    product_name = names[k]
                     
-                    child_sku = f"{parent_sku}-{j:03d}"
-                    product_price = round(random.uniform(10, 500), 2)
-                    brand = selected_values.get('brand', '')
+                    # The suffix is the combination's index, so a sampled child keeps its sku
+                    child_sku = f"{parent_sku}-{index + 1:03d}"
+                    product_price = round(self.random.uniform(10, 500), 2)
+                    brand = brands[k] if brands is not None else ''
                     
                     child_data = {
-                        'id': len(all_products) + 1,
+                        'id': product_id,
                         'sku': child_sku,
                         'name': product_name,
                         'brand': brand,
@@ -144,8 +259,5 @@ class ConfigurableProductGenerator(BaseProductGenerator):
                         'product_type': 'simple'
                     }
                     
-                    all_products.append(self.build_product_from_schema(child_data))
-        
-        print(f"Generated {len(all_products)} configurable product variants")
-        
-        return all_products
+                    yield self.build_product_from_schema(child_data)
+                    product_id += 1
@@ -1,5 +1,6 @@
-import random
 from core.catalog.product import BaseProductGenerator
+from core.rng import numpy_rng, python_rng
+from core.stream import chunked
 
 
 class SimpleProductGenerator(BaseProductGenerator):
@@ -8,6 +9,7 @@ class SimpleProductGenerator(BaseProductGenerator):
     def __init__(self, config):
         super().__init__(config)
         self.simple_config = config.get('catalog', {}).get('product', {}).get('simple', {})
+        self.random = python_rng(config, 'product.simple')
     
     def generate(self):
         """Generate simple products from fixture file"""
@@ -15,14 +17,35 @@ class SimpleProductGenerator(BaseProductGenerator):
             print("Simple products disabled in config")
             return []
         
+        print("Generating simple products...")
+        products = [product for chunk in self.iter_chunks() for product in chunk]
+        
+        print(f"Generated {len(products)} simple products")
+        
+        return products
+    
+    def iter_chunks(self, start_id=1, chunk_size=None, matcher=None, leaves=None):
+        """Yield simple products in chunks, numbering ids from start_id
+        
+        matcher and leaves, the category names and the registered leaf
+        category ids, give each product a real leaf category.
+        """
+        if not self.simple_config.get('enable', False):
+            print("Simple products disabled in config")
+            return
+        
+        chunks = chunked(self.iter_rows(start_id), chunk_size or self.get_chunk_size())
+        yield from self.assign_categories(chunks, numpy_rng(self.config, 'product.simple'), matcher, leaves)
+    
+    def iter_rows(self, start_id=1):
+        """Yield simple products one at a time from fixture file"""
         fixture_path = self.simple_config.get('fixture', '')
         limit = self.simple_config.get('limit', 0)
         
         if not fixture_path:
             print("No fixture file specified for simple products")
-            return []
+            return
         
-        print("Generating simple products...")
         products_list = self.extract_fixture_values(fixture_path)
         
         # Apply limit if specified (0 means all)
@@ -30,18 +53,17 @@ class SimpleProductGenerator(BaseProductGenerator):
             products_list = products_list[:limit]
         
         # Get schema columns
-        schema_columns = self.get_schema_columns('product')
+        schema_columns = self.schema.get_column_names('product')
         
-        products = []
         for i, product_name in enumerate(products_list, 1):
             product_sku = f"GIL-{i:05d}"
-            product_price = round(random.uniform(10, 500), 2)
+            product_price = round(self.random.uniform(10, 500), 2)
             
             # Build product based on schema
             product = {}
             for col in schema_columns:
                 if col == 'id':
-                    product[col] = i
+                    product[col] = start_id + i - 1
                 elif col == 'sku':
                     product[col] = product_sku
                 elif col == 'name':
@@ -51,7 +73,7 @@ class SimpleProductGenerator(BaseProductGenerator):
                 elif col == 'brand':
                     product[col] = ''
                 elif col == 'category_id':
-                    product[col] = random.randint(1, 10)
+                    product[col] = 0  # Set a chunk at a time by assign_categories
                 elif col == 'tax_percent':
                     product[col] = 10
                 elif col == 'status':
@@ -65,8 +87,4 @@ class SimpleProductGenerator(BaseProductGenerator):
                 else:
                     product[col] = ''
             
-            products.append(product)
-        
-        print(f"Generated {len(products)} simple products")
-        
-        return products
\ No newline at end of file
+            yield product
@@ -1,36 +1,22 @@
-import json
-import csv
 import os
-import random
-import xml.etree.ElementTree as ET
+import numpy as np
+from core import columnar
 from core.base_generator import BaseGenerator
+from core.output import CsvTableWriter
+from core.rng import numpy_rng, stream_seed
+from core.table import CategoricalColumn, ColumnTable
+
+
+STOCK_STATUSES = ['In Stock', 'Low Stock', 'Out of Stock']
 
 
 class StockInventoryGenerator(BaseGenerator):
     """Generator for product stock inventory from schema"""
     
     def __init__(self, config):
-        self.config = config
-        self.fixture_cache = {}
         self.stock_config = config.get('catalog', {}).get('stock_inventory', {})
-        self.schema_path = config.get('schema', 'schema/full_schema.xml')
-        
-    def get_schema_columns(self, table_name):
-        """Parse XML schema to get column names for a table"""
-        tree = ET.parse(self.schema_path)
-        root = tree.getroot()
-        
-        columns = []
-        for table in root.findall('table'):
-            if table.get('name') == table_name:
-                for column in table.findall('column'):
-                    col_name = column.get('name')
-                    col_type = column.get('{http://www.w3.org/2001/XMLSchema-instance}type')
-                    columns.append({'name': col_name, 'type': col_type})
-                break
-        
-        return columns
-    
+        super().__init__(config, None, config.get('output', {}).get('folder', 'outputs'))
+        
     def generate_warehouse_name(self, warehouse_id):
         """Generate warehouse name based on ID"""
         warehouse_names = [
@@ -57,67 +43,128 @@ class StockInventoryGenerator(BaseGenerator):
         
         print("Generating stock inventory...")
         
-        # Get schema columns
+        if not products:
+            print("No products available")
+            return []
+        
+        # Same columns, drawn from the same seed, as the stock stage of a build
+        product_ids = [product.get('id', 0) for product in products]
+        stock_records = [record for chunk in self.iter_column_chunks(product_ids) for record in chunk.rows()]
+        
+        print(f"Generated {len(stock_records)} stock inventory records")
+        
+        # Export to CSV
+        self.export_to_csv(stock_records, 'outputs/stock_inventory.csv')
+        
+        return stock_records
+    
+    def iter_chunks(self, product_ids, chunk_size=None):
+        """Yield stock records in chunks for a stream of product ids"""
+        yield from self.iter_column_chunks(np.fromiter(product_ids, dtype=np.int64), chunk_size)
+    
+    def iter_column_chunks(self, product_ids, chunk_size=None, seed=None):
+        """Yield stock records as column arrays, one chunk of products at a time"""
+        if not self.stock_config.get('enable', False):
+            print("Stock inventory generation disabled in config")
+            return
+        
         columns = self.get_schema_columns('stock_inventory')
         if not columns:
             print("No schema found for 'stock_inventory' table")
-            return []
+            return
         
-        if not products:
-            print("No products available")
-            return []
+        rng = numpy_rng(self.config, 'stock_inventory') if seed is None else columnar.new_rng(seed)
+        product_ids = np.asarray(product_ids, dtype=np.int64)
+        chunk_size = chunk_size or self.get_chunk_size()
+        stock_id = 1
         
-        # Get number of warehouses
-        num_warehouses = self.stock_config.get('warehouses', 3)
+        for offset in range(0, len(product_ids), chunk_size):
+            table = self.build_columns(rng, product_ids[offset:offset + chunk_size], stock_id, columns)
+            stock_id += columnar.row_count(table)
+            yield table
+    
+    def plan_shards(self, product_ids, shard_size, seed_for):
+        """Split product ids into fixed ranges and fix the first stock id of each"""
+        if not self.stock_config.get('enable', False):
+            print("Stock inventory generation disabled in config")
+            return
         
-        # Generate stock records
-        stock_records = []
+        product_ids = np.asarray(product_ids, dtype=np.int64)
         stock_id = 1
         
-        for product in products:
-            # Each product exists in 1 to num_warehouses
-            num_locations = random.randint(1, num_warehouses)
-            selected_warehouses = random.sample(range(1, num_warehouses + 1), num_locations)
+        for index, offset in enumerate(range(0, len(product_ids), shard_size)):
+            shard_ids = product_ids[offset:offset + shard_size]
+            seed = seed_for(index)
+            yield {'product_ids': shard_ids, 'start_id': stock_id, 'seed': seed}
             
-            for warehouse_id in selected_warehouses:
-                stock_record = {}
-                
-                for col in columns:
-                    col_name = col['name']
-                    col_type = col['type']
-                    
-                    if col_name == 'id':
-                        stock_record[col_name] = stock_id
-                    elif col_name == 'product_id':
-                        stock_record[col_name] = product.get('id', 0)
-                    elif col_name == 'warehouse_id':
-                        stock_record[col_name] = warehouse_id
-                    elif col_name == 'warehouse_name':
-                        stock_record[col_name] = self.generate_warehouse_name(warehouse_id)
-                    elif col_name == 'stock_status':
-                        # Random stock status
-                        stock_record[col_name] = random.choice(['In Stock', 'Low Stock', 'Out of Stock'])
-                    elif col_name == 'stock_quantity':
-                        # Random quantity based on status
-                        status = stock_record.get('stock_status', 'In Stock')
-                        if status == 'Out of Stock':
-                            stock_record[col_name] = 0
-                        elif status == 'Low Stock':
-                            stock_record[col_name] = random.randint(1, 10)
-                        else:  # In Stock
-                            stock_record[col_name] = random.randint(50, 1000)
-                    else:
-                        stock_record[col_name] = ''
-                
-                stock_records.append(stock_record)
-                stock_id += 1
+            # Counts come from their own stream, so they are cheap to replay here
+            stock_id += int(self.location_counts(seed, len(shard_ids)).sum())
+    
+    def location_counts(self, seed, product_count):
+        """Warehouses per product for a shard, drawn from the shard's count stream"""
+        num_warehouses = self.stock_config.get('warehouses', 3)
+        rng = columnar.new_rng(stream_seed(seed, 0))
+        return columnar.random_ints(rng, 1, num_warehouses, product_count)
+    
+    def build_shard(self, product_ids, start_id, seed):
+        """Build the stock records of one shard of products in chunks"""
+        columns = self.get_schema_columns('stock_inventory')
+        if not columns:
+            return
         
-        print(f"Generated {len(stock_records)} stock inventory records")
+        counts = self.location_counts(seed, len(product_ids))
+        rng = columnar.new_rng(stream_seed(seed, 1))
+        chunk_size = self.get_chunk_size()
         
-        # Export to CSV
-        self.export_to_csv(stock_records, 'outputs/stock_inventory.csv')
+        for offset in range(0, len(product_ids), chunk_size):
+            chunk_ids = product_ids[offset:offset + chunk_size]
+            table = self.build_columns(rng, chunk_ids, start_id, columns, counts[offset:offset + chunk_size])
+            start_id += columnar.row_count(table)
+            yield table
+    
+    def build_columns(self, rng, product_ids, start_id, columns, counts=None):
+        """Build whole stock columns for a batch of product ids"""
+        num_warehouses = self.stock_config.get('warehouses', 3)
         
-        return stock_records
+        # Each product exists in 1 to num_warehouses distinct warehouses
+        if counts is None:
+            repeated_ids, counts = columnar.expand_counts(rng, product_ids, 1, num_warehouses)
+        else:
+            repeated_ids = np.repeat(product_ids, counts)
+        warehouse_ids = columnar.sample_without_replacement(rng, counts, num_warehouses)
+        count = len(repeated_ids)
+        
+        warehouse_names = columnar.as_array(
+            [self.generate_warehouse_name(i) for i in range(1, num_warehouses + 1)]
+        )
+        
+        # Quantity depends on status: none when out, 1-10 when low, 50-1000 otherwise
+        status_codes = rng.integers(0, len(STOCK_STATUSES), count)
+        quantities = np.where(
+            status_codes == 1,
+            columnar.random_ints(rng, 1, 10, count),
+            columnar.random_ints(rng, 50, 1000, count),
+        )
+        quantities[status_codes == 2] = 0
+        
+        table = {}
+        for col in columns:
+            if col.name == 'id':
+                table[col.name] = columnar.sequential_ids(start_id, count)
+            elif col.name == 'product_id':
+                table[col.name] = repeated_ids
+            elif col.name == 'warehouse_id':
+                table[col.name] = warehouse_ids
+            elif col.name == 'warehouse_name':
+                table[col.name] = CategoricalColumn(warehouse_ids - 1, warehouse_names)
+            elif col.name == 'stock_status':
+                table[col.name] = CategoricalColumn(status_codes, STOCK_STATUSES)
+            elif col.name == 'stock_quantity':
+                table[col.name] = quantities
+            else:
+                table[col.name] = columnar.constant('', count)
+        
+        return ColumnTable(table, 'stock_inventory')
     
     def export_to_csv(self, stock_records, output_file):
         """Export stock records to CSV file"""
@@ -127,10 +174,7 @@ class StockInventoryGenerator(BaseGenerator):
         
         os.makedirs('outputs', exist_ok=True)
         
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = list(stock_records[0].keys())
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(stock_records)
+        with CsvTableWriter(output_file) as writer:
+            writer.write_chunk(stock_records)
         
         print(f"Exported {len(stock_records)} stock records to: {output_file}")
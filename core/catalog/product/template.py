@@ -0,0 +1,78 @@
+import re
+
+import numpy as np
+from core import columnar
+
+
+PLACEHOLDER = re.compile(r'\{\{(\w+)\}\}')
+
+
+class TemplateError(ValueError):
+    """A rule template that cannot be compiled"""
+
+
+class KeepPlaceholders(dict):
+    """Values for str.format_map that leave fields without a value as written"""
+
+    def __missing__(self, key):
+        return '{{' + key + '}}'
+
+
+class NameTemplate:
+    """A rule like "{{brand}} {{size}} Bag" compiled once into literal and placeholder segments
+
+    When the attribute names of the rule are given, unknown placeholders and
+    stray braces are rejected here instead of ending up in product names.
+    """
+
+    def __init__(self, template, fields=None, rule_name=None):
+        self.template = template
+        self.rule_name = rule_name or template
+        self.segments = []
+
+        position = 0
+        for match in PLACEHOLDER.finditer(template):
+            self.add_literal(template[position:match.start()])
+            self.segments.append((True, match.group(1)))
+            position = match.end()
+        self.add_literal(template[position:])
+
+        self.fields = tuple(text for is_field, text in self.segments if is_field)
+        if fields is not None:
+            unknown = [field for field in self.fields if field not in fields]
+            if unknown:
+                raise TemplateError(
+                    f"Unknown placeholder {{{{{unknown[0]}}}}} in rule '{self.rule_name}'; "
+                    f"known attributes: {', '.join(fields) or 'none'}")
+
+        # Compiled to a single format string so rendering is one C-level call
+        self.format_string = ''.join(
+            '{' + text + '}' if is_field else text.replace('{', '{{').replace('}', '}}')
+            for is_field, text in self.segments
+        )
+
+    def add_literal(self, text):
+        if '{{' in text or '}}' in text:
+            raise TemplateError(f"Malformed placeholder in rule '{self.rule_name}': {self.template!r}")
+        if text:
+            self.segments.append((False, text))
+
+    def render(self, values):
+        """Fill placeholders from a dict of attribute values"""
+        return self.format_string.format_map(KeepPlaceholders(values)).strip()
+
+    def render_columns(self, columns, count):
+        """Render count names at once from {attribute: array of values}"""
+        parts = []
+        for is_field, text in self.segments:
+            if not is_field:
+                parts.append(text)
+            elif text in columns:
+                parts.append(np.asarray(columns[text]).astype(str).astype(object))
+            else:
+                parts.append('{{' + text + '}}')
+
+        names = columnar.concat(*parts) if parts else ''
+        if not isinstance(names, np.ndarray):
+            names = columnar.constant(names, count)
+        return np.char.strip(names.astype(str)).astype(object)
@@ -0,0 +1,70 @@
+import itertools
+import math
+
+import numpy as np
+from core import columnar
+
+
+# Combination indices decoded at a time when a whole space is enumerated
+INDEX_SLICE_SIZE = 10000
+
+
+class VariantSpace:
+    """Variant combinations of one parent, addressed by a mixed-radix index
+
+    Each attribute is a digit whose radix is its number of values, with the
+    last attribute varying fastest, so index order is the itertools.product
+    order. Combinations are only built when they are asked for.
+    """
+
+    def __init__(self, attr_names, value_lists):
+        self.attr_names = tuple(attr_names)
+        self.value_lists = [list(values) for values in value_lists]
+        self.radices = [len(values) for values in self.value_lists]
+        self.size = math.prod(self.radices)
+
+    def __len__(self):
+        return self.size
+
+    def combination(self, index):
+        """The combination at a mixed-radix index, as {attribute: value}"""
+        if not 0 <= index < self.size:
+            raise IndexError(f"Variant index {index} out of range for {self.size} combinations")
+
+        values = [None] * len(self.radices)
+        for position in range(len(self.radices) - 1, -1, -1):
+            index, digit = divmod(index, self.radices[position])
+            values[position] = self.value_lists[position][digit]
+        return dict(zip(self.attr_names, values))
+
+    def __iter__(self):
+        for values in itertools.product(*self.value_lists):
+            yield dict(zip(self.attr_names, values))
+
+    def indices(self, random=None, limit=0, slice_size=INDEX_SLICE_SIZE):
+        """Yield all combination indices, or limit of them drawn at random, in index order
+
+        The whole space comes in arrays of at most slice_size indices, so it
+        is never held at once. Sampling draws from the range without
+        enumerating it, so it costs O(limit) however large the space is.
+        """
+        if not limit or limit >= self.size:
+            for start in range(0, self.size, slice_size):
+                yield np.arange(start, min(start + slice_size, self.size), dtype=np.int64)
+            return
+        yield np.array(sorted(random.sample(range(self.size), limit)), dtype=np.int64)
+
+    def items(self, random=None, limit=0):
+        """Yield (index, combination) pairs for the indices chosen by indices()"""
+        for indices in self.indices(random, limit):
+            for index in indices.tolist():
+                yield index, self.combination(index)
+
+    def columns(self, indices):
+        """Decode many indices at once into {attribute: array of values}"""
+        indices = np.asarray(indices, dtype=np.int64)
+        columns = {}
+        for position in range(len(self.radices) - 1, -1, -1):
+            indices, digits = np.divmod(indices, self.radices[position])
+            columns[self.attr_names[position]] = columnar.as_array(self.value_lists[position])[digits]
+        return {name: columns[name] for name in self.attr_names}
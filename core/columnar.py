@@ -0,0 +1,170 @@
+import string
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+
+ASCII_LETTERS = np.frombuffer(string.ascii_letters.encode('ascii'), dtype='S1')
+
+
+def new_rng(seed=None):
+    """Create the numpy Generator used to build whole columns at once"""
+    return np.random.default_rng(seed)
+
+
+def sequential_ids(start_id, count):
+    """Consecutive integer ids starting at start_id"""
+    return np.arange(start_id, start_id + count, dtype=np.int64)
+
+
+def row_count(table):
+    """Number of rows in a table of equal-length columns"""
+    for values in table.values():
+        return len(values)
+    return 0
+
+
+def as_array(values):
+    """Fixture values as a numpy array, keeping strings as Python objects"""
+    array = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def chunk_column(chunk, name):
+    """One column of a chunk, whether a list of row dicts or a table of columns"""
+    if isinstance(chunk, list):
+        return [row.get(name) for row in chunk]
+    return chunk[name]
+
+
+def integer_keys(values):
+    """Integer ids of a column and where they are present; ids read back from CSV are strings"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        return values.astype(np.int64, copy=False), np.ones(len(values), dtype=bool)
+
+    values = values.tolist() if hasattr(values, 'tolist') else list(values)
+    try:
+        # Key columns rarely have gaps, and numpy parses a whole column of digits at once
+        return np.array(values, dtype=np.int64), np.ones(len(values), dtype=bool)
+    except (TypeError, ValueError):
+        pass
+    present = np.array([value not in (None, '') for value in values], dtype=bool)
+    keys = np.array([int(value) if value not in (None, '') else 0 for value in values], dtype=np.int64)
+    return keys, present
+
+
+def pick(rng, values, count, sampler=None):
+    """Pick count values from a fixture array, uniformly unless an alias table sampler is given"""
+    if sampler is not None:
+        return values[sampler.draw(rng, count)]
+    return values[rng.integers(0, len(values), count)]
+
+
+def random_ints(rng, low, high, count):
+    """Random integers in the inclusive range [low, high]"""
+    return rng.integers(low, high + 1, count)
+
+
+def to_strings(values):
+    """Numeric arrays as an array of Python strings"""
+    return np.array(list(map(str, values.tolist())), dtype=object)
+
+
+def concat(*parts):
+    """Element-wise string concatenation of arrays and scalars"""
+    result = None
+    for part in parts:
+        if isinstance(part, np.ndarray) and part.dtype != object:
+            part = to_strings(part)
+        result = part if result is None else result + part
+    return result
+
+
+@lru_cache(maxsize=None)
+def number_strings(low, high):
+    """Lookup table of the decimal strings for low..high"""
+    return to_strings(np.arange(low, high + 1))
+
+
+def random_number_strings(rng, low, high, count):
+    """Random integers in [low, high] already formatted as strings"""
+    return number_strings(low, high)[rng.integers(0, high - low + 1, count)]
+
+
+def padded_numbers(values, width):
+    """Integers as zero-padded strings of at least width digits"""
+    return np.char.zfill(values.astype(str), width).astype(object)
+
+
+def random_phones(rng, count):
+    """US phone numbers formatted as +1-AAA-EEE-NNNN"""
+    return ('+1-' + random_number_strings(rng, 200, 999, count)
+            + '-' + random_number_strings(rng, 200, 999, count)
+            + '-' + random_number_strings(rng, 1000, 9999, count))
+
+
+@lru_cache(maxsize=None)
+def date_strings(start_year, end_year):
+    """Lookup table of every YYYY-MM-DD date from Jan 1 of start_year to Dec 31 of end_year"""
+    start = np.datetime64(date(start_year, 1, 1), 'D')
+    end = np.datetime64(date(end_year, 12, 31), 'D')
+    return np.arange(start, end + 1).astype(str).astype(object)
+
+
+def random_dates(rng, count, start_year=1950, end_year=2005):
+    """Random YYYY-MM-DD dates between Jan 1 of start_year and Dec 31 of end_year"""
+    dates = date_strings(start_year, end_year)
+    # Like random.randrange(days_between), the last day itself is never drawn
+    return dates[rng.integers(0, len(dates) - 1, count)]
+
+
+def random_timestamps(rng, count, start_date, end_date):
+    """Random second-resolution datetime64 values from start_date up to the end of end_date"""
+    start = np.datetime64(start_date, 's')
+    end = np.datetime64(end_date, 'D') + np.timedelta64(1, 'D')
+    seconds = rng.integers(0, int((end - start) / np.timedelta64(1, 's')), count)
+    return start + seconds.astype('timedelta64[s]')
+
+
+def timestamp_strings(values):
+    """datetime64 values formatted as YYYY-MM-DD HH:MM:SS"""
+    text = np.datetime_as_string(values, unit='s')
+    return np.char.replace(text, 'T', ' ').astype(object)
+
+
+def round_money(values):
+    """Round amounts to cents"""
+    return np.round(values, 2)
+
+
+def random_strings(rng, count, length=10):
+    """Random ASCII letter strings of a fixed length"""
+    letters = ASCII_LETTERS[rng.integers(0, len(ASCII_LETTERS), (count, length))]
+    return letters.view(f'S{length}').ravel().astype(str).astype(object)
+
+
+def constant(value, count):
+    """A column repeating a single value"""
+    return np.full(count, value, dtype=object)
+
+
+def expand_counts(rng, parent_ids, low, high):
+    """Give each parent id between low and high children; returns the repeated parent ids"""
+    counts = random_ints(rng, low, high, len(parent_ids))
+    return np.repeat(parent_ids, counts), counts
+
+
+def sample_without_replacement(rng, counts, population):
+    """For each count, draw that many distinct values from 1..population in random order"""
+    order = np.argsort(rng.random((len(counts), population)), axis=1) + 1
+    mask = np.arange(population) < counts[:, None]
+    return order[mask]
+
+
+def default_column(rng, column_type, count):
+    """Fallback values for columns a generator has no rule for"""
+    if column_type == 'int':
+        return random_ints(rng, 0, 100, count)
+    return constant('', count)
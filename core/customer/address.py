@@ -1,185 +1,210 @@
-import json
-import csv
 import os
-import random
-import xml.etree.ElementTree as ET
+from functools import partial
+import numpy as np
+from core import columnar, sampling
 from core.base_generator import BaseGenerator
+from core.keys import OwnedKeys
+from core.output import CsvTableWriter
+from core.rng import COLUMNS_STREAM, stream_seed, table_seed
+from core.table import CategoricalColumn, ColumnTable, pick_categorical
+
+
+STREET_NAMES = ['Main St', 'Oak Ave', 'Maple Dr', 'Park Blvd', 'Cedar Ln',
+                'Elm St', 'Washington Ave', 'Lake Dr', 'Hill Rd', 'Forest Ave']
+CITIES = ['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix',
+          'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose']
+REGIONS = ['NY', 'CA', 'IL', 'TX', 'AZ', 'PA', 'FL', 'OH', 'MI', 'WA']
+
+# Map schema fields to fixture fields
+FIXTURE_FIELD_MAPPING = {
+    'street': 'address',  # fixture 'address' -> schema 'street'
+    'region': 'state',    # fixture 'state' -> schema 'region'
+    'zipcode': 'zip',     # fixture 'zip' -> schema 'zipcode'
+    'city': 'city',       # same name
+}
+
+
+def address_counts(seed, customer_count, max_addresses):
+    """Addresses of each of a range of customers, drawn from the range's count stream"""
+    rng = columnar.new_rng(stream_seed(seed, 0))
+    return columnar.random_ints(rng, 1, max_addresses, customer_count)
 
 
 class CustomerAddressGenerator(BaseGenerator):
     """Generator for customer addresses from schema and fixtures"""
     
     def __init__(self, config):
-        self.config = config
-        self.fixture_cache = {}
         self.address_config = config.get('customer', {}).get('address', {})
-        self.schema_path = config.get('schema', 'schema/full_schema.xml')
-        
-    def load_fixture(self, fixture_path):
-        """Load fixture data from JSON file with caching"""
-        if fixture_path in self.fixture_cache:
-            return self.fixture_cache[fixture_path]
-        
-        full_path = f'fixtures/{fixture_path}'
-        with open(full_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.fixture_cache[fixture_path] = data
-            return data
-    
-    def extract_fixture_values(self, fixture_path):
-        """Extract values from fixture file based on its structure"""
-        data = self.load_fixture(fixture_path)
+        super().__init__(config, self.address_config.get('fixture', ''), config.get('output', {}).get('folder', 'outputs'))
         
-        # If data is already a list, return it directly
-        if isinstance(data, list):
-            return data
+    def generate(self, customer_count=100):
+        """Generate customer addresses from schema and fixtures"""
+        if not self.address_config.get('enable', False):
+            print("Customer address generation disabled in config")
+            return []
         
-        # Handle different fixture structures
-        for key, value in data.items():
-            if isinstance(value, list):
-                return value
+        print("Generating customer addresses...")
+        # Same columns, drawn from the same seed, as the address stage of a build
+        addresses = [record for chunk in self.iter_chunks(customer_count) for record in chunk.rows()]
         
-        return []
-    
-    def get_schema_columns(self, table_name):
-        """Parse XML schema to get column names for a table"""
-        tree = ET.parse(self.schema_path)
-        root = tree.getroot()
-        
-        columns = []
-        for table in root.findall('table'):
-            if table.get('name') == table_name:
-                for column in table.findall('column'):
-                    col_name = column.get('name')
-                    col_type = column.get('{http://www.w3.org/2001/XMLSchema-instance}type')
-                    columns.append({'name': col_name, 'type': col_type})
-                break
-        
-        return columns
+        print(f"Generated {len(addresses)} customer addresses")
+        
+        # Export to CSV
+        self.export_to_csv(addresses, 'outputs/customer_address.csv')
+        
+        return addresses
     
-    def generate_random_street(self):
-        """Generate random street address"""
-        street_numbers = random.randint(1, 9999)
-        street_names = ['Main St', 'Oak Ave', 'Maple Dr', 'Park Blvd', 'Cedar Ln', 
-                       'Elm St', 'Washington Ave', 'Lake Dr', 'Hill Rd', 'Forest Ave']
-        return f"{street_numbers} {random.choice(street_names)}"
+    def iter_chunks(self, customer_count=100, chunk_size=None):
+        """Yield customer addresses in chunks"""
+        yield from self.iter_column_chunks(customer_count, chunk_size)
     
-    def generate_random_zipcode(self):
-        """Generate random US zipcode"""
-        return f"{random.randint(10000, 99999)}"
+    def iter_column_chunks(self, customer_count=100, chunk_size=None, seed=None):
+        """Yield addresses as column arrays, chunk_size customers at a time"""
+        if not self.address_config.get('enable', False):
+            print("Customer address generation disabled in config")
+            return
+        
+        if not self.get_schema_columns('customer_address'):
+            print("No schema found for 'customer_address' table")
+            return
+        
+        for shard in self.plan_chunks(customer_count, chunk_size, seed):
+            yield from self.build_shard(**shard)
     
-    def generate_random_value(self, column_name, column_type):
-        """Generate random value based on column name and type"""
-        if column_name == 'id':
-            return None  # Will be auto-incremented
-        elif column_name == 'street':
-            return self.generate_random_street()
-        elif column_name == 'zipcode':
-            return self.generate_random_zipcode()
-        elif column_name == 'city':
-            return random.choice(['New York', 'Los Angeles', 'Chicago', 'Houston', 'Phoenix', 
-                                 'Philadelphia', 'San Antonio', 'San Diego', 'Dallas', 'San Jose'])
-        elif column_name == 'region':
-            return random.choice(['NY', 'CA', 'IL', 'TX', 'AZ', 'PA', 'FL', 'OH', 'MI', 'WA'])
-        elif column_name == 'country':
-            return 'US'
-        elif column_type == 'int':
-            return random.randint(0, 100)
-        elif column_type == 'varchar':
-            return ''
-        else:
-            return ''
+    def plan_chunks(self, customer_count, chunk_size=None, seed=None):
+        """Plan unsharded addresses like shards of one chunk of customers each"""
+        if seed is None:
+            seed = table_seed(self.config, 'customer_address', COLUMNS_STREAM)
+        return self.plan_shards(customer_count, chunk_size or self.get_chunk_size(), lambda index: stream_seed(seed, index))
     
-    def generate(self, customer_count=100):
-        """Generate customer addresses from schema and fixtures"""
+    def plan_shards(self, customer_count, shard_size, seed_for):
+        """Split customers into fixed ranges and fix the first address id of each"""
         if not self.address_config.get('enable', False):
             print("Customer address generation disabled in config")
-            return []
+            return
         
-        print("Generating customer addresses...")
+        address_id = 1
         
-        # Get schema columns
+        for index, customer_start in enumerate(range(1, customer_count + 1, shard_size)):
+            count = min(shard_size, customer_count - customer_start + 1)
+            seed = seed_for(index)
+            yield {'customer_start': customer_start, 'customer_count': count,
+                   'start_id': address_id, 'seed': seed}
+            
+            # Counts come from their own stream, so they are cheap to replay here
+            address_id += int(self.address_counts(seed, count).sum())
+    
+    def address_counts(self, seed, customer_count):
+        """Addresses per customer for a shard, drawn from the shard's count stream"""
+        return address_counts(seed, customer_count, self.address_config.get('max_address_per_customer', 2))
+    
+    def owned_keys(self, shards):
+        """Address ids of planned shards by customer, for customers to pick their default addresses from"""
+        max_addresses_per_customer = self.address_config.get('max_address_per_customer', 2)
+        keys = OwnedKeys(partial(address_counts, max_addresses=max_addresses_per_customer))
+        for shard in shards:
+            keys.add(shard['customer_start'], shard['customer_count'], shard['start_id'], shard['seed'])
+        return keys
+    
+    def shards_of(self, keys):
+        """The shards an OwnedKeys was planned from, to build the addresses it describes"""
+        for customer_start, customer_count, start_id, seed in keys:
+            yield {'customer_start': customer_start, 'customer_count': customer_count,
+                   'start_id': start_id, 'seed': seed}
+    
+    def build_shard(self, customer_start, customer_count, start_id, seed):
+        """Build the addresses of one shard of customers in chunks"""
         columns = self.get_schema_columns('customer_address')
         if not columns:
-            print("No schema found for 'customer_address' table")
-            return []
+            return
         
-        # Load fixture if configured
+        fixture_columns = self.load_column_fixtures()
+        counts = self.address_counts(seed, customer_count)
+        rng = columnar.new_rng(stream_seed(seed, 1))
+        chunk_size = self.get_chunk_size()
+        
+        for offset in range(0, customer_count, chunk_size):
+            chunk_counts = counts[offset:offset + chunk_size]
+            customer_ids = columnar.sequential_ids(customer_start + offset, len(chunk_counts))
+            table = self.build_columns(rng, customer_ids, start_id, columns, fixture_columns, chunk_counts)
+            start_id += columnar.row_count(table)
+            yield table
+    
+    def load_column_fixtures(self):
+        """Load the address fixture as one array per schema field it can fill"""
         fixture_path = self.address_config.get('fixture', '')
-        address_fixtures = []
+        if not fixture_path:
+            return {}
         
-        if fixture_path:
-            address_fixtures = self.extract_fixture_values(fixture_path)
+        if not self.extract_fixture_values(fixture_path):
+            return {}
         
-        # Get max addresses per customer
-        max_addresses_per_customer = self.address_config.get('max_address_per_customer', 2)
+        fixture_columns = {}
+        for col_name, fixture_field in FIXTURE_FIELD_MAPPING.items():
+            # Only fields every fixture record has; the rest are generated
+            column = self.fixtures.column(fixture_path, fixture_field)
+            if column is not None:
+                fixture_columns[col_name] = column
         
-        # Generate addresses
-        addresses = []
-        address_id = 1
+        return fixture_columns
+    
+    def field_sampler(self, field_name, values):
+        """Alias table for a field with a distribution spec in the config; None for uniform picks
+        
+        The "address" spec weights the fixture records, and with them every
+        field copied from the fixture.
+        """
+        spec = self.address_config.get('distribution', {}).get(field_name)
+        if spec is None:
+            return None
+        
+        if field_name == 'address':
+            return self.get_sampler(field_name, spec, self.extract_fixture_values(self.address_config['fixture']))
+        return self.get_sampler(field_name, spec, values)
+    
+    def build_columns(self, rng, customer_ids, start_id, columns, fixture_columns, counts=None):
+        """Build whole address columns for a batch of customers"""
+        max_addresses_per_customer = self.address_config.get('max_address_per_customer', 2)
         
-        for customer_id in range(1, customer_count + 1):
-            # Random number of addresses per customer (1 to max)
-            num_addresses = random.randint(1, max_addresses_per_customer)
+        # Random number of addresses per customer (1 to max), unless given
+        if counts is None:
+            repeated_ids, _ = columnar.expand_counts(rng, customer_ids, 1, max_addresses_per_customer)
+        else:
+            repeated_ids = np.repeat(customer_ids, counts)
+        count = len(repeated_ids)
+        
+        # All fixture fields of a row come from the same fixture address
+        fixture_index = None
+        if fixture_columns:
+            fixture_size = len(next(iter(fixture_columns.values())))
+            fixture_index = sampling.draw(rng, self.field_sampler('address', None), fixture_size, count)
+        
+        table = {}
+        for col in columns:
+            col_name = col.name
             
-            for addr_num in range(num_addresses):
-                address = {}
-                
-                # If we have fixture data, use it
-                if address_fixtures:
-                    fixture_address = random.choice(address_fixtures)
-                    
-                    # Map fixture fields to schema fields
-                    field_mapping = {
-                        'street': 'address',  # fixture 'address' -> schema 'street'
-                        'region': 'state',    # fixture 'state' -> schema 'region'
-                        'zipcode': 'zip',     # fixture 'zip' -> schema 'zipcode'
-                        'city': 'city',       # same name
-                        'country': None       # not in fixture, will use default
-                    }
-                    
-                    for col in columns:
-                        col_name = col['name']
-                        col_type = col['type']
-                        
-                        if col_name == 'id':
-                            address[col_name] = address_id
-                        elif col_name == 'customer_id':
-                            address[col_name] = customer_id
-                        elif col_name == 'country':
-                            # Default country to US
-                            address[col_name] = 'US'
-                        elif col_name in field_mapping and field_mapping[col_name]:
-                            # Map schema field to fixture field
-                            fixture_field = field_mapping[col_name]
-                            if fixture_field in fixture_address:
-                                address[col_name] = fixture_address[fixture_field]
-                            else:
-                                address[col_name] = self.generate_random_value(col_name, col_type)
-                        else:
-                            address[col_name] = self.generate_random_value(col_name, col_type)
-                else:
-                    # No fixture, generate random data
-                    for col in columns:
-                        col_name = col['name']
-                        col_type = col['type']
-                        
-                        if col_name == 'id':
-                            address[col_name] = address_id
-                        elif col_name == 'customer_id':
-                            address[col_name] = customer_id
-                        else:
-                            address[col_name] = self.generate_random_value(col_name, col_type)
-                
-                addresses.append(address)
-                address_id += 1
-        
-        print(f"Generated {len(addresses)} customer addresses")
-        
-        # Export to CSV
-        self.export_to_csv(addresses, 'outputs/customer_address.csv')
-        
-        return addresses
+            if col_name == 'id':
+                table[col_name] = columnar.sequential_ids(start_id, count)
+            elif col_name == 'customer_id':
+                table[col_name] = repeated_ids
+            elif col_name == 'country':
+                # Default country to US
+                table[col_name] = CategoricalColumn(np.zeros(count, dtype=np.int8), ['US'])
+            elif col_name in fixture_columns:
+                table[col_name] = CategoricalColumn(fixture_index, fixture_columns[col_name])
+            elif col_name == 'street':
+                street_names = columnar.pick(rng, columnar.as_array(STREET_NAMES), count)
+                table[col_name] = columnar.random_number_strings(rng, 1, 9999, count) + ' ' + street_names
+            elif col_name == 'zipcode':
+                table[col_name] = columnar.random_number_strings(rng, 10000, 99999, count)
+            elif col_name == 'city':
+                table[col_name] = pick_categorical(rng, columnar.as_array(CITIES), count, self.field_sampler(col_name, CITIES))
+            elif col_name == 'region':
+                table[col_name] = pick_categorical(rng, columnar.as_array(REGIONS), count, self.field_sampler(col_name, REGIONS))
+            else:
+                table[col_name] = columnar.default_column(rng, col.type, count)
+        
+        return ColumnTable(table, 'customer_address')
     
     def export_to_csv(self, addresses, output_file):
         """Export addresses to CSV file"""
@@ -189,10 +214,7 @@ class CustomerAddressGenerator(BaseGenerator):
         
         os.makedirs('outputs', exist_ok=True)
         
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = list(addresses[0].keys())
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(addresses)
+        with CsvTableWriter(output_file) as writer:
+            writer.write_chunk(addresses)
         
         print(f"Exported {len(addresses)} addresses to: {output_file}")
@@ -1,197 +1,199 @@
-import json
-import csv
 import os
-import random
-import string
-import xml.etree.ElementTree as ET
-from datetime import datetime, timedelta
+import numpy as np
+from core import columnar, sampling
 from core.base_generator import BaseGenerator
+from core.output import CsvTableWriter
+from core.rng import numpy_rng
+from core.table import CategoricalColumn, ColumnTable, pick_categorical
+
+
+CUSTOMER_GROUPS = ['General', 'Wholesale', 'Retailer', 'VIP']
+CUSTOMER_GENDERS = ['Male', 'Female', 'Other']
+CUSTOMER_STATUSES = ['Active', 'Inactive']
+DEFAULT_CREATED_AT = '2024-01-01 00:00:00'
+DEFAULT_EMAIL_DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'example.com']
 
 
 class CustomerGenerator(BaseGenerator):
     """Generator for customer entities from schema and fixtures"""
     
     def __init__(self, config):
-        self.config = config
-        self.fixture_cache = {}
         self.customer_config = config.get('customer', {}).get('entity', {})
-        self.schema_path = config.get('schema', 'schema/full_schema.xml')
-        
-    def load_fixture(self, fixture_path):
-        """Load fixture data from JSON file with caching"""
-        if fixture_path in self.fixture_cache:
-            return self.fixture_cache[fixture_path]
-        
-        full_path = f'fixtures/{fixture_path}'
-        with open(full_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            self.fixture_cache[fixture_path] = data
-            return data
-    
-    def extract_fixture_values(self, fixture_path):
-        """Extract values from fixture file based on its structure"""
-        data = self.load_fixture(fixture_path)
-        
-        # If data is already a list, return it directly
-        if isinstance(data, list):
-            return data
-        
-        # Handle different fixture structures
-        if 'first_names' in data:
-            return data['first_names']
-        elif 'last_names' in data:
-            return data['last_names']
-        elif 'emails' in data:
-            return data['emails']
-        elif 'email_domains' in data:
-            return data['email_domains']
-        elif 'genders' in data:
-            return data['genders']
-        else:
-            # Return first array found
-            for key, value in data.items():
-                if isinstance(value, list):
-                    return value
-            return []
-    
-    def get_schema_columns(self, table_name):
-        """Parse XML schema to get column names for a table"""
-        tree = ET.parse(self.schema_path)
-        root = tree.getroot()
-        
-        columns = []
-        for table in root.findall('table'):
-            if table.get('name') == table_name:
-                for column in table.findall('column'):
-                    col_name = column.get('name')
-                    col_type = column.get('{http://www.w3.org/2001/XMLSchema-instance}type')
-                    columns.append({'name': col_name, 'type': col_type})
-                break
-        
-        return columns
-    
-    def generate_random_phone(self):
-        """Generate random US phone number"""
-        area_code = random.randint(200, 999)
-        exchange = random.randint(200, 999)
-        number = random.randint(1000, 9999)
-        return f"+1-{area_code}-{exchange}-{number}"
-    
-    def generate_random_date(self, start_year=1950, end_year=2005):
-        """Generate random date of birth"""
-        start_date = datetime(start_year, 1, 1)
-        end_date = datetime(end_year, 12, 31)
-        time_between = end_date - start_date
-        days_between = time_between.days
-        random_days = random.randrange(days_between)
-        random_date = start_date + timedelta(days=random_days)
-        return random_date.strftime('%Y-%m-%d')
-    
-    def generate_random_value(self, column_name, column_type):
-        """Generate random value based on column name and type"""
-        if column_name == 'id':
-            return None  # Will be auto-incremented
-        elif column_name == 'phone':
-            return self.generate_random_phone()
-        elif column_name == 'dob':
-            return self.generate_random_date()
-        elif column_name == 'default_billing' or column_name == 'default_shipping':
-            return random.randint(1, 5)  # Random address ID
-        elif column_name == 'group':
-            return random.choice(['General', 'Wholesale', 'Retailer', 'VIP'])
-        elif column_name == 'gender':
-            return random.choice(['Male', 'Female', 'Other'])
-        elif column_name == 'status':
-            return random.choice(['Active', 'Inactive'])
-        elif column_name == 'created_at':
-            return datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        elif column_type == 'int':
-            return random.randint(0, 100)
-        elif column_type == 'varchar':
-            return ''.join(random.choices(string.ascii_letters, k=10))
-        else:
-            return ''
-    
-    def generate(self):
-        """Generate customer entities from schema and fixtures"""
+        super().__init__(config, self.customer_config.get('fixture', {}), config.get('output', {}).get('folder', 'outputs'))
+        
+    def generate(self, addresses=None):
+        """Generate customers, with default addresses from an OwnedKeys of address ids when given"""
         if not self.customer_config.get('enable', False):
             print("Customer generation disabled in config")
             return []
         
         print("Generating customers...")
+        # Same columns, drawn from the same seed, as the customer stage of a build
+        customers = [record for chunk in self.iter_chunks(addresses=addresses) for record in chunk.rows()]
+        
+        print(f"Generated {len(customers)} customers")
+        
+        # Export to CSV
+        self.export_to_csv(customers, 'outputs/customers.csv')
+        
+        return customers
+    
+    def iter_chunks(self, chunk_size=None, addresses=None):
+        """Yield customers in chunks"""
+        yield from self.iter_column_chunks(chunk_size, addresses=addresses)
+    
+    def iter_column_chunks(self, chunk_size=None, seed=None, addresses=None):
+        """Yield customers as column arrays, chunk_size customers at a time
+
+        addresses, an OwnedKeys of the customers' address ids, gives each
+        customer default addresses of its own.
+        """
+        if not self.customer_config.get('enable', False):
+            print("Customer generation disabled in config")
+            return
         
-        # Get schema columns
         columns = self.get_schema_columns('customers')
         if not columns:
             print("No schema found for 'customers' table")
-            return []
-        
-        # Load fixtures
-        fixtures_config = self.customer_config.get('fixture', {})
-        fixtures_data = {}
+            return
         
-        for field_name, fixture_path in fixtures_config.items():
-            if fixture_path:
-                fixtures_data[field_name] = self.extract_fixture_values(fixture_path)
+        rng = numpy_rng(self.config, 'customers') if seed is None else columnar.new_rng(seed)
+        fixtures = self.load_column_fixtures()
+        limit = self.customer_config.get('limit', 100)
+        chunk_size = chunk_size or self.get_chunk_size()
         
-        # Get email domains if available
-        email_domains = fixtures_data.get('email', [])
-        if not email_domains:
-            # Fallback to default domains if not in fixture
-            email_domains = ['gmail.com', 'yahoo.com', 'outlook.com', 'hotmail.com', 'example.com']
+        for start_id in range(1, limit + 1, chunk_size):
+            count = min(chunk_size, limit - start_id + 1)
+            yield self.build_columns(rng, start_id, count, columns, fixtures, addresses)
+    
+    def plan_shards(self, shard_size, seed_for):
+        """Split customer ids into fixed ranges, each with its own seed"""
+        if not self.customer_config.get('enable', False):
+            print("Customer generation disabled in config")
+            return
         
-        # Get limit
         limit = self.customer_config.get('limit', 100)
         
-        # Generate customers
-        customers = []
-        for i in range(1, limit + 1):
-            customer = {}
-            
-            # Generate first_name and last_name first (needed for email)
-            first_name = random.choice(fixtures_data.get('first_name', ['John'])) if 'first_name' in fixtures_data else f'FirstName{i}'
-            last_name_and_gender = random.choice(fixtures_data.get('last_name', ['Doe'])) if 'last_name' in fixtures_data else f'LastName{i}'
-            last_name = last_name_and_gender['last_name']
-            gender = last_name_and_gender['gender']
-            
-            for col in columns:
-                col_name = col['name']
-                col_type = col['type']
-                
-                if col_name == 'id':
-                    customer[col_name] = i
-                elif col_name == 'first_name':
-                    customer[col_name] = first_name
-                elif col_name == 'last_name':
-                    customer[col_name] = last_name
-                elif col_name == 'email':
-                    # Generate email using domains from fixture
-                    customer[col_name] = self.generate_email_with_domains(first_name, last_name, email_domains)
-                elif col_name in fixtures_data and fixtures_data[col_name]:
-                    customer[col_name] = random.choice(fixtures_data[col_name])
-                else:
-                    customer[col_name] = self.generate_random_value(col_name, col_type)
-            
-            customers.append(customer)
+        for index, start_id in enumerate(range(1, limit + 1, shard_size)):
+            count = min(shard_size, limit - start_id + 1)
+            yield {'start_id': start_id, 'count': count, 'seed': seed_for(index)}
+    
+    def build_shard(self, start_id, count, seed, addresses=None):
+        """Build one shard of customers in chunks"""
+        columns = self.get_schema_columns('customers')
+        if not columns:
+            return
         
-        print(f"Generated {len(customers)} customers")
+        rng = columnar.new_rng(seed)
+        fixtures = self.load_column_fixtures()
+        chunk_size = self.get_chunk_size()
         
-        # Export to CSV
-        self.export_to_csv(customers, 'outputs/customers.csv')
+        for offset in range(0, count, chunk_size):
+            chunk_count = min(chunk_size, count - offset)
+            yield self.build_columns(rng, start_id + offset, chunk_count, columns, fixtures, addresses)
+    
+    def load_column_fixtures(self):
+        """Load fixtures as arrays of the field each customer column needs"""
+        fixtures = {}
         
-        return customers
+        for field_name, fixture_path in self.customer_config.get('fixture', {}).items():
+            if fixture_path:
+                fixtures[field_name] = self.fixtures.column(fixture_path, field_name, default='')
+        
+        if not len(fixtures.get('email', [])):
+            fixtures['email'] = columnar.as_array(DEFAULT_EMAIL_DOMAINS)
+        
+        return fixtures
+    
+    def build_columns(self, rng, start_id, count, columns, fixtures, addresses=None):
+        """Build whole customer columns for ids start_id .. start_id + count - 1"""
+        ids = columnar.sequential_ids(start_id, count)
+        
+        # Names are needed for the email column, so build them first
+        first_names, first_lower = self.pick_names(rng, fixtures, 'first_name', 'FirstName', ids)
+        last_names, last_lower = self.pick_names(rng, fixtures, 'last_name', 'LastName', ids)
+        
+        table = {}
+        for col in columns:
+            col_name = col.name
+            
+            if col_name == 'id':
+                table[col_name] = ids
+            elif col_name == 'first_name':
+                table[col_name] = first_names
+            elif col_name == 'last_name':
+                table[col_name] = last_names
+            elif col_name == 'email':
+                table[col_name] = self.build_emails(rng, first_lower, last_lower, fixtures['email'])
+            elif col_name == 'phone':
+                table[col_name] = columnar.random_phones(rng, count)
+            elif col_name == 'dob':
+                table[col_name] = columnar.random_dates(rng, count)
+            elif col_name in fixtures and len(fixtures[col_name]):
+                table[col_name] = pick_categorical(rng, fixtures[col_name], count, self.field_sampler(col_name, fixtures[col_name]))
+            elif col_name == 'default_billing' or col_name == 'default_shipping':
+                # One of the customer's own addresses, or 0 when no addresses are generated
+                table[col_name] = addresses.pick(rng, ids) if addresses is not None else np.zeros(count, dtype=np.int64)
+            elif col_name == 'group':
+                table[col_name] = self.pick_choice(rng, col_name, CUSTOMER_GROUPS, count)
+            elif col_name == 'gender':
+                table[col_name] = self.pick_choice(rng, col_name, CUSTOMER_GENDERS, count)
+            elif col_name == 'status':
+                table[col_name] = self.pick_choice(rng, col_name, CUSTOMER_STATUSES, count)
+            elif col_name == 'created_at':
+                table[col_name] = columnar.constant(self.customer_config.get('created_at', DEFAULT_CREATED_AT), count)
+            elif col.type == 'varchar':
+                table[col_name] = columnar.random_strings(rng, count)
+            else:
+                table[col_name] = columnar.default_column(rng, col.type, count)
+        
+        return ColumnTable(table, 'customers')
+    
+    def field_sampler(self, field_name, values):
+        """Alias table for a field with a distribution spec in the config; None for uniform picks"""
+        spec = self.customer_config.get('distribution', {}).get(field_name)
+        if spec is None:
+            return None
+        
+        # Weights may come from another field of the fixture records the values were taken from
+        fixture_path = self.customer_config.get('fixture', {}).get(field_name)
+        source = self.extract_fixture_values(fixture_path) if fixture_path else values
+        if len(source) != len(values):
+            source = values
+        return self.get_sampler(field_name, spec, source)
+    
+    def pick_choice(self, rng, field_name, choices, count):
+        """Pick count values from a fixed list of choices"""
+        values = columnar.as_array(choices)
+        return pick_categorical(rng, values, count, self.field_sampler(field_name, values))
+    
+    def pick_names(self, rng, fixtures, field_name, fallback_prefix, ids):
+        """Pick names for a chunk together with their lowercase form for emails"""
+        values = fixtures.get(field_name)
+        if values is None or not len(values):
+            return (columnar.concat(fallback_prefix, ids),
+                    columnar.concat(fallback_prefix.lower(), ids))
+        
+        index = sampling.draw(rng, self.field_sampler(field_name, values), len(values), len(ids))
+        lowered = columnar.as_array([value.lower() for value in values])
+        return CategoricalColumn(index, values), lowered[index]
     
-    def generate_email_with_domains(self, first_name, last_name, domains):
-        """Generate email using provided domain list"""
-        patterns = [
-            f"{first_name.lower()}.{last_name.lower()}",
-            f"{first_name.lower()}{last_name.lower()}",
-            f"{first_name[0].lower()}{last_name.lower()}",
-            f"{first_name.lower()}{random.randint(1, 999)}"
-        ]
-        username = random.choice(patterns)
-        domain = random.choice(domains)
-        return f"{username}@{domain}"
+    def build_emails(self, rng, first_lower, last_lower, domains):
+        """Emails made from the lowercase names, in one of four username patterns"""
+        count = len(first_lower)
+        patterns = rng.integers(0, 4, count)
+        usernames = np.empty(count, dtype=object)
+        
+        mask = patterns == 0
+        usernames[mask] = first_lower[mask] + '.' + last_lower[mask]
+        mask = patterns == 1
+        usernames[mask] = first_lower[mask] + last_lower[mask]
+        mask = patterns == 2
+        usernames[mask] = columnar.as_array([name[:1] for name in first_lower[mask]]) + last_lower[mask]
+        mask = patterns == 3
+        usernames[mask] = first_lower[mask] + columnar.random_number_strings(rng, 1, 999, mask.sum())
+        
+        return usernames + '@' + columnar.pick(rng, domains, count, self.field_sampler('email', domains))
     
     def export_to_csv(self, customers, output_file):
         """Export customers to CSV file"""
@@ -201,10 +203,7 @@ class CustomerGenerator(BaseGenerator):
         
         os.makedirs('outputs', exist_ok=True)
         
-        with open(output_file, 'w', newline='', encoding='utf-8') as f:
-            fieldnames = list(customers[0].keys())
-            writer = csv.DictWriter(f, fieldnames=fieldnames)
-            writer.writeheader()
-            writer.writerows(customers)
+        with CsvTableWriter(output_file) as writer:
+            writer.write_chunk(customers)
         
-        print(f"Exported {len(customers)} customers to: {output_file}")
\ No newline at end of file
+        print(f"Exported {len(customers)} customers to: {output_file}")
@@ -0,0 +1,308 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from collections.abc import Sequence
+
+import numpy as np
+from core import columnar
+from core.metrics import phase
+
+
+SNAPSHOT_VERSION = 1
+DEFAULT_FIXTURE_FOLDER = 'fixtures'
+DEFAULT_CACHE_FOLDER = '.cache'
+
+# Process-wide stores keyed by fixture folder and snapshot folder
+_stores = {}
+
+
+def extract_values(data):
+    """The list of values a fixture holds, whatever its layout"""
+    # If data is already a list, return it directly
+    if isinstance(data, list):
+        return data
+
+    # Handle different fixture structures
+    if 'brands' in data:
+        return [item['brand'] for item in data['brands']]
+    elif 'materials' in data:
+        return [item['Material'] for item in data['materials']]
+    else:
+        # Return first array found
+        for key, value in data.items():
+            if isinstance(value, list):
+                return value
+        return []
+
+
+def is_text(value):
+    return isinstance(value, str) and '\0' not in value
+
+
+def pack_values(values, strings):
+    """Describe values as string columns appended to strings; None when they are not strings or flat records"""
+    if all(is_text(value) for value in values):
+        entry = {'kind': 'strings', 'count': len(values), 'first': len(strings)}
+        strings.extend(values)
+        return entry
+
+    if not all(isinstance(value, dict) for value in values):
+        return None
+
+    fields = list(values[0])
+    for value in values:
+        if list(value) != fields or not all(is_text(text) for text in value.values()):
+            return None
+
+    entry = {'kind': 'records', 'count': len(values), 'fields': {}}
+    for field in fields:
+        entry['fields'][field] = len(strings)
+        strings.extend(value[field] for value in values)
+    return entry
+
+
+def encode_strings(strings):
+    """NUL-terminated UTF-8 blob of strings with the byte offset where each one starts"""
+    encoded = [text.encode('utf-8') for text in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(data) + 1 for data in encoded], out=offsets[1:])
+    blob = b''.join(data + b'\0' for data in encoded)
+    return np.frombuffer(blob, dtype=np.uint8), offsets
+
+
+class StringColumn(Sequence):
+    """A run of strings in a blob, decoded only when they are read"""
+
+    def __init__(self, blob, offsets, first, count):
+        self.blob = blob
+        self.offsets = offsets
+        self.first = first
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError('fixture index out of range')
+
+        start = int(self.offsets[self.first + index])
+        end = int(self.offsets[self.first + index + 1]) - 1
+        return self.blob[start:end].tobytes().decode('utf-8')
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def tolist(self):
+        """Decode the whole run in one pass"""
+        if not self.count:
+            return []
+        start = int(self.offsets[self.first])
+        end = int(self.offsets[self.first + self.count]) - 1
+        return self.blob[start:end].tobytes().decode('utf-8').split('\0')
+
+    def to_array(self):
+        return columnar.as_array(self.tolist())
+
+
+class RecordList(Sequence):
+    """Flat fixture records stored as one string column per field"""
+
+    def __init__(self, columns, count):
+        self.columns = columns
+        self.fields = tuple(columns)
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(self.count))]
+        return {field: column[index] for field, column in self.columns.items()}
+
+
+class FixtureStore:
+    """Fixture files of one folder, each parsed at most once per process
+
+    The values of every fixture are normalized into a binary snapshot: the
+    strings of all fixtures in one NUL-separated UTF-8 blob with an array of
+    offsets, plus a JSON index of where each fixture's columns start. The
+    snapshot is rebuilt when a fixture file changes and is memory-mapped,
+    so later runs and worker processes share it without parsing any JSON.
+    """
+
+    def __init__(self, folder=DEFAULT_FIXTURE_FOLDER, cache_folder=DEFAULT_CACHE_FOLDER):
+        self.folder = folder
+        self.cache_folder = cache_folder
+        self.data = {}
+        self.entries = {}
+        self.snapshot = None
+        # Generators of tables built at the same time share the store
+        self.lock = threading.RLock()
+
+    def fixture_files(self):
+        """Relative paths of every JSON fixture, in a stable order"""
+        paths = []
+        for root, _, files in os.walk(self.folder):
+            for name in files:
+                if name.endswith('.json'):
+                    paths.append(os.path.relpath(os.path.join(root, name), self.folder).replace(os.sep, '/'))
+        return sorted(paths)
+
+    def source_key(self):
+        digest = hashlib.sha256(f'{SNAPSHOT_VERSION}\n'.encode('utf-8'))
+        for path in self.fixture_files():
+            stat = os.stat(os.path.join(self.folder, path))
+            digest.update(f'{path}\0{stat.st_size}\0{stat.st_mtime_ns}\n'.encode('utf-8'))
+        return digest.hexdigest()
+
+    def snapshot_folder(self, key):
+        return os.path.join(self.cache_folder, 'fixtures', key)
+
+    def open_snapshot(self):
+        """Index, blob and offsets of the snapshot, building it on first use"""
+        with self.lock:
+            return self.load_snapshot()
+
+    def load_snapshot(self):
+        if self.snapshot is None:
+            key = self.source_key()
+            try:
+                self.snapshot = self.read_snapshot(self.snapshot_folder(key))
+            except (OSError, ValueError):
+                self.snapshot = self.build_snapshot(key)
+        return self.snapshot
+
+    def read_snapshot(self, folder):
+        with open(os.path.join(folder, 'index.json'), 'r', encoding='utf-8') as f:
+            index = json.load(f)
+        offsets = np.load(os.path.join(folder, 'offsets.npy'), mmap_mode='r')
+        if offsets[-1]:
+            blob = np.memmap(os.path.join(folder, 'strings.bin'), dtype=np.uint8, mode='r')
+        else:
+            blob = np.empty(0, dtype=np.uint8)
+        return index, blob, offsets
+
+    def build_snapshot(self, key):
+        """Parse every fixture once and write the snapshot; kept in memory if it cannot be written"""
+        print("Building fixture snapshot...")
+        index = {}
+        strings = []
+        for path in self.fixture_files():
+            try:
+                values = extract_values(self.read_json(path))
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+            entry = pack_values(values, strings)
+            if entry is not None:
+                index[path] = entry
+
+        blob, offsets = encode_strings(strings)
+        folder = self.snapshot_folder(key)
+        temp_folder = f'{folder}.{os.getpid()}.tmp'
+        try:
+            os.makedirs(temp_folder, exist_ok=True)
+            blob.tofile(os.path.join(temp_folder, 'strings.bin'))
+            np.save(os.path.join(temp_folder, 'offsets.npy'), offsets)
+            with open(os.path.join(temp_folder, 'index.json'), 'w', encoding='utf-8') as f:
+                json.dump(index, f)
+            os.replace(temp_folder, folder)
+        except OSError:
+            # Another process got there first, or the cache folder is read-only
+            shutil.rmtree(temp_folder, ignore_errors=True)
+
+        try:
+            return self.read_snapshot(folder)
+        except (OSError, ValueError):
+            return index, blob, offsets
+
+    def read_json(self, fixture_path):
+        with open(os.path.join(self.folder, fixture_path), 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def load(self, fixture_path):
+        """Parsed JSON of a fixture file, for fixtures that are more than a list of values"""
+        with phase('fixtures'), self.lock:
+            if fixture_path not in self.data:
+                self.data[fixture_path] = self.read_json(fixture_path)
+            return self.data[fixture_path]
+
+    def values(self, fixture_path):
+        """Values of a fixture: a lazily decoded sequence, or the plain JSON list for irregular fixtures"""
+        with phase('fixtures'), self.lock:
+            return self.load_values(fixture_path)
+
+    def load_values(self, fixture_path):
+        if fixture_path in self.entries:
+            return self.entries[fixture_path]
+
+        index, blob, offsets = self.open_snapshot() if self.cache_folder else ({}, None, None)
+        entry = index.get(fixture_path)
+        if entry is None:
+            values = extract_values(self.read_json(fixture_path))
+            strings = []
+            entry = pack_values(values, strings)
+            blob, offsets = encode_strings(strings)
+
+        if entry is None:
+            result = values
+        elif entry['kind'] == 'strings':
+            result = StringColumn(blob, offsets, entry['first'], entry['count'])
+        else:
+            columns = {
+                field: StringColumn(blob, offsets, first, entry['count'])
+                for field, first in entry['fields'].items()
+            }
+            result = RecordList(columns, entry['count'])
+
+        self.entries[fixture_path] = result
+        return result
+
+    def column(self, fixture_path, field=None, default=None):
+        """Array of one field of a fixture's records, or of its values when they are plain
+
+        Records without the field take default; with no default the field has
+        to be in every record, otherwise there is no column and None is returned.
+        """
+        with phase('fixtures'):
+            return self.load_column(fixture_path, field, default)
+
+    def load_column(self, fixture_path, field, default):
+        values = self.values(fixture_path)
+        if isinstance(values, StringColumn):
+            return values.to_array()
+        if isinstance(values, RecordList):
+            if field in values.columns:
+                return values.columns[field].to_array()
+            return None if default is None else columnar.constant(default, len(values))
+
+        column = []
+        for value in values:
+            if not isinstance(value, dict):
+                column.append(value)
+            elif field in value or default is not None:
+                column.append(value.get(field, default))
+            else:
+                return None
+        return columnar.as_array(column)
+
+
+def get_fixture_store(config):
+    """Return the process-wide fixture store for a config"""
+    cache_folder = None
+    if config.get('fixtures', {}).get('snapshot', True):
+        cache_folder = config.get('cache', {}).get('folder', DEFAULT_CACHE_FOLDER)
+
+    key = (os.path.abspath(DEFAULT_FIXTURE_FOLDER), cache_folder and os.path.abspath(cache_folder))
+    store = _stores.get(key)
+    if store is None:
+        store = FixtureStore(DEFAULT_FIXTURE_FOLDER, cache_folder)
+        _stores[key] = store
+    return store
@@ -0,0 +1,172 @@
+import threading
+
+import numpy as np
+from core import sampling
+
+
+class KeyRanges:
+    """Ids of a table as sorted, disjoint [start, stop) ranges
+
+    A table numbered 1..n is a single range, so it costs the same few bytes
+    at any size; ids with gaps, like the leaves of a category tree, take one
+    range per run of consecutive ids. Membership tests and uniform draws
+    work on whole arrays at once.
+    """
+
+    def __init__(self):
+        self.starts = []
+        self.stops = []
+        self.arrays = None
+
+    @classmethod
+    def from_ids(cls, ids):
+        """Ranges covering the runs of consecutive values of a set of ids"""
+        ids = np.unique(np.asarray(ids, dtype=np.int64))
+        keys = cls()
+        if len(ids):
+            breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+            for run in np.split(ids, breaks):
+                keys.add(int(run[0]), len(run))
+        return keys
+
+    def add(self, start, count):
+        """Add ids start .. start + count - 1, after the ids already held"""
+        if count <= 0:
+            return
+        if self.stops and start < self.stops[-1]:
+            raise ValueError(f"Ids must be added in increasing order, got {start} after {self.stops[-1] - 1}")
+
+        if self.stops and start == self.stops[-1]:
+            self.stops[-1] += count
+        else:
+            self.starts.append(start)
+            self.stops.append(start + count)
+        self.arrays = None
+
+    def ranges(self):
+        """(starts, stops, offsets) as arrays, offsets[i] being the position of starts[i] among all ids"""
+        if self.arrays is None:
+            starts = np.array(self.starts, dtype=np.int64)
+            stops = np.array(self.stops, dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(stops - starts)))
+            self.arrays = starts, stops, offsets
+        return self.arrays
+
+    def __len__(self):
+        return int(self.ranges()[2][-1])
+
+    @property
+    def nbytes(self):
+        return 16 * len(self.starts)
+
+    def contains(self, ids):
+        """Whether each id is held"""
+        starts, stops, _ = self.ranges()
+        ids = np.asarray(ids, dtype=np.int64)
+        if not len(starts):
+            return np.zeros(len(ids), dtype=bool)
+        index = np.searchsorted(starts, ids, side='right') - 1
+        return (index >= 0) & (ids < stops[np.maximum(index, 0)])
+
+    def at(self, positions):
+        """Ids at positions 0 .. len - 1 of the ids in order"""
+        starts, _, offsets = self.ranges()
+        positions = np.asarray(positions, dtype=np.int64)
+        index = np.searchsorted(offsets, positions, side='right') - 1
+        return starts[index] + (positions - offsets[index])
+
+    def sample(self, rng, count, sampler=None):
+        """count ids drawn uniformly, or at the positions an alias table sampler draws"""
+        if not len(self):
+            raise ValueError("No ids to draw from")
+        return self.at(sampling.draw(rng, sampler, len(self), count))
+
+
+class OwnedKeys:
+    """Ids of a child table numbered owner by owner, each owner holding one run of them
+
+    Addresses are numbered customer by customer, so a customer's addresses
+    run from its first address id for as many ids as it has addresses.
+    Instead of keeping that per owner, each planned range of owners keeps
+    where its owners and its children start and the seed their child counts
+    are drawn from; counts(seed, owner_count) redraws them in one batch when
+    the range is looked up. Memory grows with the ranges, not the rows.
+    """
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.plans = []
+        self.owner_starts = []
+        # (plan index, counts, offsets) of the last range looked up; chunks of owners come in order
+        self.last_range = None
+
+    def add(self, owner_start, owner_count, child_start, seed):
+        """Add a range of owners whose children are numbered from child_start"""
+        if self.plans:
+            last_start, last_count, _, _ = self.plans[-1]
+            if owner_start < last_start + last_count:
+                raise ValueError(f"Owner ranges must be added in increasing order, got {owner_start}")
+        self.plans.append((owner_start, owner_count, child_start, seed))
+        self.owner_starts.append(owner_start)
+
+    def __iter__(self):
+        """(owner start, owner count, child start, seed) of each range"""
+        return iter(self.plans)
+
+    def range_counts(self, plan_index):
+        """Child counts of the owners of a range and where each owner's children start in it"""
+        last_range = self.last_range
+        if last_range is None or last_range[0] != plan_index:
+            _, owner_count, _, seed = self.plans[plan_index]
+            counts = np.asarray(self.counts(seed, owner_count), dtype=np.int64)
+            offsets = np.concatenate(([0], np.cumsum(counts[:-1])))
+            last_range = self.last_range = (plan_index, counts, offsets)
+        return last_range[1], last_range[2]
+
+    def children(self, owner_ids):
+        """(first child id, child count) of each owner; owners outside every range have none"""
+        owner_ids = np.asarray(owner_ids, dtype=np.int64)
+        first = np.zeros(len(owner_ids), dtype=np.int64)
+        counts = np.zeros(len(owner_ids), dtype=np.int64)
+        plan_indexes = np.searchsorted(np.array(self.owner_starts, dtype=np.int64), owner_ids, side='right') - 1
+
+        for plan_index in np.unique(plan_indexes[plan_indexes >= 0]).tolist():
+            owner_start, owner_count, child_start, _ = self.plans[plan_index]
+            rows = np.flatnonzero(plan_indexes == plan_index)
+            positions = owner_ids[rows] - owner_start
+            inside = positions < owner_count
+            rows, positions = rows[inside], positions[inside]
+
+            range_counts, offsets = self.range_counts(plan_index)
+            first[rows] = child_start + offsets[positions]
+            counts[rows] = range_counts[positions]
+
+        return first, counts
+
+    def pick(self, rng, owner_ids):
+        """One child id of each owner, drawn uniformly from its children; 0 for owners without any"""
+        first, counts = self.children(owner_ids)
+        offsets = np.floor(rng.random(len(first)) * counts).astype(np.int64)
+        return np.where(counts > 0, first + offsets, 0)
+
+
+class KeyRegistry:
+    """Keys of the tables of a build, registered upstream for downstream generators to draw from
+
+    A stage registers the KeyRanges or OwnedKeys other tables may point at
+    under a name, and stages that reference them, scheduled after it, look
+    them up instead of guessing ids.
+    """
+
+    def __init__(self):
+        self.keys = {}
+        self.lock = threading.Lock()
+
+    def register(self, name, keys):
+        with self.lock:
+            self.keys[name] = keys
+        return keys
+
+    def get(self, name):
+        with self.lock:
+            return self.keys.get(name)
@@ -0,0 +1,270 @@
+import cProfile
+import json
+import os
+import platform
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows has no getrusage
+    resource = None
+
+
+PHASES = ('fixtures', 'schema', 'build', 'read', 'export')
+METRIC_FORMATS = ('jsonl', 'openmetrics')
+
+# Phase stack of the stage running on each thread
+_local = threading.local()
+
+
+def peak_rss():
+    """Peak resident memory of this process in bytes, or None where it cannot be read"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return usage if platform.system() == 'Darwin' else usage * 1024
+
+
+class StageMetrics:
+    """Timings of one build stage, split by phase
+
+    Phases are exclusive: entering one pauses the one it is nested in, so
+    fixture loading inside row building is only counted as fixture time.
+    Whatever the stage does outside a named phase counts as build.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.phases = dict.fromkeys(PHASES, 0.0)
+        self.tables = {}
+        self.cached = []
+        self.stack = []
+        self.seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.peak_rss_bytes = None
+        self.rss_growth_bytes = None
+
+    def enter(self, phase):
+        now = time.perf_counter()
+        if self.stack:
+            self.pause(now)
+        self.stack.append([phase, now])
+
+    def exit(self):
+        now = time.perf_counter()
+        self.pause(now)
+        self.stack.pop()
+        if self.stack:
+            self.stack[-1][1] = now
+
+    def pause(self, now):
+        phase, start = self.stack[-1]
+        self.phases[phase] += now - start
+
+    @property
+    def rows(self):
+        return sum(self.tables.values())
+
+    def to_dict(self):
+        return {
+            'stage': self.name,
+            'seconds': round(self.seconds, 6),
+            'cpu_seconds': round(self.cpu_seconds, 6),
+            'rows': self.rows,
+            'rows_per_sec': round(self.rows / self.seconds, 1) if self.seconds else None,
+            'phases': {phase: round(seconds, 6) for phase, seconds in self.phases.items()},
+            'tables': dict(self.tables),
+            'cached': list(self.cached),
+            'peak_rss_bytes': self.peak_rss_bytes,
+            'rss_growth_bytes': self.rss_growth_bytes,
+        }
+
+
+def current_stage():
+    return getattr(_local, 'stage', None)
+
+
+@contextmanager
+def phase(name):
+    """Count the time of the block towards a phase of the stage running on this thread"""
+    stage = current_stage()
+    if stage is None:
+        yield
+        return
+
+    stage.enter(name)
+    try:
+        yield
+    finally:
+        stage.exit()
+
+
+def timed_iter(iterable, name):
+    """Yield from an iterable, counting the time spent producing each item towards a phase"""
+    iterator = iter(iterable)
+    while True:
+        with phase(name):
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+        yield item
+
+
+def add_rows(table_name, rows):
+    """Credit rows written for a table to the stage running on this thread"""
+    stage = current_stage()
+    if stage is not None:
+        stage.tables[table_name] = stage.tables.get(table_name, 0) + rows
+
+
+def mark_cached(table_name):
+    """Note that the stage running on this thread reused a table from the build cache"""
+    stage = current_stage()
+    if stage is not None:
+        stage.cached.append(table_name)
+
+
+class BuildMetrics:
+    """Per-stage timings, row counts and memory of one build, written out when it ends
+
+    Stages are wrapped with measure(), which binds a StageMetrics to the
+    thread running the stage; code below it reports through the module
+    functions phase(), timed_iter(), add_rows() and mark_cached(), which do
+    nothing outside a measured stage (for instance in shard workers).
+    """
+
+    def __init__(self, config):
+        metrics_config = config.get('metrics', {})
+        self.enabled = metrics_config.get('enable', False)
+        self.format = metrics_config.get('format', 'jsonl')
+        if self.format not in METRIC_FORMATS:
+            raise ValueError(f"Unknown metrics format '{self.format}'; expected one of {', '.join(METRIC_FORMATS)}")
+        self.file = metrics_config.get('file', 'outputs/metrics.jsonl')
+        self.profile = metrics_config.get('profile', False)
+        self.profile_folder = metrics_config.get('profile_folder', 'outputs/profiles')
+        self.run_id = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S.%fZ')
+        self.stages = []
+        self.lock = threading.Lock()
+        self.started = None
+
+    def profiles(self, stage_name):
+        """Whether a stage is run under cProfile: profile is true for every stage, or a list of names"""
+        if isinstance(self.profile, (list, tuple)):
+            return stage_name in self.profile
+        return bool(self.profile)
+
+    def wrap(self, stage_name, func):
+        """Stage function that is measured whenever it runs"""
+        def measured(*args):
+            with self.measure(stage_name):
+                return func(*args)
+        return measured
+
+    @contextmanager
+    def measure(self, stage_name):
+        stage = StageMetrics(stage_name)
+        rss_before = peak_rss()
+        profiler = cProfile.Profile() if self.profiles(stage_name) else None
+        _local.stage = stage
+        cpu_start = time.thread_time()
+        start = time.perf_counter()
+        stage.enter('build')
+        if profiler is not None:
+            profiler.enable()
+        try:
+            yield stage
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            stage.exit()
+            stage.seconds = time.perf_counter() - start
+            stage.cpu_seconds = time.thread_time() - cpu_start
+            _local.stage = None
+            stage.peak_rss_bytes = peak_rss()
+            if rss_before is not None:
+                stage.rss_growth_bytes = stage.peak_rss_bytes - rss_before
+            if profiler is not None:
+                self.save_profile(stage_name, profiler)
+            with self.lock:
+                self.stages.append(stage)
+
+    def save_profile(self, stage_name, profiler):
+        os.makedirs(self.profile_folder, exist_ok=True)
+        profile_file = os.path.join(self.profile_folder, f'{stage_name}.prof')
+        profiler.dump_stats(profile_file)
+        print(f"Saved {stage_name} profile to: {profile_file}")
+
+    def start(self):
+        self.started = time.perf_counter()
+
+    def finish(self):
+        """Print a summary of the stages and write them to the metrics file, when metrics are enabled"""
+        seconds = time.perf_counter() - self.started if self.started is not None else None
+        if not self.enabled or not self.stages:
+            return
+
+        print("Stage timings:")
+        for stage in self.stages:
+            split = ', '.join(f"{name} {value:.2f}s" for name, value in stage.phases.items() if value >= 0.005)
+            print(f"  {stage.name:<24} {stage.seconds:>8.2f}s {stage.rows:>12,} rows  {split}")
+
+        self.write(seconds)
+
+    def write(self, seconds):
+        folder = os.path.dirname(self.file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        if self.format == 'jsonl':
+            self.write_jsonl(seconds)
+        else:
+            self.write_openmetrics(seconds)
+        print(f"Wrote build metrics to: {self.file}")
+
+    def write_jsonl(self, seconds):
+        """Append one line per stage and one for the whole build, so the file keeps every run"""
+        with open(self.file, 'a', encoding='utf-8') as f:
+            for stage in self.stages:
+                f.write(json.dumps({'run': self.run_id, **stage.to_dict()}) + '\n')
+            f.write(json.dumps({
+                'run': self.run_id, 'stage': 'total', 'seconds': round(seconds, 6),
+                'rows': sum(stage.rows for stage in self.stages), 'peak_rss_bytes': peak_rss(),
+            }) + '\n')
+
+    def write_openmetrics(self, seconds):
+        """Replace the file with the gauges of this run, for a textfile collector to scrape"""
+        lines = []
+
+        def family(name, help_text, samples, unit=None):
+            lines.append(f'# TYPE {name} gauge')
+            if unit:
+                lines.append(f'# UNIT {name} {unit}')
+            lines.append(f'# HELP {name} {help_text}')
+            for labels, value in samples:
+                if value is None:
+                    continue
+                label_text = ','.join(f'{key}="{label}"' for key, label in labels.items())
+                lines.append(f'{name}{{{label_text}}} {value}' if label_text else f'{name} {value}')
+
+        stages = self.stages
+        family('datagen_stage_seconds', 'Wall time of a build stage.',
+               [({'stage': s.name}, round(s.seconds, 6)) for s in stages], 'seconds')
+        family('datagen_stage_cpu_seconds', 'CPU time of the thread running a build stage.',
+               [({'stage': s.name}, round(s.cpu_seconds, 6)) for s in stages], 'seconds')
+        family('datagen_stage_phase_seconds', 'Wall time of a build stage spent in each phase.',
+               [({'stage': s.name, 'phase': name}, round(value, 6))
+                for s in stages for name, value in s.phases.items()], 'seconds')
+        family('datagen_stage_rows', 'Rows written by a build stage.',
+               [({'stage': s.name, 'table': table}, rows) for s in stages for table, rows in s.tables.items()])
+        family('datagen_stage_peak_rss_bytes', 'Peak resident memory of the process when a stage ended.',
+               [({'stage': s.name}, s.peak_rss_bytes) for s in stages], 'bytes')
+        family('datagen_build_seconds', 'Wall time of the whole build.', [({}, round(seconds, 6))], 'seconds')
+        lines.append('# EOF')
+
+        with open(self.file, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(lines) + '\n')
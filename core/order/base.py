@@ -0,0 +1,347 @@
+from collections.abc import Mapping
+
+import numpy as np
+from core import columnar, sampling
+from core.base_generator import BaseGenerator
+from core.rng import COLUMNS_STREAM, stream_seed, table_seed
+from core.table import CategoricalColumn, typed_column
+
+
+# Configurable children are written right after their parent with this visibility
+CHILD_VISIBILITY = 'Not Visible Individually'
+DEFAULT_START_DATE = '2024-01-01'
+DEFAULT_END_DATE = '2024-12-31'
+
+
+def collect_columns(chunks, dtypes):
+    """Gather some columns of a stream of row or column chunks into whole columns
+
+    dtypes maps each column name to the numpy type its values are read as,
+    or None for strings, which keep their codes where chunks have repeated
+    values. Each chunk is converted as it passes, so no column is ever held
+    as a list of Python objects.
+    """
+    parts = {name: [] for name in dtypes}
+    for chunk in chunks:
+        count = columnar.row_count(chunk) if isinstance(chunk, Mapping) else len(chunk)
+        for name, dtype in dtypes.items():
+            if isinstance(chunk, Mapping):
+                values = chunk[name] if name in chunk else columnar.constant(None, count)
+            else:
+                values = [row.get(name) for row in chunk]
+            if dtype is not None:
+                values = np.asarray(values, dtype=dtype)
+            elif isinstance(values, list):
+                values = typed_column(values)
+            parts[name].append(values)
+    return {name: concat_columns(parts[name], dtype) for name, dtype in dtypes.items()}
+
+
+def concat_columns(parts, dtype=None):
+    """One column from the parts chunks held of it; codes are merged when every part has them"""
+    if dtype is not None:
+        return np.concatenate(parts) if parts else np.empty(0, dtype=dtype)
+    if not parts or not all(isinstance(part, CategoricalColumn) for part in parts):
+        return np.concatenate([np.asarray(part, dtype=object) for part in parts]) if parts else columnar.as_array([])
+
+    positions = {}
+    codes = []
+    for part in parts:
+        remap = np.array([positions.setdefault(value, len(positions)) for value in part.categories], dtype=np.int32)
+        codes.append(remap[part.codes])
+    return CategoricalColumn(np.concatenate(codes), list(positions))
+
+
+def matches(column, value):
+    """Rows of a column equal to value, compared on the codes of a categorical column"""
+    if isinstance(column, CategoricalColumn):
+        return np.isin(column.codes, np.flatnonzero(column.categories == value))
+    return np.asarray(column, dtype=object) == value
+
+
+def optional_ids(values, present):
+    """Integer ids as objects, with None where there is no id"""
+    ids = values.astype(object)
+    ids[~present] = None
+    return ids
+
+
+# Columns orders read back from each table they point at, with the numpy type of
+# numbers; None marks strings
+REFERENCE_COLUMNS = {
+    'product': {
+        'id': np.int64, 'price': np.float64, 'tax_percent': np.float64, 'visibility': None, 'product_type': None,
+    },
+    'customers': {
+        'id': np.int64, 'first_name': None, 'last_name': None, 'email': None, 'phone': None, 'gender': None,
+    },
+    'customer_address': {
+        'id': np.int64, 'customer_id': np.int64,
+        'street': None, 'region': None, 'city': None, 'country': None, 'zipcode': None,
+    },
+}
+
+
+def sellable_products(products):
+    """Products orders can sell: simple products and configurable children, with their parent (0 for none)"""
+    product_ids = np.asarray(products['id'], dtype=np.int64)
+
+    # Track the latest configurable parent to link its children to it
+    is_parent = matches(products['product_type'], 'configurable')
+    parent_rows = np.where(is_parent, np.arange(len(product_ids)), -1)
+    parent_rows = np.maximum.accumulate(parent_rows) if len(parent_rows) else parent_rows
+    has_parent = matches(products['visibility'], CHILD_VISIBILITY) & (parent_rows >= 0)
+    parent_ids = np.where(has_parent, product_ids[np.maximum(parent_rows, 0)], 0)
+
+    sellable = ~is_parent
+    return {
+        'id': product_ids[sellable],
+        'parent_id': parent_ids[sellable],
+        'price': np.asarray(products['price'], dtype=np.float64)[sellable],
+        'tax_percent': np.asarray(products['tax_percent'], dtype=np.float64)[sellable],
+    }
+
+
+def addresses_by_customer(addresses):
+    """Address columns sorted by customer, so each customer's addresses are one slice"""
+    order = np.argsort(np.asarray(addresses['customer_id'], dtype=np.int64), kind='stable')
+    return {name: values[order] for name, values in addresses.items()}
+
+
+def reference_columns(table_name, chunks):
+    """The columns orders point at in one table, from its chunks, arranged for picking"""
+    columns = collect_columns(chunks, REFERENCE_COLUMNS[table_name])
+    if table_name == 'product':
+        return sellable_products(columns)
+    if table_name == 'customer_address':
+        return addresses_by_customer(columns)
+    return columns
+
+
+class OrderReferences:
+    """Columns of the generated products, customers and addresses that orders point at
+
+    Columns are arrays, or stored columns (see core.references) that only
+    read the rows a batch picks, so orders can point at tables of any size.
+    """
+
+    def __init__(self, products, customers, addresses):
+        # Only sellable products are ordered, see sellable_products
+        self.product_ids = products['id']
+        self.parent_product_ids = products['parent_id']
+        self.prices = products['price']
+        self.tax_percents = products['tax_percent']
+
+        self.customer_ids = customers['id']
+        self.customer_fields = {name: values for name, values in customers.items() if name != 'id'}
+
+        # Addresses sorted by customer, see addresses_by_customer
+        self.address_customers = addresses['customer_id']
+        self.address_ids = addresses['id']
+        self.address_fields = {
+            name: values for name, values in addresses.items() if name not in ('id', 'customer_id')
+        }
+
+    @classmethod
+    def from_chunks(cls, product_chunks, customer_chunks, address_chunks):
+        """Build references from row chunks read back from the written tables"""
+        return cls(
+            reference_columns('product', product_chunks),
+            reference_columns('customers', customer_chunks),
+            reference_columns('customer_address', address_chunks),
+        )
+
+    @property
+    def product_count(self):
+        return len(self.product_ids)
+
+    @property
+    def customer_count(self):
+        return len(self.customer_ids)
+
+    def parent_ids(self, product_index):
+        """Parent of each picked product, None for products without one"""
+        parent_ids = np.asarray(self.parent_product_ids[product_index], dtype=np.int64)
+        return optional_ids(parent_ids, parent_ids > 0)
+
+    def pick_addresses(self, rng, customer_index):
+        """Pick one address of each customer; rows are -1 for customers without any"""
+        customer_ids = self.customer_ids[customer_index]
+        starts = np.searchsorted(self.address_customers, customer_ids, side='left')
+        counts = np.searchsorted(self.address_customers, customer_ids, side='right') - starts
+        offsets = np.floor(rng.random(len(customer_index)) * counts).astype(np.int64)
+        return np.where(counts > 0, starts + offsets, -1)
+
+    def customer_values(self, name, customer_index):
+        """Values of a customer field for the picked customers, decoded"""
+        return np.asarray(self.customer_fields[name][customer_index], dtype=object)
+
+    def address_values(self, values, address_rows, missing):
+        """Values of picked address rows, with missing where no address was picked"""
+        result = columnar.constant(missing, len(address_rows))
+        picked = address_rows >= 0
+        result[picked] = values[address_rows[picked]]
+        return result
+
+
+class BaseOrderGenerator(BaseGenerator):
+    """Shared order engine: orders are built in vectorized batches together with their items
+
+    Subclasses name their tables and order states, and build the order-level
+    columns from the batch's items and customers.
+    """
+
+    order_table = None
+    item_table = None
+    config_key = None
+
+    # (state, status, weight, qty flags) where flags follow item_quantity_columns
+    order_states = ()
+    item_quantity_columns = ()
+
+    def __init__(self, config):
+        self.order_config = config.get('order', {}).get(self.config_key, {})
+        super().__init__(config, None, config.get('output', {}).get('folder', 'outputs'))
+
+    @property
+    def table_names(self):
+        return (self.order_table, self.item_table)
+
+    def is_enabled(self):
+        if not self.order_config.get('enable', False):
+            print(f"Order generation ({self.config_key}) disabled in config")
+            return False
+        return True
+
+    def iter_column_chunks(self, references, chunk_size=None, seed=None):
+        """Yield batches of orders as {table name: column arrays}"""
+        if not self.is_enabled() or not self.check_references(references):
+            return
+
+        if seed is None:
+            seed = table_seed(self.config, f'order.{self.config_key}', COLUMNS_STREAM)
+        limit = self.order_config.get('limit', 100)
+        yield from self.build_shard(references, 1, limit, 1, seed, chunk_size)
+
+    def plan_shards(self, shard_size, seed_for):
+        """Split order ids into fixed ranges and fix the first item id of each"""
+        if not self.is_enabled():
+            return
+
+        limit = self.order_config.get('limit', 100)
+        item_id = 1
+
+        for index, start_id in enumerate(range(1, limit + 1, shard_size)):
+            count = min(shard_size, limit - start_id + 1)
+            seed = seed_for(index)
+            yield {'start_id': start_id, 'count': count, 'item_start_id': item_id, 'seed': seed}
+
+            # Counts come from their own stream, so they are cheap to replay here
+            item_id += int(self.item_counts(seed, count).sum())
+
+    def item_counts(self, seed, order_count):
+        """Items per order, drawn from the seed's count stream"""
+        max_items = self.order_config.get('max_items_per_order', 5)
+        rng = columnar.new_rng(stream_seed(seed, 0))
+        return columnar.random_ints(rng, 1, max_items, order_count)
+
+    def build_shard(self, references, start_id, count, item_start_id, seed, chunk_size=None):
+        """Build orders start_id .. start_id + count - 1 in batches"""
+        counts = self.item_counts(seed, count)
+        rng = columnar.new_rng(stream_seed(seed, 1))
+        chunk_size = chunk_size or self.get_chunk_size()
+        columns = {table_name: self.get_schema_columns(table_name) for table_name in self.table_names}
+
+        for offset in range(0, count, chunk_size):
+            batch_counts = counts[offset:offset + chunk_size]
+            batch = self.build_batch(rng, references, start_id + offset, item_start_id, batch_counts, columns)
+            item_start_id += columnar.row_count(batch[self.item_table])
+            yield batch
+
+    def check_references(self, references):
+        if not references.product_count:
+            print(f"No products available for {self.order_table}")
+            return False
+        return True
+
+    def build_batch(self, rng, references, start_id, item_start_id, item_counts, columns, created=None):
+        pass
+
+    def pick_states(self, rng, count):
+        """Draw each order's state index from the weighted order states"""
+        weights = np.array([state[2] for state in self.order_states], dtype=np.float64)
+        return rng.choice(len(self.order_states), count, p=weights / weights.sum())
+
+    def state_values(self, position):
+        return columnar.as_array([state[position] for state in self.order_states])
+
+    def state_column(self, position, state_codes):
+        """State or status of each order, kept as codes into the order states"""
+        return CategoricalColumn(state_codes, self.state_values(position))
+
+    def pick_index(self, rng, name, size, count):
+        """count positions in 0 .. size-1, skewed when the order config has a distribution spec for name"""
+        spec = self.order_config.get('distribution', {}).get(name)
+        sampler = None if spec is None else self.get_sampler((name, size), spec, size=size)
+        return sampling.draw(rng, sampler, size, count)
+
+    def order_timestamps(self, rng, count, max_update_seconds, created=None):
+        """created_at within the configured date range, unless given, and updated_at up to max_update_seconds later"""
+        if created is None:
+            created = columnar.random_timestamps(
+                rng, count,
+                self.order_config.get('start_date', DEFAULT_START_DATE),
+                self.order_config.get('end_date', DEFAULT_END_DATE),
+            )
+        updated = created + rng.integers(0, max_update_seconds + 1, count).astype('timedelta64[s]')
+        return columnar.timestamp_strings(created), columnar.timestamp_strings(updated)
+
+    def build_items(self, rng, references, order_ids, item_start_id, item_counts, state_codes, columns):
+        """Build the items of a batch of orders; returns the item columns and per-order totals"""
+        order_count = len(order_ids)
+        order_index = np.repeat(np.arange(order_count), item_counts)
+        count = len(order_index)
+
+        product_index = self.pick_index(rng, 'product', references.product_count, count)
+        max_qty = self.order_config.get('max_qty_per_item', 3)
+        qty_ordered = columnar.random_ints(rng, 1, max_qty, count)
+
+        prices = references.prices[product_index]
+        row_totals = columnar.round_money(prices * qty_ordered)
+        tax_amounts = columnar.round_money(row_totals * references.tax_percents[product_index] / 100)
+
+        # Paid, shipped, canceled and refunded quantities follow the order state
+        flags = np.array([state[3] for state in self.order_states], dtype=np.int64)[state_codes[order_index]]
+        quantities = {
+            name: qty_ordered * flags[:, position]
+            for position, name in enumerate(self.item_quantity_columns)
+        }
+
+        table = {}
+        for col in columns:
+            if col.name == 'id':
+                table[col.name] = columnar.sequential_ids(item_start_id, count)
+            elif col.name == 'order_id':
+                table[col.name] = order_ids[order_index]
+            elif col.name == 'product_id':
+                table[col.name] = references.product_ids[product_index]
+            elif col.name == 'parent_product_id':
+                table[col.name] = references.parent_ids(product_index)
+            elif col.name == 'qty_ordered':
+                table[col.name] = qty_ordered
+            elif col.name in quantities:
+                table[col.name] = quantities[col.name]
+            elif col.name == 'price':
+                table[col.name] = prices
+            elif col.name == 'tax_amount':
+                table[col.name] = tax_amounts
+            elif col.name == 'row_total':
+                table[col.name] = row_totals
+            else:
+                table[col.name] = columnar.default_column(rng, col.type, count)
+
+        totals = {
+            'subtotal': columnar.round_money(np.bincount(order_index, row_totals, order_count)),
+            'tax_amount': columnar.round_money(np.bincount(order_index, tax_amounts, order_count)),
+        }
+        return table, totals
@@ -0,0 +1,171 @@
+import numpy as np
+from core import columnar
+from core.order.pos import PosOrderGenerator
+from core.order.web import WebOrderGenerator
+from core.rng import stream_seed, table_seed
+
+
+ORDER_GENERATORS = {'web': WebOrderGenerator, 'pos': PosOrderGenerator}
+
+# Share of a day's orders placed in each hour: web peaks at lunch and in the evening,
+# stores only sell while open (9:00 - 21:00) and are busiest in the late afternoon
+DEFAULT_HOURLY = {
+    'web': (1.0, 0.6, 0.4, 0.3, 0.3, 0.5, 1.0, 2.0, 3.0, 3.8, 4.2, 4.8,
+            5.6, 5.4, 4.8, 4.6, 4.8, 5.2, 6.0, 7.0, 7.6, 7.0, 5.2, 2.6),
+    'pos': (0, 0, 0, 0, 0, 0, 0, 0, 0, 3.0, 5.0, 7.0,
+            9.0, 9.0, 8.0, 8.0, 9.0, 10.0, 11.0, 10.0, 7.0, 0, 0, 0),
+}
+
+# Relative volume Monday .. Sunday
+DEFAULT_WEEKLY = {
+    'web': (1.0, 1.0, 1.0, 1.0, 1.05, 1.1, 1.2),
+    'pos': (0.8, 0.8, 0.85, 0.9, 1.1, 1.5, 1.2),
+}
+
+DEFAULT_ORDERS_PER_DAY = 1000
+DEFAULT_BUCKET_MINUTES = 15
+SECONDS_PER_DAY = 24 * 3600
+
+# Arrivals draw from their own stream of a day's seed; 0 and 1 are the order engine's
+ARRIVALS_STREAM = 2
+
+
+def parse_time(value, end=False):
+    """datetime64[s] of a date or timestamp; a bare date as an end bound means the end of that day"""
+    text = str(value)
+    if len(text) <= 10:
+        day = np.datetime64(text, 'D') + np.timedelta64(1 if end else 0, 'D')
+        return day.astype('datetime64[s]')
+    return np.datetime64(text.replace(' ', 'T'), 's')
+
+
+def weekday(day):
+    """Day of week of a datetime64[D], Monday being 0"""
+    # 1970-01-01 was a Thursday
+    return int((day.astype(np.int64) + 3) % 7)
+
+
+class ArrivalProfile:
+    """Expected orders per time bucket: a daily volume shaped by hour, weekday and promotions
+
+    The hourly weights give each hour's share of a day's orders and the
+    weekly weights scale whole days around their mean, so orders_per_day
+    is the average over a week without promotions. A promotion multiplies
+    the rate of every bucket starting inside it.
+    """
+
+    def __init__(self, events_config, channel):
+        channel_config = events_config.get(channel, {})
+
+        def setting(name, default):
+            return channel_config.get(name, events_config.get(name, default))
+
+        self.orders_per_day = setting('orders_per_day', DEFAULT_ORDERS_PER_DAY)
+        bucket_minutes = setting('bucket_minutes', DEFAULT_BUCKET_MINUTES)
+        if bucket_minutes <= 0 or 60 % bucket_minutes:
+            raise ValueError(f"bucket_minutes must divide an hour, got {bucket_minutes}")
+        self.bucket_seconds = int(bucket_minutes * 60)
+
+        hourly = np.asarray(setting('hourly', DEFAULT_HOURLY[channel]), dtype=np.float64)
+        weekly = np.asarray(setting('weekly', DEFAULT_WEEKLY[channel]), dtype=np.float64)
+        if len(hourly) != 24 or np.any(hourly < 0) or not hourly.sum() > 0:
+            raise ValueError(f"Event profile of {channel} needs 24 non-negative hourly weights")
+        if len(weekly) != 7 or np.any(weekly < 0) or not weekly.sum() > 0:
+            raise ValueError(f"Event profile of {channel} needs 7 non-negative weekly weights")
+        self.hourly = hourly / hourly.sum()
+        self.weekly = weekly / weekly.mean()
+
+        self.promotions = [
+            (parse_time(promotion['start']), parse_time(promotion['end'], end=True), promotion.get('multiplier', 2.0))
+            for promotion in setting('promotions', [])
+        ]
+
+    def bucket_rates(self, day):
+        """Start time and expected order count of each bucket of a day"""
+        offsets = np.arange(0, SECONDS_PER_DAY, self.bucket_seconds)
+        starts = day.astype('datetime64[s]') + offsets.astype('timedelta64[s]')
+
+        buckets_per_hour = 3600 // self.bucket_seconds
+        rates = self.hourly[offsets // 3600] / buckets_per_hour * self.orders_per_day * self.weekly[weekday(day)]
+        for start, end, multiplier in self.promotions:
+            rates[(starts >= start) & (starts < end)] *= multiplier
+        return starts, rates
+
+
+class OrderEventGenerator:
+    """Orders of one channel as a time-sorted event stream, built a day at a time
+
+    Each day draws a Poisson count per bucket from the arrival profile and
+    spreads the orders uniformly inside their bucket, so a whole day is a
+    few vectorized draws and a sort. Orders and their items are then built
+    by the channel's order generator with those creation times. Every day
+    has its own seed, so a day's orders do not depend on how many came
+    before it; only the ids carry over.
+    """
+
+    def __init__(self, config, channel):
+        if channel not in ORDER_GENERATORS:
+            raise ValueError(f"Unknown order channel '{channel}'; expected one of {', '.join(ORDER_GENERATORS)}")
+        self.config = config
+        self.channel = channel
+        self.events_config = config.get('order', {}).get('events', {})
+        self.orders = ORDER_GENERATORS[channel](config)
+        self.profile = ArrivalProfile(self.events_config, channel)
+
+    @property
+    def table_names(self):
+        return self.orders.table_names
+
+    def is_enabled(self):
+        return self.events_config.get(self.channel, {}).get('enable', True)
+
+    def check_references(self, references):
+        return self.orders.check_references(references)
+
+    def days(self):
+        start = np.datetime64(str(self.events_config.get('start_date', '2024-01-01')), 'D')
+        end = np.datetime64(str(self.events_config.get('end_date', '2024-12-31')), 'D')
+        return np.arange(start, end + np.timedelta64(1, 'D'), dtype='datetime64[D]')
+
+    def day_seed(self, day):
+        # Keyed by the date, so moving the start date keeps the days both ranges cover
+        return table_seed(self.config, f'order.events.{self.channel}', int(day.astype(np.int64)))
+
+    def arrival_times(self, day, seed):
+        """Sorted creation times of a day's orders"""
+        rng = columnar.new_rng(stream_seed(seed, ARRIVALS_STREAM))
+        starts, rates = self.profile.bucket_rates(day)
+        counts = rng.poisson(rates)
+        offsets = rng.integers(0, self.profile.bucket_seconds, int(counts.sum())).astype('timedelta64[s]')
+        # Buckets are in time order, so sorting the whole day only reorders within buckets
+        return np.sort(np.repeat(starts, counts) + offsets)
+
+    def iter_days(self, references, chunk_size=None):
+        """Yield (date, {table name: column arrays}) in time order, a chunk of orders at a time"""
+        if not self.check_references(references):
+            return
+
+        chunk_size = chunk_size or self.orders.get_chunk_size()
+        columns = {table_name: self.orders.get_schema_columns(table_name) for table_name in self.table_names}
+        order_id = 1
+        item_id = 1
+
+        for day in self.days():
+            seed = self.day_seed(day)
+            created = self.arrival_times(day, seed)
+            count = len(created)
+            if not count:
+                continue
+
+            item_counts = self.orders.item_counts(seed, count)
+            rng = columnar.new_rng(stream_seed(seed, 1))
+            date = str(day)
+
+            for offset in range(0, count, chunk_size):
+                batch = self.orders.build_batch(
+                    rng, references, order_id + offset, item_id, item_counts[offset:offset + chunk_size],
+                    columns, created[offset:offset + chunk_size])
+                item_id += columnar.row_count(batch[self.orders.item_table])
+                yield date, batch
+
+            order_id += count
@@ -0,0 +1,131 @@
+import numpy as np
+from core import columnar
+from core.order.base import BaseOrderGenerator
+from core.rng import numpy_rng
+from core.table import CategoricalColumn, ColumnTable
+
+
+# (state, status, weight, (paid, canceled, refunded)); POS sales are settled at the till
+POS_ORDER_STATES = (
+    ('complete', 'complete', 0.90, (1, 0, 0)),
+    ('canceled', 'canceled', 0.04, (0, 1, 0)),
+    ('closed', 'refunded', 0.06, (1, 0, 1)),
+)
+
+STORE_NAMES = [
+    'Downtown Flagship',
+    'Riverside Mall',
+    'Airport Terminal',
+    'Westfield Center',
+    'Harbor Outlet',
+    'Uptown Boutique',
+]
+
+# Walk-in sales are rung up within a few minutes
+MAX_UPDATE_SECONDS = 15 * 60
+
+
+class PosOrderGenerator(BaseOrderGenerator):
+    """Generator for point-of-sale orders and their items"""
+
+    order_table = 'sale_order_pos'
+    item_table = 'sale_order_pos_items'
+    config_key = 'pos'
+
+    order_states = POS_ORDER_STATES
+    item_quantity_columns = ('qty_paid', 'qty_canceled', 'qty_refunded')
+
+    def generate_store_name(self, store_id):
+        """Generate store name based on ID"""
+        if store_id <= len(STORE_NAMES):
+            return STORE_NAMES[store_id - 1]
+        return f'Store {store_id}'
+
+    def build_staff_names(self, references, staff_count):
+        """Staff names drawn once from the customer names, the same for every shard"""
+        if not references.customer_count:
+            return columnar.concat('Staff ', columnar.sequential_ids(1, staff_count))
+
+        rng = numpy_rng(self.config, 'order.pos.staff')
+        index = rng.integers(0, references.customer_count, staff_count)
+        return columnar.concat(
+            references.customer_values('first_name', index), ' ',
+            references.customer_values('last_name', index),
+        )
+
+    def build_batch(self, rng, references, start_id, item_start_id, item_counts, columns, created=None):
+        """Build a batch of POS orders with their items"""
+        count = len(item_counts)
+        order_ids = columnar.sequential_ids(start_id, count)
+        state_codes = self.pick_states(rng, count)
+        items, totals = self.build_items(
+            rng, references, order_ids, item_start_id, item_counts, state_codes, columns[self.item_table])
+
+        # Each store has its own terminals and staff
+        stores = self.order_config.get('stores', 3)
+        terminals_per_store = self.order_config.get('terminals_per_store', 2)
+        staff_per_store = self.order_config.get('staff_per_store', 4)
+        store_index = self.pick_index(rng, 'store', stores, count)
+        pos_ids = store_index * terminals_per_store + columnar.random_ints(rng, 1, terminals_per_store, count)
+        staff_ids = store_index * staff_per_store + columnar.random_ints(rng, 1, staff_per_store, count)
+        store_names = columnar.as_array([self.generate_store_name(i) for i in range(1, stores + 1)])
+        staff_names = self.build_staff_names(references, stores * staff_per_store)
+
+        # Walk-in buyers are not registered customers
+        walk_in_rate = self.order_config.get('walk_in_rate', 0.3) if references.customer_count else 1.0
+        is_member = rng.random(count) >= walk_in_rate
+        customer_index = self.pick_index(rng, 'customer', max(references.customer_count, 1), count)
+
+        def member_values(values, missing):
+            result = columnar.constant(missing, count)
+            result[is_member] = values[customer_index[is_member]]
+            return result
+
+        customer_ids = member_values(references.customer_ids, None)
+        buyer = {
+            name: member_values(references.customer_fields[name], '')
+            for name in ('first_name', 'last_name', 'phone', 'gender')
+        }
+
+        # Staff apply a till discount to a share of the sales
+        discount_rate = self.order_config.get('discount_rate', 0.1)
+        has_discount = rng.random(count) < discount_rate
+        discount_amounts = columnar.round_money(np.where(has_discount, totals['subtotal'] * 0.1, 0.0))
+        grand_totals = columnar.round_money(totals['subtotal'] - discount_amounts + totals['tax_amount'])
+
+        created_at, updated_at = self.order_timestamps(rng, count, MAX_UPDATE_SECONDS, created)
+
+        orders = {}
+        for col in columns[self.order_table]:
+            if col.name == 'id':
+                orders[col.name] = order_ids
+            elif col.name == 'customer_id':
+                orders[col.name] = customer_ids
+            elif col.name == 'order_number':
+                orders[col.name] = columnar.concat('POS', columnar.padded_numbers(order_ids, 9))
+            elif col.name == 'pos_id':
+                orders[col.name] = pos_ids
+            elif col.name == 'store_name':
+                orders[col.name] = CategoricalColumn(store_index, store_names)
+            elif col.name == 'staff_id':
+                orders[col.name] = staff_ids
+            elif col.name == 'staff_name':
+                orders[col.name] = CategoricalColumn(staff_ids - 1, staff_names)
+            elif col.name.startswith('buyer_'):
+                orders[col.name] = buyer.get(col.name[6:], columnar.constant('', count))
+            elif col.name == 'discount_amount':
+                orders[col.name] = discount_amounts
+            elif col.name in totals:
+                orders[col.name] = totals[col.name]
+            elif col.name == 'grand_total':
+                orders[col.name] = grand_totals
+            elif col.name == 'status':
+                orders[col.name] = self.state_column(1, state_codes)
+            elif col.name == 'created_at':
+                orders[col.name] = created_at
+            elif col.name == 'updated_at':
+                orders[col.name] = updated_at
+            else:
+                orders[col.name] = columnar.default_column(rng, col.type, count)
+
+        return {self.order_table: ColumnTable(orders, self.order_table), self.item_table: ColumnTable(items, self.item_table)}
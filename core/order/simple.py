@@ -1,2 +0,0 @@
-def generate(**kwargs):
-    print(f"Generating order.simple with args: {kwargs}")
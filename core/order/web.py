@@ -0,0 +1,156 @@
+import numpy as np
+from core import columnar
+from core.order.base import BaseOrderGenerator
+from core.table import CategoricalColumn, ColumnTable
+
+
+# (state, status, weight, (paid, shipped, canceled, refunded)) as in Magento's order workflow
+WEB_ORDER_STATES = (
+    ('new', 'pending', 0.10, (0, 0, 0, 0)),
+    ('processing', 'processing', 0.15, (1, 0, 0, 0)),
+    ('complete', 'complete', 0.60, (1, 1, 0, 0)),
+    ('canceled', 'canceled', 0.10, (0, 0, 1, 0)),
+    ('closed', 'closed', 0.05, (1, 1, 0, 1)),
+)
+
+# Shipping method codes with their flat fee
+SHIPPING_METHODS = (
+    ('flatrate_flatrate', 5.0),
+    ('tablerate_bestway', 10.0),
+    ('freeshipping_freeshipping', 0.0),
+)
+
+# Coupon codes with their discount percent
+COUPONS = (
+    ('SAVE5', 5.0),
+    ('SAVE10', 10.0),
+    ('WELCOME15', 15.0),
+    ('VIP20', 20.0),
+)
+
+# Updates (invoice, shipment, refund) land within a week of the order
+MAX_UPDATE_SECONDS = 7 * 24 * 3600
+
+
+class WebOrderGenerator(BaseOrderGenerator):
+    """Generator for web orders with their items and shipping address"""
+
+    order_table = 'sale_order_web'
+    item_table = 'sale_order_web_items'
+    address_table = 'sale_order_web_address'
+    config_key = 'web'
+
+    order_states = WEB_ORDER_STATES
+    item_quantity_columns = ('qty_paid', 'qty_shipped', 'qty_canceled', 'qty_refunded')
+
+    @property
+    def table_names(self):
+        return (self.order_table, self.item_table, self.address_table)
+
+    def check_references(self, references):
+        if not references.customer_count:
+            print(f"No customers available for {self.order_table}")
+            return False
+        return super().check_references(references)
+
+    def build_batch(self, rng, references, start_id, item_start_id, item_counts, columns, created=None):
+        """Build a batch of web orders with their items and shipping addresses"""
+        count = len(item_counts)
+        order_ids = columnar.sequential_ids(start_id, count)
+        state_codes = self.pick_states(rng, count)
+        items, totals = self.build_items(
+            rng, references, order_ids, item_start_id, item_counts, state_codes, columns[self.item_table])
+
+        customer_index = self.pick_index(rng, 'customer', references.customer_count, count)
+        billing_rows = references.pick_addresses(rng, customer_index)
+        shipping_rows = references.pick_addresses(rng, customer_index)
+
+        # Discounts come from coupons on a share of the orders
+        coupon_rate = self.order_config.get('coupon_rate', 0.2)
+        coupon_codes = rng.integers(0, len(COUPONS), count)
+        has_coupon = rng.random(count) < coupon_rate
+        # Code 0 is the empty coupon of orders without one
+        coupons = CategoricalColumn(np.where(has_coupon, coupon_codes + 1, 0), [''] + [code for code, _ in COUPONS])
+        discount_percents = np.where(has_coupon, np.array([percent for _, percent in COUPONS])[coupon_codes], 0.0)
+        discount_amounts = columnar.round_money(totals['subtotal'] * discount_percents / 100)
+
+        shipping_codes = rng.integers(0, len(SHIPPING_METHODS), count)
+        shipping_fees = np.array([fee for _, fee in SHIPPING_METHODS])[shipping_codes]
+        grand_totals = columnar.round_money(
+            totals['subtotal'] - discount_amounts + totals['tax_amount'] + shipping_fees)
+
+        created_at, updated_at = self.order_timestamps(rng, count, MAX_UPDATE_SECONDS, created)
+
+        buyer = {
+            name: references.customer_values(name, customer_index)
+            for name in ('first_name', 'last_name', 'email', 'phone', 'gender')
+        }
+
+        orders = {}
+        for col in columns[self.order_table]:
+            if col.name == 'id':
+                orders[col.name] = order_ids
+            elif col.name == 'order_number':
+                orders[col.name] = columnar.concat('WEB', columnar.padded_numbers(order_ids, 9))
+            elif col.name == 'customer_id':
+                orders[col.name] = references.customer_ids[customer_index]
+            elif col.name.startswith('buyer_') and col.name[6:] in buyer:
+                orders[col.name] = buyer[col.name[6:]]
+            elif col.name == 'coupon':
+                orders[col.name] = coupons
+            elif col.name == 'discount_amount':
+                orders[col.name] = discount_amounts
+            elif col.name == 'discount_percent':
+                orders[col.name] = discount_percents
+            elif col.name == 'shipping_method':
+                orders[col.name] = CategoricalColumn(shipping_codes, [code for code, _ in SHIPPING_METHODS])
+            elif col.name == 'shipping_fee':
+                orders[col.name] = shipping_fees
+            elif col.name in totals:
+                orders[col.name] = totals[col.name]
+            elif col.name == 'grand_total':
+                orders[col.name] = grand_totals
+            elif col.name == 'state':
+                orders[col.name] = self.state_column(0, state_codes)
+            elif col.name == 'status':
+                orders[col.name] = self.state_column(1, state_codes)
+            elif col.name == 'billing_address_id':
+                orders[col.name] = references.address_values(references.address_ids, billing_rows, None)
+            elif col.name == 'shipping_address_id':
+                orders[col.name] = references.address_values(references.address_ids, shipping_rows, None)
+            elif col.name == 'created_at':
+                orders[col.name] = created_at
+            elif col.name == 'updated_at':
+                orders[col.name] = updated_at
+            else:
+                orders[col.name] = columnar.default_column(rng, col.type, count)
+
+        addresses = self.build_addresses(
+            rng, references, order_ids, shipping_rows, buyer, columns[self.address_table])
+
+        return {
+            self.order_table: ColumnTable(orders, self.order_table),
+            self.item_table: ColumnTable(items, self.item_table),
+            self.address_table: ColumnTable(addresses, self.address_table),
+        }
+
+    def build_addresses(self, rng, references, order_ids, address_rows, buyer, columns):
+        """One shipping address per order, copied from the customer's address book"""
+        count = len(order_ids)
+
+        table = {}
+        for col in columns:
+            if col.name == 'id':
+                table[col.name] = order_ids
+            elif col.name == 'order_id':
+                table[col.name] = order_ids
+            elif col.name == 'customer_address_id':
+                table[col.name] = references.address_values(references.address_ids, address_rows, None)
+            elif col.name in references.address_fields:
+                table[col.name] = references.address_values(references.address_fields[col.name], address_rows, '')
+            elif col.name in buyer:
+                table[col.name] = buyer[col.name]
+            else:
+                table[col.name] = columnar.default_column(rng, col.type, count)
+
+        return table
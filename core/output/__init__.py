@@ -0,0 +1,24 @@
+# Output writers package
+from core.output.csv_writer import CsvTableWriter
+
+__all__ = ['CsvTableWriter', 'get_writer_class', 'create_writer']
+
+
+def get_writer_class(output_format='csv'):
+    """Writer class for an output format; Parquet needs pyarrow, so it is imported on demand"""
+    if output_format == 'csv':
+        return CsvTableWriter
+    if output_format == 'parquet':
+        from core.output.parquet_writer import ParquetTableWriter
+        return ParquetTableWriter
+    if output_format == 'sqlite':
+        from core.output.sqlite_writer import SqliteTableWriter
+        return SqliteTableWriter
+    raise ValueError(f"Unknown output format: {output_format}")
+
+
+def create_writer(output_config, output_file, schema_table=None, append=False):
+    """Writer for a table in the configured output format; with append it adds to what is there"""
+    output_format = output_config.get('format', 'csv')
+    writer_class = get_writer_class(output_format)
+    return writer_class.from_config(output_file, schema_table, output_config.get(output_format, {}), append)
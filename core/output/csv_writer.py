@@ -0,0 +1,230 @@
+import csv
+import gzip
+import io
+import os
+import shutil
+from collections.abc import Mapping
+
+import numpy as np
+from core import columnar
+from core.stream import chunked
+from core.table import CategoricalColumn
+
+
+# Suffix added to .csv for each compression; the suffix is how a file's compression is recognized
+COMPRESSION_EXTENSIONS = {'gzip': '.gz', 'zstd': '.zst'}
+DEFAULT_GZIP_LEVEL = 6
+DEFAULT_ZSTD_LEVEL = 3
+DEFAULT_BUFFER_SIZE = 1024 * 1024
+
+# Fields holding any of these are quoted, as csv.QUOTE_MINIMAL does
+QUOTED_CHARACTERS = (',', '"', '\r', '\n')
+
+
+def compression_of(path):
+    """Compression of a CSV file from its name, None for plain CSV"""
+    for compression, suffix in COMPRESSION_EXTENSIONS.items():
+        if path.endswith(suffix):
+            return compression
+    return None
+
+
+def zstd_module():
+    """zstandard is only needed for zstd output, so it is imported on demand"""
+    try:
+        import zstandard
+    except ImportError as error:
+        raise ImportError("zstd compression of CSV output needs the zstandard package") from error
+    return zstandard
+
+
+def open_csv(path, mode='rb', compression_level=None, buffer_size=DEFAULT_BUFFER_SIZE):
+    """Binary file object of a CSV file, compressing or decompressing as its name says"""
+    compression = compression_of(path)
+    if compression is None:
+        return open(path, mode, buffering=buffer_size)
+
+    if compression == 'gzip':
+        level = DEFAULT_GZIP_LEVEL if compression_level is None else compression_level
+        return gzip.open(path, mode, compresslevel=level)
+
+    # Appending adds a frame; readers go across frames, as gzip readers go across members
+    zstandard = zstd_module()
+    raw = open(path, mode, buffering=buffer_size)
+    if mode.startswith('r'):
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True), buffer_size)
+    level = DEFAULT_ZSTD_LEVEL if compression_level is None else compression_level
+    return zstandard.ZstdCompressor(level=level).stream_writer(raw)
+
+
+def quote_field(value):
+    if any(character in value for character in QUOTED_CHARACTERS):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def csv_fields(values):
+    """A column as CSV field strings, formatted for the whole column at once"""
+    if isinstance(values, CategoricalColumn):
+        # Only the distinct values are formatted
+        return columnar.as_array(csv_fields(values.categories))[values.codes].tolist()
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'biuf':
+        return list(map(str, values.tolist()))
+
+    values = values.tolist() if isinstance(values, np.ndarray) else list(values)
+    try:
+        text = ''.join(values)
+    except TypeError:
+        # Numbers or missing values among the strings
+        values = ['' if value is None else str(value) for value in values]
+        text = ''.join(values)
+
+    # Most columns need no quoting at all, which one scan of the joined text tells
+    if any(character in text for character in QUOTED_CHARACTERS):
+        return [quote_field(value) for value in values]
+    return values
+
+
+def csv_text(fields):
+    """Rows of CSV text from field strings given column by column"""
+    if len(fields) == 1:
+        # A row of one empty field would be a blank line, so it is quoted
+        fields = [['""' if value == '' else value for value in fields[0]]]
+    return ''.join(line + '\r\n' for line in map(','.join, zip(*fields)))
+
+
+class CsvTableWriter:
+    """Write a table to CSV incrementally, one chunk of rows at a time
+
+    Each chunk is formatted column by column and written as one block, so
+    there is no per-row csv module call. Files named .csv.gz or .csv.zst are
+    compressed on the fly.
+    """
+
+    extension = '.csv'
+    shared_output = False
+    appends_in_place = True
+
+    def __init__(self, output_file, schema_columns=None, append=False, compression_level=None,
+                 buffer_size=DEFAULT_BUFFER_SIZE):
+        self.output_file = output_file
+        self.schema_columns = list(schema_columns or [])
+        self.append = append
+        self.compression_level = compression_level
+        self.buffer_size = buffer_size
+        self.rows_written = 0
+        self.fieldnames = None
+        self.file = None
+
+    @classmethod
+    def from_config(cls, output_file, schema_table, options, append=False):
+        """Create a writer from the output.csv config section"""
+        return cls(
+            output_file,
+            schema_table.column_names if schema_table else None,
+            append,
+            compression_level=options.get('compression_level'),
+            buffer_size=options.get('buffer_size', DEFAULT_BUFFER_SIZE),
+        )
+
+    @classmethod
+    def file_extension(cls, options):
+        """.csv, followed by the suffix of the configured compression"""
+        compression = options.get('compression')
+        if compression is not None and compression not in COMPRESSION_EXTENSIONS:
+            raise ValueError(
+                f"Unknown CSV compression '{compression}'; expected one of {', '.join(COMPRESSION_EXTENSIONS)}")
+        return cls.extension + COMPRESSION_EXTENSIONS.get(compression, '')
+
+    @classmethod
+    def output_path(cls, folder, table_name, options):
+        """Each table gets its own file in the output folder"""
+        return os.path.join(folder, f'{table_name}{cls.file_extension(options)}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def open(self, first_row):
+        """Open the file and write the header based on the first row"""
+        folder = os.path.dirname(self.output_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        # Use schema order, but only include columns present in the rows
+        if self.schema_columns:
+            self.fieldnames = [col for col in self.schema_columns if col in first_row]
+        else:
+            self.fieldnames = list(first_row.keys())
+
+        if self.append and os.path.exists(self.output_file) and os.path.getsize(self.output_file):
+            # New rows go after the existing ones, in the columns of the existing header
+            with open_csv(self.output_file, 'rb') as f:
+                self.fieldnames = next(csv.reader(io.TextIOWrapper(f, encoding='utf-8', newline='')))
+            self.file = open_csv(self.output_file, 'ab', self.compression_level, self.buffer_size)
+            return
+
+        self.file = open_csv(self.output_file, 'wb', self.compression_level, self.buffer_size)
+        self.write_fields([[name] for name in self.fieldnames])
+
+    def write_fields(self, fields):
+        self.file.write(csv_text([csv_fields(values) for values in fields]).encode('utf-8'))
+
+    def write_chunk(self, chunk):
+        """Append a chunk to the file: a list of row dicts or a table of columns"""
+        if isinstance(chunk, Mapping):
+            self.write_columns(chunk)
+            return
+
+        if not chunk:
+            return
+
+        if self.file is None:
+            self.open(chunk[0])
+
+        # Missing keys are written empty, as csv.DictWriter does
+        self.write_fields([[row.get(name) for row in chunk] for name in self.fieldnames])
+        self.rows_written += len(chunk)
+
+    def write_columns(self, columns):
+        """Append a columnar chunk without building a dict per row"""
+        if not columns:
+            return
+
+        if self.file is None:
+            self.open(columns)
+
+        self.write_fields([columns[col] for col in self.fieldnames])
+        self.rows_written += columnar.row_count(columns)
+
+    def write_chunks(self, chunks):
+        """Consume a chunk stream and return the number of rows written"""
+        for rows in chunks:
+            self.write_chunk(rows)
+        return self.rows_written
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+
+    @classmethod
+    def read_chunks(cls, input_file, table_name, chunk_size):
+        """Stream a previously written table back as chunks of row dicts"""
+        with open_csv(input_file, 'rb') as f:
+            yield from chunked(csv.DictReader(io.TextIOWrapper(f, encoding='utf-8', newline='')), chunk_size)
+
+    def merge_parts(self, part_files):
+        """Concatenate part files in shard order, keeping only the first header"""
+        header_written = False
+
+        with open_csv(self.output_file, 'wb', self.compression_level, self.buffer_size) as output:
+            for part_file in part_files:
+                with open_csv(part_file, 'rb') as part:
+                    header = part.readline()
+                    if not header_written:
+                        output.write(header)
+                        header_written = True
+                    shutil.copyfileobj(part, output, self.buffer_size)
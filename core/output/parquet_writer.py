@@ -0,0 +1,206 @@
+import os
+from collections.abc import Mapping
+
+import numpy as np
+import pyarrow as pa
+import pyarrow.parquet as pq
+from core.table import CategoricalColumn
+
+
+# Arrow column type for each xsi:type used in the schema
+ARROW_TYPES = {
+    'int': pa.int64(),
+    'float': pa.float64(),
+    'varchar': pa.string(),
+    'date': pa.date32(),
+    'timestamp': pa.timestamp('s'),
+}
+
+# Low-cardinality strings stored as dictionary codes
+DEFAULT_DICTIONARY_COLUMNS = ('warehouse_name', 'stock_status', 'status', 'visibility')
+DEFAULT_ROW_GROUP_SIZE = 100000
+DEFAULT_COMPRESSION = 'zstd'
+
+
+class ParquetTableWriter:
+    """Write a table to Parquet incrementally, typed from the schema"""
+
+    extension = '.parquet'
+    shared_output = False
+    # A Parquet file cannot be extended once closed, so appended rows go to files of their own
+    appends_in_place = False
+
+    def __init__(self, output_file, schema_columns=None, row_group_size=DEFAULT_ROW_GROUP_SIZE,
+                 compression=DEFAULT_COMPRESSION, compression_level=None,
+                 dictionary_columns=DEFAULT_DICTIONARY_COLUMNS):
+        self.output_file = output_file
+        self.schema_columns = list(schema_columns or [])
+        self.row_group_size = row_group_size
+        self.compression = compression
+        self.compression_level = compression_level
+        self.dictionary_columns = set(dictionary_columns)
+        self.rows_written = 0
+        self.fieldnames = None
+        self.arrow_schema = None
+        self.writer = None
+        self.pending = []
+        self.pending_rows = 0
+
+    @classmethod
+    def from_config(cls, output_file, schema_table, options, append=False):
+        """Create a writer from the output.parquet config section"""
+        if append:
+            raise ValueError(f"Parquet files cannot be appended to: {output_file}")
+        return cls(
+            output_file,
+            schema_table.columns if schema_table else None,
+            row_group_size=options.get('row_group_size', DEFAULT_ROW_GROUP_SIZE),
+            compression=options.get('compression', DEFAULT_COMPRESSION),
+            compression_level=options.get('compression_level'),
+            dictionary_columns=options.get('dictionary_columns', DEFAULT_DICTIONARY_COLUMNS),
+        )
+
+    @classmethod
+    def file_extension(cls, options):
+        return cls.extension
+
+    @classmethod
+    def output_path(cls, folder, table_name, options):
+        """Each table gets its own file in the output folder"""
+        return os.path.join(folder, f'{table_name}{cls.extension}')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def arrow_type(self, column):
+        """Arrow type of a schema column, dictionary-encoded when low-cardinality"""
+        if column.name in self.dictionary_columns:
+            return pa.dictionary(pa.int32(), pa.string())
+        return ARROW_TYPES.get(column.type, pa.string())
+
+    def open(self, first_row):
+        """Fix the file schema from the first chunk, in schema order"""
+        folder = os.path.dirname(self.output_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        if self.schema_columns:
+            columns = [column for column in self.schema_columns if column.name in first_row]
+            fields = [pa.field(column.name, self.arrow_type(column)) for column in columns]
+        else:
+            # Without a schema every column is written as a string
+            fields = [pa.field(name, pa.string()) for name in first_row]
+
+        self.fieldnames = [field.name for field in fields]
+        self.open_schema(pa.schema(fields))
+
+    def open_schema(self, arrow_schema):
+        self.arrow_schema = arrow_schema
+        self.writer = pq.ParquetWriter(
+            self.output_file,
+            self.arrow_schema,
+            compression=self.compression,
+            compression_level=self.compression_level,
+        )
+
+    def to_arrow(self, values, arrow_type):
+        """Convert one column of a chunk to a typed Arrow array"""
+        if isinstance(values, CategoricalColumn):
+            # Codes map straight onto an Arrow dictionary, decoded only for plain string columns
+            array = pa.DictionaryArray.from_arrays(values.codes.astype(np.int32), pa.array(values.categories.tolist()))
+            if pa.types.is_dictionary(arrow_type):
+                return array
+            return array.cast(arrow_type)
+        if isinstance(values, np.ndarray) and values.dtype != object:
+            array = pa.array(values)
+        else:
+            values = list(values)
+            if arrow_type != pa.string() and not pa.types.is_dictionary(arrow_type):
+                # Empty strings stand for missing values in non-text columns
+                values = [None if value == '' else value for value in values]
+            array = pa.array(values)
+
+        if pa.types.is_dictionary(arrow_type):
+            return array.cast(pa.string()).dictionary_encode()
+        if array.type != arrow_type:
+            return array.cast(arrow_type)
+        return array
+
+    def write_chunk(self, chunk):
+        """Buffer a chunk: a list of row dicts or a dict of column arrays"""
+        if not chunk:
+            return
+
+        first_row = chunk if isinstance(chunk, Mapping) else chunk[0]
+        if self.writer is None:
+            self.open(first_row)
+
+        arrays = []
+        for field in self.arrow_schema:
+            if isinstance(chunk, Mapping):
+                values = chunk[field.name]
+            else:
+                values = [row.get(field.name) for row in chunk]
+            arrays.append(self.to_arrow(values, field.type))
+
+        table = pa.Table.from_arrays(arrays, schema=self.arrow_schema)
+        self.pending.append(table)
+        self.pending_rows += table.num_rows
+        self.rows_written += table.num_rows
+
+        # Chunks are smaller than row groups, so buffer until a full group is ready
+        if self.pending_rows >= self.row_group_size:
+            self.flush()
+
+    def write_columns(self, columns):
+        self.write_chunk(columns)
+
+    def write_chunks(self, chunks):
+        """Consume a chunk stream and return the number of rows written"""
+        for rows in chunks:
+            self.write_chunk(rows)
+        return self.rows_written
+
+    def flush(self):
+        """Write buffered chunks out as row groups"""
+        if not self.pending:
+            return
+
+        table = pa.concat_tables(self.pending, promote_options='permissive').unify_dictionaries()
+        self.writer.write_table(table, row_group_size=self.row_group_size)
+        self.pending = []
+        self.pending_rows = 0
+
+    def close(self):
+        if self.writer is not None:
+            self.flush()
+            self.writer.close()
+            self.writer = None
+
+    @classmethod
+    def read_chunks(cls, input_file, table_name, chunk_size):
+        """Stream a previously written table back as chunks of row dicts"""
+        parquet_file = pq.ParquetFile(input_file)
+        for batch in parquet_file.iter_batches(batch_size=chunk_size):
+            yield batch.to_pylist()
+
+    def merge_parts(self, part_files):
+        """Combine part files in shard order, regrouping their rows into full row groups"""
+        for part_file in part_files:
+            parquet_file = pq.ParquetFile(part_file)
+            if self.writer is None:
+                folder = os.path.dirname(self.output_file)
+                if folder:
+                    os.makedirs(folder, exist_ok=True)
+                self.open_schema(parquet_file.schema_arrow)
+
+            for index in range(parquet_file.num_row_groups):
+                row_group = parquet_file.read_row_group(index)
+                self.pending.append(row_group)
+                self.pending_rows += row_group.num_rows
+                self.rows_written += row_group.num_rows
+                if self.pending_rows >= self.row_group_size:
+                    self.flush()
@@ -0,0 +1,222 @@
+import os
+import sqlite3
+from collections.abc import Mapping
+
+
+# SQL column type for each xsi:type used in the schema
+SQL_TYPES = {
+    'int': 'INTEGER',
+    'float': 'REAL',
+    'varchar': 'TEXT',
+    'date': 'TEXT',
+    'timestamp': 'TEXT',
+}
+
+DEFAULT_DATABASE = 'dataset.sqlite'
+
+
+def quote(identifier):
+    """Quote a table or column name; the schema uses keywords such as `group`"""
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+class SqliteTableWriter:
+    """Bulk-load a table into a SQLite database created from the schema
+
+    Each chunk is inserted with executemany inside its own transaction, so
+    several tables can stream into the same database at once, and indexes
+    are only built once the table is fully loaded.
+    """
+
+    extension = '.sqlite'
+    shared_output = True
+    appends_in_place = True
+
+    def __init__(self, database_file, schema_table, index_columns=None, append=False):
+        self.output_file = database_file
+        self.schema_table = schema_table
+        self.table_name = schema_table.name
+        self.index_columns = index_columns
+        self.append = append
+        self.rows_written = 0
+        self.fieldnames = None
+        self.connection = None
+        self.insert_sql = None
+
+    @classmethod
+    def from_config(cls, output_file, schema_table, options, append=False):
+        """Create a writer from the output.sqlite config section"""
+        if schema_table is None:
+            raise ValueError(f"SQLite output needs a schema table for {output_file}")
+        return cls(output_file, schema_table, options.get('index_columns'), append)
+
+    @classmethod
+    def file_extension(cls, options):
+        return cls.extension
+
+    @classmethod
+    def output_path(cls, folder, table_name, options):
+        """Every table is loaded into one database file"""
+        return os.path.join(folder, options.get('database', DEFAULT_DATABASE))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def connect(self):
+        folder = os.path.dirname(self.output_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        # Autocommit mode: transactions are opened explicitly around each batch
+        self.connection = sqlite3.connect(self.output_file, timeout=60, isolation_level=None)
+        self.connection.execute('PRAGMA journal_mode = WAL')
+        self.connection.execute('PRAGMA synchronous = OFF')
+
+    def create_table_sql(self):
+        definitions = []
+        for column in self.schema_table.columns:
+            sql_type = SQL_TYPES.get(column.type, 'TEXT')
+            if column.name == 'id':
+                definitions.append(f'{quote(column.name)} {sql_type} PRIMARY KEY')
+            else:
+                definitions.append(f'{quote(column.name)} {sql_type}')
+        return f'CREATE TABLE IF NOT EXISTS {quote(self.table_name)} ({", ".join(definitions)})'
+
+    def open(self, first_row):
+        """Recreate the table, or keep it when appending, and prepare the insert for the columns present in the rows"""
+        self.connect()
+        self.fieldnames = [name for name in self.schema_table.column_names if name in first_row]
+
+        if not self.append:
+            self.connection.execute(f'DROP TABLE IF EXISTS {quote(self.table_name)}')
+        self.connection.execute(self.create_table_sql())
+
+        columns = ', '.join(quote(name) for name in self.fieldnames)
+        placeholders = ', '.join('?' for _ in self.fieldnames)
+        self.insert_sql = f'INSERT INTO {quote(self.table_name)} ({columns}) VALUES ({placeholders})'
+
+    def write_chunk(self, chunk):
+        """Insert a chunk: a list of row dicts or a table of columns"""
+        if isinstance(chunk, Mapping):
+            self.write_columns(chunk)
+            return
+
+        if not chunk:
+            return
+
+        if self.connection is None:
+            self.open(chunk[0])
+
+        fieldnames = self.fieldnames
+        self.insert_rows([tuple(row.get(name) for name in fieldnames) for row in chunk])
+
+    def write_columns(self, columns):
+        """Insert a columnar chunk without building a dict per row"""
+        if not columns:
+            return
+
+        if self.connection is None:
+            self.open(columns)
+
+        values = [columns[name].tolist() for name in self.fieldnames]
+        self.insert_rows(list(zip(*values)))
+
+    def insert_rows(self, rows):
+        self.connection.execute('BEGIN')
+        try:
+            self.connection.executemany(self.insert_sql, rows)
+        except Exception:
+            self.connection.execute('ROLLBACK')
+            raise
+        self.connection.execute('COMMIT')
+        self.rows_written += len(rows)
+
+    def write_chunks(self, chunks):
+        """Consume a chunk stream and return the number of rows written"""
+        for rows in chunks:
+            self.write_chunk(rows)
+        return self.rows_written
+
+    def get_index_columns(self):
+        """Columns to index after the load: the configured ones, or every *_id column"""
+        if self.index_columns is not None:
+            return [name for name in self.index_columns if name in self.fieldnames]
+        return [name for name in self.fieldnames if name.endswith('_id')]
+
+    def create_indexes(self):
+        self.connection.execute('BEGIN')
+        for name in self.get_index_columns():
+            index_name = quote(f'idx_{self.table_name}_{name}')
+            self.connection.execute(
+                f'CREATE INDEX IF NOT EXISTS {index_name} ON {quote(self.table_name)} ({quote(name)})')
+        self.connection.execute('COMMIT')
+
+    def close(self):
+        if self.connection is not None:
+            self.create_indexes()
+            self.connection.close()
+            self.connection = None
+
+    @classmethod
+    def read_chunks(cls, input_file, table_name, chunk_size):
+        """Stream a loaded table back as chunks of row dicts"""
+        connection = sqlite3.connect(input_file)
+        try:
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+            if not exists:
+                return
+
+            cursor = connection.execute(f'SELECT * FROM {quote(table_name)} ORDER BY rowid')
+            fieldnames = [description[0] for description in cursor.description]
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    return
+                yield [dict(zip(fieldnames, row)) for row in rows]
+        finally:
+            connection.close()
+
+    @classmethod
+    def high_water_mark(cls, input_file, table_name):
+        """Largest id and row count of a loaded table, straight from the database"""
+        connection = sqlite3.connect(input_file)
+        try:
+            exists = connection.execute(
+                "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table_name,)).fetchone()
+            if not exists:
+                return 0, 0
+            max_id, rows = connection.execute(f'SELECT MAX(id), COUNT(*) FROM {quote(table_name)}').fetchone()
+            return max_id or 0, rows
+        finally:
+            connection.close()
+
+    def merge_parts(self, part_files):
+        """Copy each shard's part database into the table, in shard order"""
+        for part_file in part_files:
+            if self.connection is None:
+                self.connect()
+                self.fieldnames = self.part_columns(part_file)
+                self.connection.execute(f'DROP TABLE IF EXISTS {quote(self.table_name)}')
+                self.connection.execute(self.create_table_sql())
+
+            columns = ', '.join(quote(name) for name in self.fieldnames)
+            self.connection.execute('ATTACH DATABASE ? AS part', (part_file,))
+            self.connection.execute('BEGIN')
+            cursor = self.connection.execute(
+                f'INSERT INTO {quote(self.table_name)} ({columns}) '
+                f'SELECT {columns} FROM part.{quote(self.table_name)}')
+            self.connection.execute('COMMIT')
+            self.connection.execute('DETACH DATABASE part')
+            self.rows_written += cursor.rowcount
+
+    def part_columns(self, part_file):
+        connection = sqlite3.connect(part_file)
+        try:
+            cursor = connection.execute(f'SELECT * FROM {quote(self.table_name)} LIMIT 0')
+            return [description[0] for description in cursor.description]
+        finally:
+            connection.close()
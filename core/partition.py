@@ -0,0 +1,292 @@
+import heapq
+import os
+import shutil
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+
+import numpy as np
+from core import columnar
+from core.metrics import phase
+from core.output import create_writer, get_writer_class
+from core.stream import chunked
+from core.table import ColumnTable
+
+
+DEFAULT_BUCKETS = 8
+DEFAULT_PARTITION_FOLDER = 'outputs/buckets'
+
+# Column each table is bucketed by. Tables that are joined share a key, so
+# customer addresses land in the bucket of their customer, stock rows and
+# category links in the bucket of their product and order lines in the
+# bucket of their order.
+DEFAULT_PARTITION_KEYS = {
+    'category': 'id',
+    'product': 'id',
+    'category_product': 'product_id',
+    'stock_inventory': 'product_id',
+    'customers': 'id',
+    'customer_address': 'customer_id',
+    'sale_order_web': 'id',
+    'sale_order_web_items': 'order_id',
+    'sale_order_web_address': 'order_id',
+    'sale_order_pos': 'id',
+    'sale_order_pos_items': 'order_id',
+}
+
+# Fibonacci hashing spreads consecutive ids evenly over the buckets
+HASH_MULTIPLIER = np.uint64(0x9E3779B97F4A7C15)
+
+
+def bucket_numbers(values, buckets):
+    """Bucket of each key, the same in every table; rows without a key go to bucket 0"""
+    keys, present = columnar.integer_keys(values)
+    hashed = (keys.astype(np.uint64) * HASH_MULTIPLIER) >> np.uint64(32)
+    numbers = (hashed % np.uint64(buckets)).astype(np.int64)
+    numbers[~present] = 0
+    return numbers
+
+
+def split_chunk(chunk, key_name, buckets):
+    """{bucket: part of the chunk} for a list of row dicts or a table of columns, keeping row order"""
+    if isinstance(chunk, Mapping):
+        numbers = bucket_numbers(chunk[key_name], buckets)
+        order = np.argsort(numbers, kind='stable')
+        bounds = np.searchsorted(numbers[order], np.arange(buckets + 1))
+        return {
+            bucket: ColumnTable({name: values[order[start:end]] for name, values in chunk.items()})
+            for bucket, (start, end) in enumerate(zip(bounds[:-1], bounds[1:]))
+            if end > start
+        }
+
+    numbers = bucket_numbers(columnar.chunk_column(chunk, key_name), buckets)
+    parts = {}
+    for row, bucket in zip(chunk, numbers.tolist()):
+        parts.setdefault(bucket, []).append(row)
+    return parts
+
+
+def merge_by_id(streams, chunk_size):
+    """Merge streams of row chunks, each in id order, into one stream of chunks in id order
+
+    Every table is written in id order and a bucket keeps the order of its
+    rows, so the files of a table's buckets merge back into the table.
+    """
+    rows = heapq.merge(*(chain.from_iterable(stream) for stream in streams), key=lambda row: int(row['id']))
+    yield from chunked(rows, chunk_size)
+
+
+class TablePartitioner:
+    """Write tables as N buckets by the hash of a key column, co-partitioned across tables
+
+    Every table hashes its key the same way, so rows that join on the key
+    sit in the same bucket number of both tables and a join can run bucket
+    by bucket. Buckets are written to <folder>/<table>/bucket=<n>/ while
+    the table is generated: writers split each chunk and hand its parts to
+    per-bucket worker threads. The table's own file is only written as well
+    when table_files is set.
+    """
+
+    def __init__(self, config):
+        self.output_config = config.get('output', {})
+        partition_config = self.output_config.get('partitioning', {})
+        self.enabled = partition_config.get('enable', False)
+        self.buckets = partition_config.get('buckets', DEFAULT_BUCKETS)
+        if self.buckets < 1:
+            raise ValueError(f"Partitioning needs at least one bucket, got {self.buckets}")
+        self.folder = partition_config.get('folder', DEFAULT_PARTITION_FOLDER)
+        self.workers = min(partition_config.get('workers') or self.buckets, self.buckets)
+        self.keys = dict(DEFAULT_PARTITION_KEYS, **partition_config.get('keys', {}))
+        self.table_files = partition_config.get('table_files', False)
+        self.output_format = self.output_config.get('format', 'csv')
+        self.writer_class = get_writer_class(self.output_format)
+        self.options = self.output_config.get(self.output_format, {})
+
+    @property
+    def buckets_only(self):
+        """Whether tables are written only as buckets, without a file of their own"""
+        return self.enabled and not self.table_files
+
+    def table_folder(self, table_name):
+        return os.path.join(self.folder, table_name)
+
+    def bucket_folder(self, table_name, bucket):
+        return os.path.join(self.table_folder(table_name), f'bucket={bucket:05d}')
+
+    def bucket_file(self, table_name, bucket, file_name=None):
+        """A file of a bucket: the bucket's own file, or one named file_name beside it"""
+        bucket_folder = self.bucket_folder(table_name, bucket)
+        if file_name is None:
+            return self.writer_class.output_path(bucket_folder, table_name, self.options)
+        return os.path.join(bucket_folder, f'{file_name}{self.writer_class.file_extension(self.options)}')
+
+    def bucket_files(self, table_name):
+        """Files holding the buckets of a table, bucket by bucket"""
+        table_folder = self.table_folder(table_name)
+        if not os.path.isdir(table_folder):
+            return []
+
+        extension = self.writer_class.file_extension(self.options)
+        files = []
+        for bucket_folder in sorted(os.listdir(table_folder)):
+            bucket_path = os.path.join(table_folder, bucket_folder)
+            if os.path.isdir(bucket_path):
+                files += [os.path.join(bucket_path, name) for name in sorted(os.listdir(bucket_path))
+                          if name.endswith(extension)]
+        return files
+
+    def clear(self, table_name):
+        """Remove a table's buckets, so buckets of an earlier build do not mix with new ones"""
+        if self.enabled:
+            shutil.rmtree(self.table_folder(table_name), ignore_errors=True)
+
+    def key_name(self, table_name):
+        key_name = self.keys.get(table_name)
+        if key_name is None:
+            raise ValueError(f"No partition key configured for table '{table_name}'")
+        return key_name
+
+    def create_writer(self, table_name, output_file, schema_table=None, append_from=None, part_index=None):
+        """Writer for a table: its file, its buckets, or both
+
+        A full write replaces the table's buckets. append_from adds rows whose
+        ids start there after the existing ones; part_index writes one shard's
+        part of every bucket, for merge_parts.
+        """
+        append = append_from is not None and self.writer_class.appends_in_place
+        if not self.enabled:
+            return create_writer(self.output_config, output_file, schema_table, append)
+
+        if append_from is None and part_index is None:
+            self.clear(table_name)
+        table_writer = create_writer(self.output_config, output_file, schema_table, append) if self.table_files else None
+        if part_index is not None:
+            file_name = f'part-{part_index:05d}'
+        elif append_from is not None and not append:
+            # Zero-padded so the files sort in id order
+            file_name = f'{append_from:012d}'
+        else:
+            file_name = None
+        return PartitionedWriter(self, table_name, schema_table, table_writer, file_name, append)
+
+    def merge_parts(self, table_name, schema_table=None):
+        """Combine the shard parts of each bucket into the bucket's own file, buckets in parallel"""
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [executor.submit(self.merge_bucket, table_name, bucket, schema_table)
+                       for bucket in range(self.buckets)]
+            for future in futures:
+                future.result()
+
+    def merge_bucket(self, table_name, bucket, schema_table=None):
+        bucket_folder = self.bucket_folder(table_name, bucket)
+        if not os.path.isdir(bucket_folder):
+            return
+
+        part_files = [os.path.join(bucket_folder, name) for name in sorted(os.listdir(bucket_folder))
+                      if name.startswith('part-')]
+        if not part_files:
+            return
+
+        with create_writer(self.output_config, self.bucket_file(table_name, bucket), schema_table) as writer:
+            writer.merge_parts(part_files)
+        for part_file in part_files:
+            os.remove(part_file)
+
+    def partition(self, table_name, chunks, schema_table=None):
+        """Write a stream of chunks as the buckets of table_name alone; returns the rows written per bucket"""
+        self.clear(table_name)
+        writer = PartitionedWriter(self, table_name, schema_table)
+        with writer:
+            writer.write_chunks(chunks)
+        return writer.bucket_rows()
+
+
+class PartitionedWriter:
+    """Table writer that splits each chunk by bucket and writes the parts in parallel
+
+    A bucket always goes to the same single-thread worker: its parts stay in
+    order and its writer is only used from one thread, as SQLite connections
+    require. While the parts of a chunk are being written, the table's own
+    file, when there is one, gets the whole chunk and the next chunk is
+    generated and split.
+    """
+
+    def __init__(self, partitioner, table_name, schema_table=None, table_writer=None, file_name=None, append=False):
+        self.partitioner = partitioner
+        self.table_name = table_name
+        self.schema_table = schema_table
+        self.table_writer = table_writer
+        self.file_name = file_name
+        self.append = append
+        self.key_name = partitioner.key_name(table_name)
+        self.writers = {}
+        self.pending = []
+        self.rows_written = 0
+        self.executors = [ThreadPoolExecutor(max_workers=1) for _ in range(partitioner.workers)]
+
+    @property
+    def output_file(self):
+        """Where the table went: its own file, or the folder of its buckets"""
+        if self.table_writer is not None:
+            return self.table_writer.output_file
+        return self.partitioner.table_folder(self.table_name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def write_bucket(self, bucket, part):
+        if bucket not in self.writers:
+            bucket_file = self.partitioner.bucket_file(self.table_name, bucket, self.file_name)
+            self.writers[bucket] = create_writer(
+                self.partitioner.output_config, bucket_file, self.schema_table, self.append)
+        self.writers[bucket].write_chunk(part)
+
+    def wait(self):
+        with phase('export'):
+            pending, self.pending = self.pending, []
+            for future in pending:
+                future.result()
+
+    def write_chunk(self, chunk):
+        """Split a chunk of row dicts or columns and queue its parts on their buckets' workers"""
+        count = columnar.row_count(chunk) if isinstance(chunk, Mapping) else len(chunk)
+        if not count:
+            return
+
+        parts = split_chunk(chunk, self.key_name, self.partitioner.buckets)
+        # Parts of the previous chunk are done before new ones are queued, so one chunk is in flight
+        self.wait()
+        workers = len(self.executors)
+        self.pending = [self.executors[bucket % workers].submit(self.write_bucket, bucket, part)
+                        for bucket, part in parts.items()]
+        if self.table_writer is not None:
+            self.table_writer.write_chunk(chunk)
+        self.rows_written += count
+
+    def write_chunks(self, chunks):
+        """Consume a chunk stream and return the number of rows written"""
+        for chunk in chunks:
+            self.write_chunk(chunk)
+        return self.rows_written
+
+    def bucket_rows(self):
+        """Rows written to each bucket"""
+        return {bucket: writer.rows_written for bucket, writer in sorted(self.writers.items())}
+
+    def close(self):
+        try:
+            self.wait()
+        finally:
+            workers = len(self.executors)
+            self.pending = [self.executors[bucket % workers].submit(writer.close)
+                            for bucket, writer in self.writers.items()]
+            try:
+                self.wait()
+            finally:
+                for executor in self.executors:
+                    executor.shutdown()
+                if self.table_writer is not None:
+                    self.table_writer.close()
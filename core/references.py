@@ -0,0 +1,228 @@
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+from core.order.base import REFERENCE_COLUMNS, addresses_by_customer, collect_columns, reference_columns
+
+
+REFERENCES_FOLDER = '.references'
+
+
+def open_map(path, dtype):
+    """Read-only memory map of a file, or an empty array for an empty file, which cannot be mapped"""
+    if not os.path.getsize(path):
+        return np.empty(0, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode='r')
+
+
+class StoredColumn:
+    """A number column of a stored table, read through a memory map
+
+    Indexing reads only the picked rows. Pickling keeps just the path, so
+    shard workers map the file themselves instead of receiving its data.
+    """
+
+    def __init__(self, path, dtype, rows):
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.rows = rows
+        self.values = None
+
+    def __getstate__(self):
+        return {'path': self.path, 'dtype': self.dtype, 'rows': self.rows, 'values': None}
+
+    def __len__(self):
+        return self.rows
+
+    def array(self):
+        if self.values is None:
+            self.values = open_map(self.path, self.dtype)[:self.rows]
+        return self.values
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.array()
+        return values if dtype is None else values.astype(dtype)
+
+    def __getitem__(self, index):
+        return np.asarray(self.array()[index])
+
+
+class StoredStrings(StoredColumn):
+    """A string column of a stored table: UTF-8 bytes, and where each value ends in them"""
+
+    def __init__(self, path, rows):
+        super().__init__(path, np.int64, rows)
+        self.data = None
+
+    def __getstate__(self):
+        return dict(super().__getstate__(), data=None)
+
+    def __getitem__(self, index):
+        if self.data is None:
+            self.data = open_map(self.path + '.bytes', np.uint8)
+
+        ends = self.array()
+        index = np.asarray(index, dtype=np.int64)
+        stops = ends[index]
+        starts = np.where(index > 0, ends[np.maximum(index - 1, 0)], 0)
+        values = np.empty(len(index), dtype=object)
+        values[:] = [self.data[start:stop].tobytes().decode('utf-8')
+                     for start, stop in zip(starts.tolist(), stops.tolist())]
+        return values
+
+
+class ReferenceStore:
+    """Columns that orders point at, kept in files beside the tables they come from
+
+    Products, customers and addresses are stored as one file per column, so
+    building orders maps them instead of reading the tables back, and an
+    append adds only its new customers and addresses. An entry is trusted
+    while its table still ends at the id and row count it was stored with;
+    otherwise, and after every full write of the table, it is rebuilt from
+    the table once.
+    """
+
+    def __init__(self, output_folder, high_water_mark, read_table):
+        self.folder = os.path.join(output_folder, REFERENCES_FOLDER)
+        self.manifest_file = os.path.join(self.folder, 'manifest.json')
+        self.high_water_mark = high_water_mark
+        self.read_table = read_table
+        self.lock = threading.Lock()
+
+    def load_manifest(self):
+        try:
+            with open(self.manifest_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def save_manifest(self, manifest):
+        os.makedirs(self.folder, exist_ok=True)
+        temp_file = self.manifest_file + '.tmp'
+        with open(temp_file, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, sort_keys=True)
+        os.replace(temp_file, self.manifest_file)
+
+    def table_folder(self, table_name):
+        return os.path.join(self.folder, table_name)
+
+    def column_path(self, table_name, name):
+        return os.path.join(self.table_folder(table_name), name)
+
+    def entry(self, table_name):
+        with self.lock:
+            return self.load_manifest().get(table_name)
+
+    def discard(self, table_name):
+        """Forget a table's stored columns, when the table was written anew"""
+        with self.lock:
+            manifest = self.load_manifest()
+            if manifest.pop(table_name, None) is not None:
+                self.save_manifest(manifest)
+
+    def record(self, table_name, rows, columns):
+        """Remember how many stored rows are valid, along with where the table ends now"""
+        with self.lock:
+            manifest = self.load_manifest()
+            manifest[table_name] = {
+                'rows': rows,
+                'columns': columns,
+                'mark': [int(value) for value in self.high_water_mark(table_name)],
+            }
+            self.save_manifest(manifest)
+
+    def ensure(self, table_name):
+        """Make a table's stored columns match the table, reading it back only when they do not"""
+        entry = self.entry(table_name)
+        mark = [int(value) for value in self.high_water_mark(table_name)]
+        if entry and entry['mark'] == mark:
+            return entry
+
+        print(f"Storing the {table_name} columns orders point at...")
+        shutil.rmtree(self.table_folder(table_name), ignore_errors=True)
+        columns = reference_columns(table_name, self.read_table(table_name))
+        rows = self.write(table_name, columns, 0)
+        self.record(table_name, rows, {name: self.column_type(values) for name, values in columns.items()})
+        return self.entry(table_name)
+
+    def column_type(self, values):
+        dtype = np.asarray(values).dtype
+        return 'str' if dtype == object else dtype.name
+
+    def write(self, table_name, columns, rows):
+        """Add columns after the first rows valid rows of each column file; returns the rows now stored"""
+        os.makedirs(self.table_folder(table_name), exist_ok=True)
+        count = 0
+        for name, values in columns.items():
+            path = self.column_path(table_name, name)
+            values = np.asarray(values)
+            count = len(values)
+            if values.dtype != object:
+                self.extend_file(path, rows * values.itemsize, values.tobytes())
+                continue
+
+            # Reference fields are never null; a missing value is kept as an empty string
+            encoded = [('' if value is None else str(value)).encode('utf-8') for value in values]
+            ends = open_map(path, np.int64)[:rows] if os.path.exists(path) else np.empty(0, dtype=np.int64)
+            size = int(ends[-1]) if len(ends) else 0
+            self.extend_file(path + '.bytes', size, b''.join(encoded))
+            new_ends = size + np.cumsum([len(value) for value in encoded], dtype=np.int64)
+            self.extend_file(path, rows * 8, new_ends.tobytes())
+        return rows + count
+
+    def extend_file(self, path, valid_size, data):
+        """Write data after the first valid_size bytes of a file, dropping what an interrupted write left"""
+        with open(path, 'ab') as f:
+            f.truncate(valid_size)
+            f.write(data)
+
+    def extend(self, table_name, chunks):
+        """Pass a stream of appended chunks through, adding their rows to the stored columns
+
+        ensure() is called for the table before its new rows are written and
+        commit() once the writer is closed.
+        """
+        entry = self.entry(table_name)
+        if entry is None:
+            yield from chunks
+            return
+
+        rows = entry['rows']
+        last_customer = None
+        if table_name == 'customer_address' and rows:
+            last_customer = StoredColumn(self.column_path(table_name, 'customer_id'), np.int64, rows)[rows - 1]
+        for chunk in chunks:
+            columns = collect_columns([chunk], REFERENCE_COLUMNS[table_name])
+            if table_name == 'customer_address' and len(columns['customer_id']):
+                columns = addresses_by_customer(columns)
+                if last_customer is not None and columns['customer_id'][0] < last_customer:
+                    # Addresses of earlier customers would break the order by customer, so rebuild instead
+                    self.discard(table_name)
+                    yield chunk
+                    yield from chunks
+                    return
+                last_customer = columns['customer_id'][-1]
+            rows = self.write(table_name, columns, rows)
+            yield chunk
+
+        with self.lock:
+            manifest = self.load_manifest()
+            manifest[table_name]['rows'] = rows
+            self.save_manifest(manifest)
+
+    def commit(self, table_name):
+        """Record where a table ends after rows were appended through extend()"""
+        entry = self.entry(table_name)
+        if entry is not None:
+            self.record(table_name, entry['rows'], entry['columns'])
+
+    def load(self, table_name):
+        """{column name: stored column} of a table, after ensure()"""
+        entry = self.entry(table_name)
+        return {
+            name: StoredStrings(self.column_path(table_name, name), entry['rows']) if column_type == 'str' else
+            StoredColumn(self.column_path(table_name, name), column_type, entry['rows'])
+            for name, column_type in entry['columns'].items()
+        }
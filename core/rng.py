@@ -0,0 +1,56 @@
+import random
+import zlib
+
+import numpy as np
+
+
+# Sub-streams of a table seed, so the row, columnar and sharded paths never share draws
+ROWS_STREAM = 0
+COLUMNS_STREAM = 1
+SHARDS_STREAM = 2
+APPEND_STREAM = 3
+
+
+def table_key(table_name):
+    """Stable integer for a table name, so seeds do not depend on table order"""
+    return zlib.crc32(table_name.encode('utf-8'))
+
+
+def table_seed(config, table_name, *keys):
+    """Seed sequence of one table's stream, spawned from the global config seed
+
+    The stream is keyed by the table name rather than by position, so adding
+    or reordering tables leaves the other tables' data unchanged. Without a
+    seed in the config every run draws fresh entropy.
+    """
+    return np.random.SeedSequence(config.get('seed'), spawn_key=(table_key(table_name),) + keys)
+
+
+def stream_seed(seed, stream):
+    """Independent child stream of a seed, e.g. row counts (0) and values (1)"""
+    return np.random.SeedSequence(seed.entropy, spawn_key=tuple(seed.spawn_key) + (stream,))
+
+
+def shard_seed(config, table_name, shard_index):
+    """Seed sequence of one shard of a table"""
+    return table_seed(config, table_name, SHARDS_STREAM, shard_index)
+
+
+def append_seed(config, table_name, start_id):
+    """Seed sequence of rows appended from start_id on, so every append draws new values"""
+    return table_seed(config, table_name, APPEND_STREAM, start_id)
+
+
+def python_seed(seed):
+    """Integer seed for random.Random derived from a seed sequence"""
+    return int.from_bytes(seed.generate_state(4).tobytes(), 'little')
+
+
+def python_rng(config, table_name):
+    """random.Random for a generator's row-by-row path"""
+    return random.Random(python_seed(table_seed(config, table_name, ROWS_STREAM)))
+
+
+def numpy_rng(config, table_name):
+    """numpy Generator for a generator's columnar path"""
+    return np.random.default_rng(table_seed(config, table_name, COLUMNS_STREAM))
@@ -0,0 +1,140 @@
+import math
+
+import numpy as np
+
+
+DISTRIBUTIONS = ('uniform', 'weighted', 'empirical', 'zipf', 'normal')
+
+
+class AliasTable:
+    """Walker alias table over 0 .. n-1: O(1) draws from any discrete distribution
+
+    Built once in O(n) with Vose's method. Each draw picks a column
+    uniformly and keeps it or takes its alias by one biased coin, so a
+    batch of draws is two vectorized random arrays and a where.
+    """
+
+    def __init__(self, weights):
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.ndim != 1 or not len(weights):
+            raise ValueError("Alias table needs a non-empty list of weights")
+        if not np.all(np.isfinite(weights)) or np.any(weights < 0) or not weights.sum() > 0:
+            raise ValueError("Alias table weights must be finite, non-negative and not all zero")
+
+        self.weights = weights
+        self.size = len(weights)
+
+        scaled = (weights * (self.size / weights.sum())).tolist()
+        prob = [1.0] * self.size
+        alias = list(range(self.size))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+
+        while small and large:
+            less = small.pop()
+            more = large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+
+        # Whatever is left is 1 up to rounding error
+        self.prob = np.array(prob, dtype=np.float64)
+        self.alias = np.array(alias, dtype=np.int64)
+
+    def __len__(self):
+        return self.size
+
+    def draw(self, rng, count):
+        """count indices drawn with a numpy Generator"""
+        column = rng.integers(0, self.size, count)
+        return np.where(rng.random(count) < self.prob[column], column, self.alias[column])
+
+    def choice(self, random):
+        """One index drawn with a random.Random"""
+        column = random.randrange(self.size)
+        return column if random.random() < self.prob[column] else int(self.alias[column])
+
+    def sample(self, random, k):
+        """k distinct indices, each round drawn in proportion to the weights left
+
+        Uses Efraimidis-Spirakis keys, so it is one pass over the weights;
+        zero-weight indices come last and only when k needs them.
+        """
+        keys = []
+        for index, weight in enumerate(self.weights.tolist()):
+            u = 1.0 - random.random()
+            keys.append((math.log(u) / weight if weight > 0 else -math.inf, index))
+        keys.sort(reverse=True)
+        return [index for _, index in keys[:k]]
+
+
+def normalize_spec(spec):
+    """A distribution spec as a dict; a bare name like "zipf" is allowed"""
+    if spec is None:
+        return {'type': 'uniform'}
+    if isinstance(spec, str):
+        spec = {'type': spec}
+    if spec.get('type', 'uniform') not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution '{spec.get('type')}'; expected one of {', '.join(DISTRIBUTIONS)}")
+    return spec
+
+
+def distribution_weights(spec, size, values=None):
+    """Weights of positions 0 .. size-1 under a distribution spec; None when it is uniform
+
+    - weighted: "weights" as a list in value order, or "field" naming a
+      numeric field of the fixture records
+    - empirical: "counts" mapping observed values to how often they occur;
+      values not listed get "default" (0)
+    - zipf: rank r (the value's position, from 0) has weight 1 / (r + 1) ** s
+    - normal: a bell over the positions, "mean" and "stddev" given as
+      fractions of the range
+    """
+    spec = normalize_spec(spec)
+    kind = spec.get('type', 'uniform')
+    positions = np.arange(size, dtype=np.float64)
+
+    if kind == 'uniform':
+        return None
+    if kind == 'zipf':
+        return 1.0 / (positions + 1) ** spec.get('s', 1.1)
+    if kind == 'normal':
+        mean = spec.get('mean', 0.5) * max(size - 1, 0)
+        stddev = max(spec.get('stddev', 0.15) * size, 1e-9)
+        return np.exp(-0.5 * ((positions - mean) / stddev) ** 2)
+    if values is None and (kind == 'empirical' or 'field' in spec):
+        raise ValueError(f"A {kind} distribution over a field needs fixture values")
+    if kind == 'empirical':
+        counts = spec.get('counts', {})
+        default = spec.get('default', 0)
+        weights = np.array([counts.get(str(value), default) for value in values], dtype=np.float64)
+        if not weights.any():
+            raise ValueError("None of the values with empirical counts occur in the fixture")
+        return weights
+
+    if 'field' in spec:
+        records = getattr(values, 'columns', {})
+        if spec['field'] in records:
+            return np.array(records[spec['field']].tolist(), dtype=np.float64)
+        if not all(isinstance(value, dict) for value in values):
+            raise ValueError(f"Fixture values are not records with a '{spec['field']}' field")
+        return np.array([value.get(spec['field'], 0) for value in values], dtype=np.float64)
+
+    weights = np.asarray(spec.get('weights', []), dtype=np.float64)
+    if len(weights) != size:
+        raise ValueError(f"Distribution has {len(weights)} weights for {size} values")
+    return weights
+
+
+def build_sampler(spec, size, values=None):
+    """Alias table for a distribution spec over size positions, or None for uniform draws"""
+    weights = distribution_weights(spec, size, values)
+    return None if weights is None else AliasTable(weights)
+
+
+def draw(rng, sampler, size, count):
+    """count positions from 0 .. size-1: from the sampler, or uniformly without one"""
+    if sampler is None:
+        return rng.integers(0, size, count)
+    return sampler.draw(rng, count)
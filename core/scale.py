@@ -0,0 +1,176 @@
+import copy
+import math
+
+from core.catalog.category.entity import CategoryGenerator
+from core.catalog.product.configurable import ConfigurableProductGenerator
+from core.catalog.product.simple import SimpleProductGenerator
+from core.schema import get_schema
+
+
+# Named presets, as in TPC-H/TPC-DS where SF 1 is the reference size
+SCALE_PRESETS = {
+    'SF0.01': 0.01,
+    'SF0.1': 0.1,
+    'SF1': 1,
+    'SF10': 10,
+    'SF100': 100,
+    'SF1000': 1000,
+}
+
+# Row counts at SF 1; every other scale factor multiplies them
+CUSTOMERS_PER_SCALE = 100000
+CONFIGURABLE_PARENTS_PER_SCALE = 10000
+WEB_ORDERS_PER_SCALE = 1000000
+POS_ORDERS_PER_SCALE = 500000
+
+# Stock rows grow with products times warehouses, so warehouses grow slowly like TPC-DS's
+WAREHOUSES_BY_SCALE = ((0, 2), (0.1, 3), (1, 5), (10, 10), (100, 15), (1000, 20))
+
+# Rough CSV width of a value of each schema type, for size estimates
+TYPE_BYTES = {'int': 2, 'float': 6, 'varchar': 12, 'date': 10, 'timestamp': 19}
+
+
+def resolve_scale_factor(value):
+    """Scale factor as a number, from a number or a preset name like "SF10"; None when unset"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        if value not in SCALE_PRESETS:
+            raise ValueError(f"Unknown scale factor preset '{value}'; expected one of {', '.join(SCALE_PRESETS)}")
+        return SCALE_PRESETS[value]
+    if value <= 0:
+        raise ValueError(f"Scale factor must be positive, got {value}")
+    return value
+
+
+def scaled_count(per_scale, scale_factor):
+    return max(1, int(round(per_scale * scale_factor)))
+
+
+def apply_scale_factor(config):
+    """Config with every table size derived from its scale_factor; unchanged without one
+
+    Configurable parents are split across the rules in proportion to their
+    configured limits. Fixture-bounded tables (categories, simple products)
+    and per-row ratios such as max_address_per_customer are left as they are.
+    """
+    scale_factor = resolve_scale_factor(config.get('scale_factor'))
+    if scale_factor is None:
+        return config
+
+    config = copy.deepcopy(config)
+    catalog = config.setdefault('catalog', {})
+
+    rules = catalog.get('product', {}).get('configurable', {}).get('rules', [])
+    total_limit = sum(rule.get('limit', 100) for rule in rules)
+    parents = scaled_count(CONFIGURABLE_PARENTS_PER_SCALE, scale_factor)
+    for rule in rules:
+        share = rule.get('limit', 100) / total_limit if total_limit else 1 / len(rules)
+        rule['limit'] = max(1, int(round(parents * share)))
+
+    warehouses = [count for threshold, count in WAREHOUSES_BY_SCALE if scale_factor >= threshold]
+    catalog.setdefault('stock_inventory', {})['warehouses'] = warehouses[-1]
+
+    config.setdefault('customer', {}).setdefault('entity', {})['limit'] = \
+        scaled_count(CUSTOMERS_PER_SCALE, scale_factor)
+
+    orders = config.setdefault('order', {})
+    orders.setdefault('web', {})['limit'] = scaled_count(WEB_ORDERS_PER_SCALE, scale_factor)
+    orders.setdefault('pos', {})['limit'] = scaled_count(POS_ORDERS_PER_SCALE, scale_factor)
+
+    return config
+
+
+def estimate_rows(config):
+    """Expected row count of every enabled table, in generation order"""
+    catalog = config.get('catalog', {})
+    rows = {}
+
+    category_config = catalog.get('category', {})
+    if category_config.get('enable', False):
+        rows['category'] = len(CategoryGenerator(config).build_categories())
+
+    products = 0
+    simple_config = catalog.get('product', {}).get('simple', {})
+    if simple_config.get('enable', False) and simple_config.get('fixture'):
+        simple_count = len(SimpleProductGenerator(config).extract_fixture_values(simple_config['fixture']))
+        limit = simple_config.get('limit', 0)
+        products += min(simple_count, limit) if limit > 0 else simple_count
+
+    configurable_config = catalog.get('product', {}).get('configurable', {})
+    if configurable_config.get('enable', False):
+        generator = ConfigurableProductGenerator(config)
+        for rule in configurable_config.get('rules', []):
+            products += rule.get('limit', 100) * generator.count_rows_per_parent(rule)
+    rows['product'] = products
+
+    category_product_config = catalog.get('category_product', {})
+    if category_product_config.get('enable', False):
+        # An upper bound: products without a matching category get no row
+        rows['category_product'] = products * category_product_config.get('max_categories', 1)
+
+    stock_config = catalog.get('stock_inventory', {})
+    if stock_config.get('enable', False):
+        rows['stock_inventory'] = round(products * (1 + stock_config.get('warehouses', 3)) / 2)
+
+    customer_config = config.get('customer', {}).get('entity', {})
+    address_config = config.get('customer', {}).get('address', {})
+    customers = customer_config.get('limit', 100) if customer_config.get('enable', False) else 0
+    if customers:
+        rows['customers'] = customers
+    if customers and address_config.get('enable', False):
+        rows['customer_address'] = round(customers * (1 + address_config.get('max_address_per_customer', 2)) / 2)
+
+    for key, order_table, item_table in (('web', 'sale_order_web', 'sale_order_web_items'),
+                                         ('pos', 'sale_order_pos', 'sale_order_pos_items')):
+        order_config = config.get('order', {}).get(key, {})
+        if not order_config.get('enable', False):
+            continue
+        orders = order_config.get('limit', 100)
+        rows[order_table] = orders
+        rows[item_table] = round(orders * (1 + order_config.get('max_items_per_order', 5)) / 2)
+        if key == 'web':
+            rows['sale_order_web_address'] = orders
+
+    return rows
+
+
+def estimate_row_bytes(schema_table, rows):
+    """Approximate CSV bytes of one row; id columns widen with the row count"""
+    id_digits = len(str(max(rows, 1)))
+    size = 0
+    for col in schema_table.columns:
+        if col.type == 'int' and (col.name == 'id' or col.name.endswith('_id')):
+            size += id_digits
+        else:
+            size += TYPE_BYTES.get(col.type, TYPE_BYTES['varchar'])
+        size += 1  # separator or newline
+    return size
+
+
+def format_bytes(size):
+    units = ('B', 'KB', 'MB', 'GB', 'TB')
+    exponent = min(int(math.log(max(size, 1), 1024)), len(units) - 1)
+    return f"{size / 1024 ** exponent:.1f} {units[exponent]}"
+
+
+def report_estimates(config):
+    """Print the expected rows and approximate CSV size of every table before a run"""
+    schema = get_schema(config.get('schema', 'schema/full_schema.xml'))
+    scale_factor = resolve_scale_factor(config.get('scale_factor'))
+    rows = estimate_rows(config)
+
+    if scale_factor is None:
+        print("Expected output (sizes from table limits):")
+    else:
+        print(f"Expected output at scale factor {scale_factor:g}:")
+
+    total_bytes = 0
+    for table_name, count in rows.items():
+        schema_table = schema.get_table(table_name)
+        size = count * estimate_row_bytes(schema_table, count) if schema_table else 0
+        total_bytes += size
+        print(f"  {table_name:<24} {count:>14,} rows  ~{format_bytes(size):>10}")
+
+    print(f"  {'total':<24} {sum(rows.values()):>14,} rows  ~{format_bytes(total_bytes):>10}")
+    return rows
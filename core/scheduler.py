@@ -0,0 +1,84 @@
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+class StageScheduler:
+    """Run build stages in dependency order, independent ones at the same time
+
+    Each stage is a function called with the results of the stages it
+    needs, in the order they are listed, so upstream results are handed
+    over by reference; stages listed in after only have to finish first.
+    A stage starts as soon as all of them are done, so the wall-clock time
+    follows the critical path rather than the sum of the stages. Stages run
+    in threads: the heavy work inside them is numpy or sharded across the
+    process pool, and their results stay shareable without copies.
+    """
+
+    def __init__(self, workers=1):
+        self.workers = max(1, workers or 1)
+        self.stages = {}
+
+    def add(self, name, func, needs=(), after=()):
+        if name in self.stages:
+            raise ValueError(f"Stage '{name}' is already scheduled")
+        self.stages[name] = (func, tuple(needs), tuple(needs) + tuple(after))
+
+    def dependencies(self, name):
+        """Stages a stage waits for, whether it needs their results or only runs after them"""
+        return self.stages[name][2]
+
+    def order(self):
+        """Stage names in a dependency order, keeping the order they were added where free to"""
+        for name, (_, _, needs) in self.stages.items():
+            for need in needs:
+                if need not in self.stages:
+                    raise ValueError(f"Stage '{name}' needs unknown stage '{need}'")
+
+        ordered = []
+        done = set()
+        while len(ordered) < len(self.stages):
+            ready = [
+                name for name, (_, _, needs) in self.stages.items()
+                if name not in done and all(need in done for need in needs)
+            ]
+            if not ready:
+                cycle = [name for name in self.stages if name not in done]
+                raise ValueError(f"Stages depend on each other in a cycle: {', '.join(cycle)}")
+            ordered.append(ready[0])
+            done.add(ready[0])
+        return ordered
+
+    def run_stage(self, name, results):
+        func, needs, _ = self.stages[name]
+        return func(*[results[need] for need in needs])
+
+    def run(self):
+        """Run every stage; returns {stage name: result}"""
+        order = self.order()
+        results = {}
+
+        if self.workers == 1:
+            for name in order:
+                results[name] = self.run_stage(name, results)
+            return results
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            running = {}
+            waiting = list(order)
+
+            while waiting or running:
+                for name in list(waiting):
+                    if all(need in results for need in self.stages[name][2]):
+                        waiting.remove(name)
+                        running[executor.submit(self.run_stage, name, dict(results))] = name
+
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    try:
+                        results[name] = future.result()
+                    except BaseException:
+                        # Stages not started yet are dropped; running ones finish before the error surfaces
+                        waiting.clear()
+                        raise
+
+        return results
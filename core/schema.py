@@ -0,0 +1,157 @@
+import json
+import os
+import xml.etree.ElementTree as ET
+
+from core.metrics import phase
+
+
+XSI_TYPE = '{http://www.w3.org/2001/XMLSchema-instance}type'
+COMPILED_SUFFIX = '.compiled.json'
+COMPILED_VERSION = 1
+
+# Process-wide registries keyed by normalized schema path
+_registries = {}
+
+
+class SchemaColumn:
+    """Column descriptor compiled from the XML schema"""
+
+    __slots__ = ('name', 'type', 'order')
+
+    def __init__(self, name, type, order):
+        self.name = name
+        self.type = type
+        self.order = order
+
+    def __repr__(self):
+        return f"SchemaColumn(name={self.name!r}, type={self.type!r}, order={self.order})"
+
+
+class SchemaTable:
+    """Table descriptor holding its columns in schema order"""
+
+    def __init__(self, name, columns, comment=''):
+        self.name = name
+        self.columns = tuple(columns)
+        self.comment = comment
+        self.column_names = tuple(column.name for column in self.columns)
+        self.column_map = {column.name: column for column in self.columns}
+
+    def get_column(self, column_name):
+        """Return the descriptor for a column, or None if it is not defined"""
+        return self.column_map.get(column_name)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'comment': self.comment,
+            'columns': [[column.name, column.type] for column in self.columns],
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        columns = [
+            SchemaColumn(name, col_type, order)
+            for order, (name, col_type) in enumerate(data['columns'])
+        ]
+        return cls(data['name'], columns, data.get('comment', ''))
+
+
+class SchemaRegistry:
+    """Parsed view of schema/full_schema.xml shared by all generators"""
+
+    def __init__(self, schema_path, tables):
+        self.schema_path = schema_path
+        self.tables = tables
+
+    @classmethod
+    def from_xml(cls, schema_path):
+        """Parse the XML schema into table descriptors"""
+        root = ET.parse(schema_path).getroot()
+
+        tables = {}
+        for table in root.findall('table'):
+            columns = [
+                SchemaColumn(column.get('name'), column.get(XSI_TYPE), order)
+                for order, column in enumerate(table.findall('column'))
+            ]
+            table_name = table.get('name')
+            tables[table_name] = SchemaTable(table_name, columns, table.get('comment', ''))
+
+        return cls(schema_path, tables)
+
+    @classmethod
+    def load(cls, schema_path, use_compiled=True):
+        """Load the schema, preferring an up-to-date compiled form next to the XML"""
+        if not use_compiled:
+            return cls.from_xml(schema_path)
+
+        compiled_path = cls.compiled_path(schema_path)
+        source_stamp = cls.source_stamp(schema_path)
+
+        try:
+            with open(compiled_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == COMPILED_VERSION and data.get('source') == source_stamp:
+                tables = {}
+                for table_data in data['tables']:
+                    table = SchemaTable.from_dict(table_data)
+                    tables[table.name] = table
+                return cls(schema_path, tables)
+        except (OSError, ValueError, KeyError):
+            pass
+
+        registry = cls.from_xml(schema_path)
+        registry.save_compiled(compiled_path, source_stamp)
+        return registry
+
+    @staticmethod
+    def compiled_path(schema_path):
+        base, _ = os.path.splitext(schema_path)
+        return base + COMPILED_SUFFIX
+
+    @staticmethod
+    def source_stamp(schema_path):
+        """Identify the XML revision a compiled file was built from"""
+        stat = os.stat(schema_path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def save_compiled(self, compiled_path=None, source_stamp=None):
+        """Persist the compiled schema; a read-only schema folder is not an error"""
+        compiled_path = compiled_path or self.compiled_path(self.schema_path)
+        data = {
+            'version': COMPILED_VERSION,
+            'source': source_stamp or self.source_stamp(self.schema_path),
+            'tables': [table.to_dict() for table in self.tables.values()],
+        }
+
+        try:
+            with open(compiled_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, indent=2)
+        except OSError:
+            pass
+
+    def get_table(self, table_name):
+        """Return the table descriptor, or None if the table is not defined"""
+        return self.tables.get(table_name)
+
+    def get_columns(self, table_name):
+        """Return column descriptors for a table (empty when not defined)"""
+        table = self.tables.get(table_name)
+        return list(table.columns) if table else []
+
+    def get_column_names(self, table_name):
+        """Return column names for a table in schema order"""
+        table = self.tables.get(table_name)
+        return table.column_names if table else ()
+
+
+def get_schema(schema_path='schema/full_schema.xml'):
+    """Return the process-wide schema registry for a schema file"""
+    with phase('schema'):
+        key = os.path.abspath(schema_path)
+        registry = _registries.get(key)
+        if registry is None:
+            registry = SchemaRegistry.load(schema_path)
+            _registries[key] = registry
+        return registry
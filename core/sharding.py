@@ -0,0 +1,237 @@
+import multiprocessing
+import os
+import shutil
+import threading
+from collections import deque
+from contextlib import ExitStack
+from concurrent.futures import ProcessPoolExecutor
+
+from core.output import create_writer, get_writer_class
+from core.partition import TablePartitioner
+from core.rng import shard_seed
+
+
+DEFAULT_SHARD_SIZE = 100000
+
+# Arguments common to every shard of a run, sent once per worker instead of once per task
+_shared_kwargs = {}
+
+
+class ShardTask:
+    """One id range of a table, built by a worker process"""
+
+    def __init__(self, generator_class, config, table_name, index, kwargs, part_file=None):
+        self.generator_class = generator_class
+        self.config = config
+        self.table_name = table_name
+        self.index = index
+        self.kwargs = kwargs
+        self.part_file = part_file
+
+
+def set_shared_kwargs(kwargs):
+    """Worker initializer: keep the arguments shared by all shards"""
+    global _shared_kwargs
+    _shared_kwargs = kwargs or {}
+
+
+def run_shard(task, shared_kwargs=None):
+    """Worker entry point: write the shard to its part file, or return its chunks"""
+    generator = task.generator_class(task.config)
+    shared_kwargs = _shared_kwargs if shared_kwargs is None else shared_kwargs
+    chunks = generator.build_shard(**shared_kwargs, **task.kwargs)
+
+    if task.part_file is None:
+        return list(chunks)
+
+    # With partitioning each shard also writes its part of every bucket
+    partitioner = TablePartitioner(task.config)
+    if not isinstance(task.part_file, dict):
+        schema_table = generator.schema.get_table(task.table_name)
+        with partitioner.create_writer(task.table_name, task.part_file, schema_table, part_index=task.index) as writer:
+            return writer.write_chunks(chunks)
+
+    # Generators of related tables yield {table name: chunk} batches, one part file per table
+    with ExitStack() as stack:
+        writers = {
+            table_name: stack.enter_context(partitioner.create_writer(
+                table_name, part_file, generator.schema.get_table(table_name), part_index=task.index))
+            for table_name, part_file in task.part_file.items()
+        }
+        for batch in chunks:
+            for table_name, chunk in batch.items():
+                writers[table_name].write_chunk(chunk)
+
+    return {table_name: writer.rows_written for table_name, writer in writers.items()}
+
+
+def available_cpus():
+    """CPUs this process may run on, honouring affinity masks and container CPU sets"""
+    if hasattr(os, 'sched_getaffinity'):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def process_context():
+    """Start method of the worker processes
+
+    The build runs stages in threads, and a plain fork copies whatever locks
+    those threads hold at that moment (imports, the allocator), which can
+    leave a worker waiting forever. A fork server forks from a clean,
+    single-threaded process instead; where it is missing workers are spawned.
+    """
+    method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    return multiprocessing.get_context(method)
+
+
+class ShardRunner:
+    """Split large tables into fixed id ranges and build them in a process pool
+
+    Shard boundaries depend only on shard_size and every shard is seeded from
+    the config seed, its table and its index, so the output is the same for
+    any number of workers. Stages built at the same time share the workers:
+    together they never run more than workers processes.
+    """
+
+    def __init__(self, config):
+        self.config = config
+        sharding_config = config.get('sharding', {})
+        self.enabled = sharding_config.get('enable', False)
+        self.workers = sharding_config.get('workers') or available_cpus()
+        self.shard_size = sharding_config.get('shard_size', DEFAULT_SHARD_SIZE)
+        self.merge = sharding_config.get('merge', True)
+        self.output_config = config.get('output', {})
+        output_format = self.output_config.get('format', 'csv')
+        self.writer_class = get_writer_class(output_format)
+        self.part_extension = self.writer_class.file_extension(self.output_config.get(output_format, {}))
+        self.budget = threading.Semaphore(self.workers)
+        self.partitioner = TablePartitioner(config)
+
+    def seed_for(self, table_name):
+        """Return a function giving the seed sequence of each shard of a table"""
+        return lambda shard_index: shard_seed(self.config, table_name, shard_index)
+
+    def reserve_workers(self):
+        """Take at least one and at most workers processes from the shared budget"""
+        self.budget.acquire()
+        reserved = 1
+        while reserved < self.workers and self.budget.acquire(blocking=False):
+            reserved += 1
+        return reserved
+
+    def map(self, tasks, shared_kwargs=None):
+        """Run tasks in worker processes, yielding results in shard order"""
+        if self.workers <= 1:
+            # Passed directly rather than through the module global, which
+            # other tables built at the same time in this process would share
+            for task in tasks:
+                yield run_shard(task, shared_kwargs or {})
+            return
+
+        workers = self.reserve_workers()
+        try:
+            # Keep a bounded window of shards in flight so results never pile up
+            with ProcessPoolExecutor(max_workers=workers, mp_context=process_context(),
+                                     initializer=set_shared_kwargs, initargs=(shared_kwargs,)) as executor:
+                pending = deque()
+                for task in tasks:
+                    pending.append(executor.submit(run_shard, task))
+                    if len(pending) >= workers * 2:
+                        yield pending.popleft().result()
+
+                while pending:
+                    yield pending.popleft().result()
+        finally:
+            for _ in range(workers):
+                self.budget.release()
+
+    def iter_chunks(self, generator_class, table_name, shard_kwargs, shared_kwargs=None):
+        """Build shards in parallel and yield their chunks in shard order"""
+        tasks = (
+            ShardTask(generator_class, self.config, table_name, index, kwargs)
+            for index, kwargs in enumerate(shard_kwargs)
+        )
+
+        for chunks in self.map(tasks, shared_kwargs):
+            yield from chunks
+
+    def parts_folder(self, table_name, output_file):
+        """Folder holding a table's part files, next to its output"""
+        return os.path.join(os.path.dirname(output_file), f'{table_name}.parts')
+
+    def export(self, generator_class, table_name, shard_kwargs, output_file, schema_table=None, shared_kwargs=None):
+        """Write each shard to its own part file in parallel, then merge them in order"""
+        parts_folder = self.parts_folder(table_name, output_file)
+        self.clear_parts(table_name, parts_folder)
+
+        part_files = []
+        tasks = []
+        for index, kwargs in enumerate(shard_kwargs):
+            part_file = os.path.join(parts_folder, f'part-{index:05d}{self.part_extension}')
+            part_files.append(part_file)
+            tasks.append(ShardTask(generator_class, self.config, table_name, index, kwargs, part_file))
+
+        rows_written = sum(self.map(tasks, shared_kwargs))
+
+        if self.merge:
+            self.merge_parts(part_files, output_file, schema_table)
+            shutil.rmtree(parts_folder, ignore_errors=True)
+            self.merge_bucket_parts(table_name, schema_table)
+
+        return rows_written
+
+    def export_tables(self, generator_class, shard_kwargs, output_files, schema_tables, shared_kwargs=None):
+        """Export several related tables built together shard by shard; returns rows per table"""
+        parts_folders = {
+            table_name: self.parts_folder(table_name, output_file)
+            for table_name, output_file in output_files.items()
+        }
+        for table_name, parts_folder in parts_folders.items():
+            self.clear_parts(table_name, parts_folder)
+
+        part_files = {table_name: [] for table_name in output_files}
+        tasks = []
+        for index, kwargs in enumerate(shard_kwargs):
+            task_parts = {
+                table_name: os.path.join(parts_folder, f'part-{index:05d}{self.part_extension}')
+                for table_name, parts_folder in parts_folders.items()
+            }
+            for table_name, part_file in task_parts.items():
+                part_files[table_name].append(part_file)
+            tasks.append(ShardTask(generator_class, self.config, None, index, kwargs, task_parts))
+
+        rows_written = {table_name: 0 for table_name in output_files}
+        for result in self.map(tasks, shared_kwargs):
+            for table_name, rows in result.items():
+                rows_written[table_name] += rows
+
+        if self.merge:
+            for table_name, output_file in output_files.items():
+                self.merge_parts(part_files[table_name], output_file, schema_tables.get(table_name))
+                shutil.rmtree(parts_folders[table_name], ignore_errors=True)
+                self.merge_bucket_parts(table_name, schema_tables.get(table_name))
+
+        return rows_written
+
+    def clear_parts(self, table_name, parts_folder):
+        """Remove the parts and buckets of an earlier run of a table before its shards are written"""
+        shutil.rmtree(parts_folder, ignore_errors=True)
+        self.partitioner.clear(table_name)
+        # Tables written only as buckets have no part files of their own
+        if not self.partitioner.buckets_only:
+            os.makedirs(parts_folder, exist_ok=True)
+
+    def merge_bucket_parts(self, table_name, schema_table=None):
+        """Combine the shard parts of each of a table's buckets, when it is partitioned"""
+        if self.partitioner.enabled:
+            self.partitioner.merge_parts(table_name, schema_table)
+
+    def merge_parts(self, part_files, output_file, schema_table=None):
+        """Combine part files into the table file in shard order"""
+        # Shards without rows never create their part file
+        part_files = [part_file for part_file in part_files if os.path.exists(part_file)]
+        if not part_files:
+            return
+
+        with create_writer(self.output_config, output_file, schema_table) as writer:
+            writer.merge_parts(part_files)
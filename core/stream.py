@@ -0,0 +1,21 @@
+from itertools import islice
+
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def chunked(rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Group an iterable of rows into lists of at most chunk_size rows"""
+    iterator = iter(rows)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def drain(chunks):
+    """Consume whatever is left of a chunk stream"""
+    for _ in chunks:
+        pass
+
@@ -0,0 +1,133 @@
+from collections.abc import Mapping
+
+import numpy as np
+from core import columnar
+
+
+# Columns with at most this share of distinct values are stored as codes when built from rows
+CATEGORICAL_RATIO = 0.5
+
+
+def code_dtype(size):
+    """Smallest integer type that can index size categories"""
+    for dtype in (np.int8, np.int16, np.int32):
+        if size <= np.iinfo(dtype).max + 1:
+            return dtype
+    return np.int64
+
+
+class CategoricalColumn:
+    """Repeated strings stored once, with a small integer code per row
+
+    A warehouse name or stock status then costs one byte per row instead of
+    a pointer to a string object. Indexing with a slice or an index array
+    keeps the codes; reading single values or tolist() decodes them.
+    """
+
+    def __init__(self, codes, categories):
+        if not isinstance(categories, np.ndarray) or categories.dtype != object:
+            categories = columnar.as_array(list(categories))
+        self.categories = categories
+        self.codes = np.asarray(codes).astype(code_dtype(len(categories)), copy=False)
+
+    @classmethod
+    def from_values(cls, values):
+        """Encode a sequence of strings, categories in order of first appearance"""
+        categories, first, codes = np.unique(columnar.as_array(list(values)), return_index=True, return_inverse=True)
+        order = np.argsort(first)
+        remap = np.empty(len(order), dtype=np.int64)
+        remap[order] = np.arange(len(order))
+        return cls(remap[codes], categories[order])
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, index):
+        if isinstance(index, (int, np.integer)):
+            return self.categories[self.codes[index]]
+        return CategoricalColumn(self.codes[index], self.categories)
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def __array__(self, dtype=None, copy=None):
+        values = self.to_array()
+        return values if dtype is None else values.astype(dtype)
+
+    @property
+    def nbytes(self):
+        return self.codes.nbytes + self.categories.nbytes
+
+    def to_array(self):
+        """Decoded values as an object array"""
+        return self.categories[self.codes]
+
+    def tolist(self):
+        return self.to_array().tolist()
+
+
+def pick_categorical(rng, values, count, sampler=None):
+    """Like columnar.pick, drawing the same positions, but keeping them as codes into values"""
+    if sampler is not None:
+        return CategoricalColumn(sampler.draw(rng, count), values)
+    return CategoricalColumn(rng.integers(0, len(values), count), values)
+
+
+def typed_column(values):
+    """Column for a list of row values: numbers as typed arrays, repeated strings as codes"""
+    if all(type(value) is int for value in values):
+        return np.array(values, dtype=np.int64)
+    if all(type(value) is float for value in values):
+        return np.array(values, dtype=np.float64)
+    if values and all(isinstance(value, str) for value in values) and len(set(values)) <= len(values) * CATEGORICAL_RATIO:
+        return CategoricalColumn.from_values(values)
+    return columnar.as_array(values)
+
+
+class ColumnTable(Mapping):
+    """A chunk of one table held column by column: {column name: column}
+
+    Columns are numpy arrays, int and float ones typed, and
+    CategoricalColumns for repeated strings. It reads like the dict of
+    columns generators used to yield, so writers take either, and rows()
+    hands it to code that still works a row at a time.
+    """
+
+    def __init__(self, columns, table_name=None):
+        self.columns = dict(columns)
+        self.table_name = table_name
+
+    @classmethod
+    def from_rows(cls, rows, schema_table=None):
+        """Convert a chunk of row dicts, in schema column order when a schema table is given"""
+        if schema_table is not None:
+            names = [name for name in schema_table.column_names if rows and name in rows[0]]
+        else:
+            names = list(rows[0]) if rows else []
+        columns = {name: typed_column([row.get(name) for row in rows]) for name in names}
+        return cls(columns, schema_table.name if schema_table is not None else None)
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __len__(self):
+        return len(self.columns)
+
+    @property
+    def num_rows(self):
+        return columnar.row_count(self.columns)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the column buffers; object columns count their pointers only"""
+        return sum(column.nbytes for column in self.columns.values())
+
+    def rows(self):
+        """Yield the rows as dicts"""
+        names = list(self.columns)
+        for values in zip(*[self.columns[name].tolist() for name in names]):
+            yield dict(zip(names, values))
+
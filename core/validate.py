@@ -0,0 +1,363 @@
+import json
+import os
+
+import numpy as np
+from core import columnar
+
+
+DEFAULT_SAMPLES = 5
+DEFAULT_REPORT_FILE = 'outputs/validation.json'
+
+# (table, column, referenced table); every reference points at the referenced table's id
+FOREIGN_KEYS = (
+    ('customers', 'default_billing', 'customer_address'),
+    ('customers', 'default_shipping', 'customer_address'),
+    ('customer_address', 'customer_id', 'customers'),
+    ('category', 'parent_id', 'category'),
+    ('product', 'category_id', 'category'),
+    ('category_product', 'category_id', 'category'),
+    ('category_product', 'product_id', 'product'),
+    ('stock_inventory', 'product_id', 'product'),
+    ('sale_order_web', 'customer_id', 'customers'),
+    ('sale_order_web', 'billing_address_id', 'customer_address'),
+    ('sale_order_web', 'shipping_address_id', 'customer_address'),
+    ('sale_order_web_items', 'order_id', 'sale_order_web'),
+    ('sale_order_web_items', 'product_id', 'product'),
+    ('sale_order_web_items', 'parent_product_id', 'product'),
+    ('sale_order_web_address', 'order_id', 'sale_order_web'),
+    ('sale_order_web_address', 'customer_address_id', 'customer_address'),
+    ('sale_order_pos', 'customer_id', 'customers'),
+    ('sale_order_pos_items', 'order_id', 'sale_order_pos'),
+    ('sale_order_pos_items', 'product_id', 'product'),
+    ('sale_order_pos_items', 'parent_product_id', 'product'),
+)
+
+# (table, columns, referenced table, referenced columns): pairs of values that must appear together
+# in a row of the referenced table, such as a default address that belongs to its customer
+PAIR_KEYS = (
+    ('customers', ('id', 'default_billing'), 'customer_address', ('customer_id', 'id')),
+    ('customers', ('id', 'default_shipping'), 'customer_address', ('customer_id', 'id')),
+    ('product', ('id', 'category_id'), 'category_product', ('product_id', 'category_id')),
+    ('sale_order_web', ('customer_id', 'billing_address_id'), 'customer_address', ('customer_id', 'id')),
+    ('sale_order_web', ('customer_id', 'shipping_address_id'), 'customer_address', ('customer_id', 'id')),
+)
+
+BLOCK_SHIFT = 16
+BLOCK_BYTES = (1 << BLOCK_SHIFT) // 8
+
+
+class IdSet:
+    """Set of integer ids kept as bitmaps of 65536 ids, allocated as ids show up
+
+    Like a roaring bitmap without its array and run containers: a dense
+    range of ids costs one bit per id, 12.5 MB for 100M ids, while far
+    apart ids only cost the blocks they fall in. Adding and looking up
+    take whole arrays of ids at a time.
+    """
+
+    def __init__(self):
+        self.block_ids = np.empty(0, dtype=np.int64)
+        self.bitmaps = np.zeros((0, BLOCK_BYTES), dtype=np.uint8)
+        self.block_count = 0
+        self.count = 0
+
+    @property
+    def nbytes(self):
+        return self.block_count * BLOCK_BYTES
+
+    def locate(self, ids):
+        """Bitmap row, byte and bit mask of each id; rows are -1 for blocks not allocated"""
+        blocks = ids >> BLOCK_SHIFT
+        offsets = ids & ((1 << BLOCK_SHIFT) - 1)
+        known = self.block_ids[:self.block_count]
+        order = np.argsort(known)
+        positions = np.searchsorted(known[order], blocks)
+        positions = np.minimum(positions, max(len(known) - 1, 0))
+        rows = order[positions] if len(known) else np.full(len(ids), -1)
+        if len(known):
+            rows = np.where(known[rows] == blocks, rows, -1)
+        return rows, offsets >> 3, (1 << (offsets & 7)).astype(np.uint8)
+
+    def contains(self, ids):
+        """Whether each of an array of ids is in the set"""
+        rows, byte_index, masks = self.locate(ids)
+        found = rows >= 0
+        result = np.zeros(len(ids), dtype=bool)
+        result[found] = (self.bitmaps[rows[found], byte_index[found]] & masks[found]) != 0
+        return result
+
+    def allocate(self, blocks):
+        """Add empty bitmaps for blocks not in the set yet"""
+        new_blocks = np.setdiff1d(blocks, self.block_ids[:self.block_count])
+        if not len(new_blocks):
+            return
+
+        needed = self.block_count + len(new_blocks)
+        if needed > len(self.block_ids):
+            # Grow by doubling, so allocating stays linear over a whole table
+            capacity = max(needed, 2 * len(self.block_ids), 16)
+            block_ids = np.empty(capacity, dtype=np.int64)
+            block_ids[:self.block_count] = self.block_ids[:self.block_count]
+            bitmaps = np.zeros((capacity, BLOCK_BYTES), dtype=np.uint8)
+            bitmaps[:self.block_count] = self.bitmaps[:self.block_count]
+            self.block_ids, self.bitmaps = block_ids, bitmaps
+
+        self.block_ids[self.block_count:needed] = new_blocks
+        self.block_count = needed
+
+    def add(self, ids):
+        """Add an array of ids; returns the ids that were already there or repeat within the array"""
+        ids = np.sort(ids)
+        repeated = ids[1:][ids[1:] == ids[:-1]]
+        unique = np.unique(ids)
+
+        seen = self.contains(unique)
+        new_ids = unique[~seen]
+        self.allocate(np.unique(new_ids >> BLOCK_SHIFT))
+        rows, byte_index, masks = self.locate(new_ids)
+        np.bitwise_or.at(self.bitmaps, (rows, byte_index), masks)
+        self.count += len(new_ids)
+
+        return np.concatenate([repeated, unique[seen]])
+
+
+def pair_keys(first, second):
+    """One 64-bit key per pair of ids below 2**32"""
+    return (first << 32) | (second & 0xFFFFFFFF)
+
+
+class PairSet:
+    """Set of id pairs as one sorted array of 64-bit keys
+
+    Unlike an IdSet this costs 8 bytes per referenced row, so pair checks
+    can be turned off for very large builds with validation.pairs.
+    """
+
+    def __init__(self):
+        self.parts = []
+        self.keys = np.empty(0, dtype=np.int64)
+
+    @property
+    def nbytes(self):
+        return self.keys.nbytes + sum(part.nbytes for part in self.parts)
+
+    def add(self, first, second):
+        self.parts.append(pair_keys(first, second))
+
+    def freeze(self):
+        """Sort the pairs collected so far, once their table has been read"""
+        self.keys = np.unique(np.concatenate([self.keys] + self.parts))
+        self.parts = []
+
+    def contains(self, first, second):
+        keys = pair_keys(first, second)
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=bool)
+        positions = np.minimum(np.searchsorted(self.keys, keys), len(self.keys) - 1)
+        return self.keys[positions] == keys
+
+
+class KeyCheck:
+    """Violation count and sample rows of a foreign key, or of a pair of columns that must match a referenced row"""
+
+    def __init__(self, table_name, columns, referenced_table, referenced_columns=('id',)):
+        self.table_name = table_name
+        self.columns = tuple(columns)
+        self.referenced_table = referenced_table
+        self.referenced_columns = tuple(referenced_columns)
+        self.checked = 0
+        self.orphans = 0
+        self.samples = []
+
+    @property
+    def reference(self):
+        return (self.referenced_table, self.referenced_columns)
+
+    @property
+    def name(self):
+        if len(self.columns) == 1:
+            return f'{self.table_name}.{self.columns[0]} -> {self.referenced_table}.{self.referenced_columns[0]}'
+        return (f"{self.table_name}({', '.join(self.columns)}) -> "
+                f"{self.referenced_table}({', '.join(self.referenced_columns)})")
+
+    def check(self, chunk, referenced, sample_limit):
+        present = None
+        values = []
+        for column in self.columns:
+            keys, column_present = columnar.integer_keys(columnar.chunk_column(chunk, column))
+            # Ids start at 1, so 0 means no reference, like an empty value
+            column_present &= keys != 0
+            present = column_present if present is None else present & column_present
+            values.append(keys)
+
+        missing = present.copy()
+        missing[present] = ~referenced.contains(*[keys[present] for keys in values])
+
+        self.checked += int(present.sum())
+        self.orphans += int(missing.sum())
+        if missing.any() and len(self.samples) < sample_limit:
+            row_ids, _ = columnar.integer_keys(columnar.chunk_column(chunk, 'id'))
+            for index in np.flatnonzero(missing)[:sample_limit - len(self.samples)].tolist():
+                sample = {'id': int(row_ids[index])}
+                sample.update((column, int(keys[index])) for column, keys in zip(self.columns, values))
+                self.samples.append(sample)
+
+    def to_dict(self):
+        return {
+            'check': self.name,
+            'table': self.table_name,
+            'columns': list(self.columns),
+            'references': self.referenced_table,
+            'referenced_columns': list(self.referenced_columns),
+            'checked': self.checked,
+            'orphans': self.orphans,
+            'samples': self.samples,
+        }
+
+
+class IntegrityValidator:
+    """Check primary key uniqueness and foreign keys of the generated tables in a streaming pass
+
+    Tables are read a chunk at a time and only their ids are kept, in one
+    IdSet per table, so memory follows the largest id rather than the row
+    count. Tables are visited referenced tables first, and each key is
+    checked while its table streams past, as soon as what it points at is
+    complete. Keys into tables read later, like a customer's default
+    address or a category's parent, are checked in a second pass over
+    just those tables.
+    """
+
+    def __init__(self, config):
+        validation_config = config.get('validation', {})
+        self.enabled = validation_config.get('enable', False)
+        self.strict = validation_config.get('strict', False)
+        self.sample_limit = validation_config.get('samples', DEFAULT_SAMPLES)
+        self.report_file = validation_config.get('report', DEFAULT_REPORT_FILE)
+
+        foreign_keys = list(FOREIGN_KEYS) + [tuple(key) for key in validation_config.get('foreign_keys', [])]
+        self.key_specs = [(table, (column,), referenced, ('id',)) for table, column, referenced in foreign_keys]
+        if validation_config.get('pairs', True):
+            self.key_specs += list(PAIR_KEYS)
+
+    def table_order(self, table_names):
+        """Tables with the tables they reference first, as far as references allow"""
+        ordered = []
+        remaining = list(table_names)
+        while remaining:
+            for table_name in remaining:
+                references = {
+                    referenced for table, _, referenced, _ in self.key_specs
+                    if table == table_name and referenced != table_name and referenced in remaining
+                }
+                if not references:
+                    break
+            else:
+                # References go round in a cycle; take the first table and check it later
+                table_name = remaining[0]
+            ordered.append(table_name)
+            remaining.remove(table_name)
+        return ordered
+
+    def validate(self, table_names, read_table):
+        """Validate the given tables, read_table streaming each back; returns the report"""
+        table_names = list(table_names)
+        checks = [KeyCheck(*spec) for spec in self.key_specs if spec[0] in table_names]
+        skipped = [check.name for check in checks if check.referenced_table not in table_names]
+        checks = [check for check in checks if check.referenced_table in table_names]
+
+        references = {}
+        tables = {}
+        deferred = {}
+        for table_name in self.table_order(table_names):
+            table_checks = [check for check in checks if check.table_name == table_name]
+            ready = [check for check in table_checks if check.reference in references]
+            late = [check for check in table_checks if check.reference not in references]
+            if late:
+                deferred[table_name] = late
+
+            pairs = {check.referenced_columns for check in checks
+                     if check.referenced_table == table_name and len(check.referenced_columns) > 1}
+            tables[table_name] = self.scan_table(table_name, read_table(table_name), ready, references, pairs)
+
+        # Second pass, only over tables with keys into tables read after them
+        for table_name, late in deferred.items():
+            for chunk in read_table(table_name):
+                for check in late:
+                    check.check(chunk, references[check.reference], self.sample_limit)
+
+        report = {
+            'tables': tables,
+            'keys': [check.to_dict() for check in checks],
+            'skipped_keys': skipped,
+            'violations': sum(table['duplicate_ids'] + table['missing_ids'] for table in tables.values())
+                          + sum(check.orphans for check in checks),
+        }
+        self.print_report(report)
+        self.write_report(report)
+        if self.strict and report['violations']:
+            raise ValueError(f"Validation found {report['violations']} key violations; see {self.report_file}")
+        return report
+
+    def scan_table(self, table_name, chunks, checks, references, pairs):
+        """Collect a table's ids and the column pairs others refer to, and run the checks that are ready"""
+        id_set = IdSet()
+        pair_sets = {columns: PairSet() for columns in pairs}
+        summary = {'rows': 0, 'duplicate_ids': 0, 'duplicate_samples': [], 'missing_ids': 0}
+
+        for chunk in chunks:
+            keys, present = columnar.integer_keys(columnar.chunk_column(chunk, 'id'))
+            summary['rows'] += len(keys)
+            summary['missing_ids'] += int((~present).sum())
+
+            duplicates = id_set.add(keys[present])
+            summary['duplicate_ids'] += len(duplicates)
+            room = self.sample_limit - len(summary['duplicate_samples'])
+            summary['duplicate_samples'].extend(duplicates[:max(room, 0)].tolist())
+
+            for columns, pair_set in pair_sets.items():
+                (first, first_present), (second, second_present) = [
+                    columnar.integer_keys(columnar.chunk_column(chunk, column)) for column in columns]
+                both = first_present & second_present
+                pair_set.add(first[both], second[both])
+
+            for check in checks:
+                check.check(chunk, references[check.reference], self.sample_limit)
+
+        references[(table_name, ('id',))] = id_set
+        for columns, pair_set in pair_sets.items():
+            pair_set.freeze()
+            references[(table_name, columns)] = pair_set
+
+        summary['key_set_bytes'] = id_set.nbytes + sum(pair_set.nbytes for pair_set in pair_sets.values())
+        return summary
+
+    def print_report(self, report):
+        print("Validating keys:")
+        for table_name, table in report['tables'].items():
+            problems = []
+            if table['duplicate_ids']:
+                problems.append(f"{table['duplicate_ids']} duplicate ids (e.g. {table['duplicate_samples'][:3]})")
+            if table['missing_ids']:
+                problems.append(f"{table['missing_ids']} rows without an id")
+            print(f"  {table_name:<24} {table['rows']:>12,} rows  {'; '.join(problems) or 'ids unique'}")
+
+        for check in report['keys']:
+            if check['orphans']:
+                sample = ', '.join(
+                    f"id {row['id']}: " + ', '.join(f"{column} {row[column]}" for column in check['columns'] if column != 'id')
+                    for row in check['samples'][:3])
+                print(f"  {check['check']}: {check['orphans']:,} of {check['checked']:,} references missing "
+                      f"(e.g. {sample})")
+
+        for name in report['skipped_keys']:
+            print(f"  Skipped {name}: table not generated")
+
+        print(f"Found {report['violations']:,} key violations" if report['violations'] else "All keys are valid")
+
+    def write_report(self, report):
+        folder = os.path.dirname(self.report_file)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with open(self.report_file, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        print(f"Wrote validation report to: {self.report_file}")
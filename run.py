@@ -9,9 +9,13 @@ def main():
     
     
     auto_gen = AutoGen(config)
-    auto_gen.generate_products()
-    auto_gen.generate_customers()
-    auto_gen.generate_orders()
+    if config.get('append', {}).get('enable', False):
+        # Grow the existing outputs instead of rebuilding them
+        auto_gen.append()
+        return
+    
+    auto_gen.report_estimates()
+    auto_gen.generate()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,61 @@
+import copy
+import hashlib
+import json
+import os
+
+import pytest
+from core.autogen import AutoGen
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Files recording when and how a build ran rather than what it generated
+BOOKKEEPING_FILES = {'.build-keys.json', '.high-water-marks.json', 'metrics.jsonl', 'validation.json'}
+# Folders of files a build keeps for itself, like the stored order references
+BOOKKEEPING_FOLDERS = {'.references'}
+
+
+@pytest.fixture(autouse=True)
+def repo_root(monkeypatch):
+    """Schema and fixture paths in the config are relative to the repository root"""
+    monkeypatch.chdir(ROOT)
+
+
+@pytest.fixture
+def config(tmp_path):
+    """The repository config, writing every output and cache file under the test's temporary folder"""
+    with open(os.path.join(ROOT, 'config.json'), 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    config['output']['folder'] = str(tmp_path / 'outputs')
+    config['output']['partitioning']['folder'] = str(tmp_path / 'outputs' / 'buckets')
+    config['cache']['folder'] = str(tmp_path / 'cache')
+    config['metrics']['enable'] = False
+    config['validation']['report'] = str(tmp_path / 'validation.json')
+    return config
+
+
+@pytest.fixture
+def build(tmp_path):
+    """Build every table of a config into a folder of its own; returns {file: sha256 of its bytes}"""
+    def build(config, folder_name):
+        config = copy.deepcopy(config)
+        folder = tmp_path / folder_name
+        config['output']['folder'] = str(folder)
+        AutoGen(config).generate()
+        return output_digests(folder)
+
+    return build
+
+
+def output_digests(folder):
+    digests = {}
+    for root, folders, files in os.walk(folder):
+        folders[:] = [name for name in folders if name not in BOOKKEEPING_FOLDERS]
+        for name in files:
+            if name in BOOKKEEPING_FILES:
+                continue
+            path = os.path.join(root, name)
+            with open(path, 'rb') as f:
+                digests[os.path.relpath(path, folder)] = hashlib.sha256(f.read()).hexdigest()
+    return digests
@@ -0,0 +1,106 @@
+import copy
+import os
+import pickle
+import shutil
+
+import numpy as np
+import pytest
+from core.append import APPENDABLE_TABLES
+from core.autogen import AutoGen
+from core.order.base import OrderReferences
+from core.output import CsvTableWriter
+from core.references import REFERENCES_FOLDER
+from tests.conftest import output_digests
+
+
+def table_ids(auto_gen, table_name):
+    return [int(row['id']) for chunk in auto_gen.read_table(table_name) for row in chunk]
+
+
+def build_and_append(config, appends=1):
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+    for _ in range(appends):
+        AutoGen(config).append()
+    return AutoGen(config)
+
+
+def test_appended_ids_continue_without_gaps(config):
+    config['validation']['enable'] = True
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+    counts = {table_name: len(table_ids(auto_gen, table_name)) for table_name in APPENDABLE_TABLES}
+
+    AutoGen(config).append()
+    AutoGen(config).append()
+
+    auto_gen = AutoGen(config)
+    for table_name in APPENDABLE_TABLES:
+        ids = table_ids(auto_gen, table_name)
+        assert ids == list(range(1, len(ids) + 1))
+        assert len(ids) > counts[table_name]
+    assert len(table_ids(auto_gen, 'customers')) == 3 * counts['customers']
+    # New orders only point at customers and addresses that exist
+    assert auto_gen.validate()['violations'] == 0
+
+
+def test_append_does_not_read_tables_back(config, monkeypatch):
+    AutoGen(config).generate()
+
+    def read_chunks(*args, **kwargs):
+        raise AssertionError("an append read a table back")
+
+    monkeypatch.setattr(CsvTableWriter, 'read_chunks', read_chunks)
+    AutoGen(config).append()
+    AutoGen(config).append()
+
+
+def test_stored_references_match_the_tables(config):
+    auto_gen = build_and_append(config)
+
+    stored = auto_gen.load_order_references()
+    read_back = OrderReferences.from_chunks(
+        auto_gen.read_table('product'), auto_gen.read_table('customers'), auto_gen.read_table('customer_address'))
+
+    rows = np.arange(stored.product_count)
+    assert stored.product_ids[rows].tolist() == read_back.product_ids.tolist()
+    assert stored.parent_ids(rows).tolist() == read_back.parent_ids(rows).tolist()
+    assert stored.prices[rows].tolist() == read_back.prices.tolist()
+
+    rows = np.arange(stored.customer_count)
+    assert stored.customer_ids[rows].tolist() == read_back.customer_ids.tolist()
+    for name in read_back.customer_fields:
+        assert stored.customer_values(name, rows).tolist() == read_back.customer_values(name, rows).tolist()
+
+    rows = np.arange(len(read_back.address_ids))
+    assert stored.address_ids[rows].tolist() == read_back.address_ids.tolist()
+    for name, values in read_back.address_fields.items():
+        assert stored.address_fields[name][rows].tolist() == np.asarray(values, dtype=object).tolist()
+
+
+def test_missing_stored_references_are_rebuilt(config, tmp_path):
+    kept = copy.deepcopy(config)
+    kept['output']['folder'] = str(tmp_path / 'kept')
+    build_and_append(kept, appends=2)
+
+    rebuilt = copy.deepcopy(config)
+    rebuilt['output']['folder'] = str(tmp_path / 'rebuilt')
+    AutoGen(rebuilt).generate()
+    for _ in range(2):
+        shutil.rmtree(os.path.join(rebuilt['output']['folder'], REFERENCES_FOLDER))
+        AutoGen(rebuilt).append()
+
+    assert output_digests(tmp_path / 'rebuilt') == output_digests(tmp_path / 'kept')
+
+
+@pytest.mark.parametrize('table_name', ['customers', 'customer_address'])
+def test_stored_columns_pickle_by_path(config, table_name):
+    auto_gen = build_and_append(config)
+    auto_gen.references.ensure(table_name)
+
+    for name, column in auto_gen.references.load(table_name).items():
+        rows = np.arange(len(column))
+        values = column[rows]
+        copied = pickle.loads(pickle.dumps(column))
+        assert len(pickle.dumps(column)) < 1000
+        assert copied[rows].tolist() == values.tolist()
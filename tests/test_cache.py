@@ -0,0 +1,143 @@
+import copy
+
+import pytest
+from core import cache
+from core.autogen import AutoGen
+from core.cache import TABLE_INPUTS, code_hash
+from core.scheduler import StageScheduler
+
+
+ORDER_TABLES = ('sale_order_web', 'sale_order_web_items', 'sale_order_web_address',
+                'sale_order_pos', 'sale_order_pos_items')
+
+
+@pytest.fixture
+def table_keys():
+    """Cache key of every table of a full build under a config"""
+    def table_keys(config):
+        config = copy.deepcopy(config)
+        config['cache']['enable'] = True
+        auto_gen = AutoGen(config)
+        auto_gen.link_cache()
+        return {table_name: auto_gen.build_cache.table_key(table_name) for table_name in TABLE_INPUTS}
+
+    return table_keys
+
+
+def changed_tables(before, after):
+    return {table_name for table_name in before if before[table_name] != after[table_name]}
+
+
+def test_upstream_tables_follow_the_stage_graph(config):
+    config['cache']['enable'] = True
+    auto_gen = AutoGen(config)
+    auto_gen.link_cache()
+
+    upstream = auto_gen.build_cache.upstream
+    assert upstream['category'] == []
+    assert upstream['product'] == ['category']
+    assert upstream['category_product'] == ['category', 'product']
+    assert upstream['stock_inventory'] == ['product']
+    assert upstream['customers'] == []
+    assert upstream['customer_address'] == ['customers']
+    # Order stages wait on order_references, which writes no table, so they see through it
+    for table_name in ORDER_TABLES:
+        assert upstream[table_name] == ['customer_address', 'customers', 'product']
+
+
+def test_every_built_table_has_cache_inputs(config):
+    tables = AutoGen(config).add_table_stages(StageScheduler())
+    assert set(tables) == set(TABLE_INPUTS)
+
+
+def test_keys_are_stable(config, table_keys):
+    assert table_keys(config) == table_keys(config)
+
+
+def test_category_change_invalidates_the_catalog_and_orders(config, table_keys):
+    before = table_keys(config)
+    config['catalog']['category']['created_at'] = '2025-01-01 00:00:00'
+
+    assert changed_tables(before, table_keys(config)) == {
+        'category', 'product', 'category_product', 'stock_inventory', *ORDER_TABLES}
+
+
+def test_address_change_invalidates_customers_addresses_and_orders(config, table_keys):
+    before = table_keys(config)
+    config['customer']['address']['max_address_per_customer'] += 1
+
+    # Customers pick their default addresses among the addresses planned for them
+    assert changed_tables(before, table_keys(config)) == {'customers', 'customer_address', *ORDER_TABLES}
+
+
+def test_order_change_only_invalidates_its_channel(config, table_keys):
+    before = table_keys(config)
+    config['order']['pos']['limit'] += 1
+
+    assert changed_tables(before, table_keys(config)) == {'sale_order_pos', 'sale_order_pos_items'}
+
+
+def test_seed_change_invalidates_every_table(config, table_keys):
+    before = table_keys(config)
+    config['seed'] += 1
+
+    assert changed_tables(before, table_keys(config)) == set(TABLE_INPUTS)
+
+
+def test_worker_counts_do_not_change_keys(config, table_keys):
+    before = table_keys(config)
+    config['sharding']['workers'] = 3
+    config['scheduler']['workers'] = 1
+
+    assert table_keys(config) == before
+
+
+def test_shared_output_disables_the_cache(config, capsys):
+    config['cache']['enable'] = True
+    config['output']['format'] = 'sqlite'
+
+    assert not AutoGen(config).build_cache.enabled
+    assert 'Build cache disabled' in capsys.readouterr().out
+
+
+def test_cached_build_matches_uncached_build(config, build):
+    uncached = build(config, 'uncached')
+
+    config['cache']['enable'] = True
+    stored = build(config, 'stored')
+    restored = build(config, 'restored')
+
+    assert stored == uncached
+    assert restored == uncached
+
+
+def test_cached_build_reuses_every_table(config, build, capsys):
+    config['cache']['enable'] = True
+    build(config, 'stored')
+    capsys.readouterr()
+    build(config, 'restored')
+
+    output = capsys.readouterr().out
+    for table_name in TABLE_INPUTS:
+        assert f'Reused cached {table_name}:' in output
+
+
+def test_code_hash_follows_the_source(tmp_path):
+    package = tmp_path / 'package'
+    (package / '__pycache__').mkdir(parents=True)
+    (package / 'generator.py').write_text('LIMIT = 1\n')
+    before = code_hash.__wrapped__(str(package))
+
+    (package / '__pycache__' / 'generator.cpython-311.pyc').write_bytes(b'compiled')
+    (package / 'notes.txt').write_text('not code')
+    assert code_hash.__wrapped__(str(package)) == before
+
+    (package / 'generator.py').write_text('LIMIT = 2\n')
+    assert code_hash.__wrapped__(str(package)) != before
+
+
+def test_code_change_invalidates_every_table(config, table_keys, monkeypatch):
+    before = table_keys(config)
+    monkeypatch.setattr(cache, 'code_hash', lambda: 'changed generator code')
+
+    assert changed_tables(before, table_keys(config)) == set(TABLE_INPUTS)
@@ -0,0 +1,120 @@
+import copy
+import csv
+import io
+import os
+
+import numpy as np
+import pytest
+from core.autogen import AutoGen
+from core.output import CsvTableWriter
+from core.output.csv_writer import COMPRESSION_EXTENSIONS, open_csv
+from core.table import CategoricalColumn, ColumnTable
+
+
+COMPRESSIONS = [None, 'gzip', 'zstd']
+
+FIELDNAMES = ['id', 'name', 'note', 'price', 'status']
+ROWS = [
+    {'id': 1, 'name': 'Plain', 'note': None, 'price': 1.5, 'status': 'new'},
+    {'id': 2, 'name': 'Comma, inside', 'note': 'say "hi"', 'price': 0.1, 'status': 'done'},
+    {'id': 3, 'name': 'Two\nlines', 'note': '', 'price': -2.0, 'status': 'new'},
+    {'id': 4, 'name': 'Carriage\rreturn', 'note': 'ünïcödé', 'price': 1e-07, 'status': 'done, late'},
+]
+
+
+def csv_module_bytes(fieldnames, rows):
+    """What csv.writer makes of the rows, the format the writer has to match"""
+    text = io.StringIO(newline='')
+    writer = csv.writer(text)
+    writer.writerow(fieldnames)
+    writer.writerows([[row.get(name) for name in fieldnames] for row in rows])
+    return text.getvalue().encode('utf-8')
+
+
+def csv_path(tmp_path, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    return str(tmp_path / f'table.csv{COMPRESSION_EXTENSIONS.get(compression, "")}')
+
+
+def read_bytes(path):
+    with open_csv(path, 'rb') as f:
+        return f.read()
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_rows_match_the_csv_module(tmp_path, compression):
+    path = csv_path(tmp_path, compression)
+    with CsvTableWriter(path, FIELDNAMES) as writer:
+        writer.write_chunk(ROWS[:1])
+        writer.write_chunk(ROWS[1:])
+
+    assert read_bytes(path) == csv_module_bytes(FIELDNAMES, ROWS)
+    assert writer.rows_written == len(ROWS)
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_columns_match_the_csv_module(tmp_path, compression):
+    path = csv_path(tmp_path, compression)
+    chunk = ColumnTable({
+        'id': np.array([row['id'] for row in ROWS]),
+        'name': np.array([row['name'] for row in ROWS], dtype=object),
+        'note': np.array([row['note'] for row in ROWS], dtype=object),
+        'price': np.array([row['price'] for row in ROWS]),
+        'status': CategoricalColumn(np.array([0, 1, 0, 2]), ['new', 'done', 'done, late']),
+    })
+    with CsvTableWriter(path, FIELDNAMES) as writer:
+        writer.write_chunk(chunk)
+
+    assert read_bytes(path) == csv_module_bytes(FIELDNAMES, ROWS)
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_a_single_empty_field_is_quoted(tmp_path, compression):
+    path = csv_path(tmp_path, compression)
+    rows = [{'note': ''}, {'note': 'x'}]
+    with CsvTableWriter(path, ['note']) as writer:
+        writer.write_chunk(rows)
+
+    assert read_bytes(path) == csv_module_bytes(['note'], rows)
+
+
+@pytest.mark.parametrize('compression', COMPRESSIONS)
+def test_appends_continue_the_same_stream(tmp_path, compression):
+    path = csv_path(tmp_path, compression)
+    with CsvTableWriter(path, FIELDNAMES) as writer:
+        writer.write_chunk(ROWS[:2])
+    # An append keeps the existing header, whatever order its own rows have
+    with CsvTableWriter(path, list(reversed(FIELDNAMES)), append=True) as writer:
+        writer.write_chunk(ROWS[2:])
+
+    assert read_bytes(path) == csv_module_bytes(FIELDNAMES, ROWS)
+    assert [row['id'] for chunk in CsvTableWriter.read_chunks(path, 'table', 3) for row in chunk] == \
+        ['1', '2', '3', '4']
+
+
+@pytest.mark.parametrize('compression', ['gzip', 'zstd'])
+def test_compressed_build_holds_the_plain_bytes(config, tmp_path, compression):
+    if compression == 'zstd':
+        pytest.importorskip('zstandard')
+    plain = copy.deepcopy(config)
+    plain['output']['folder'] = str(tmp_path / 'plain')
+    AutoGen(plain).generate()
+
+    config['output']['folder'] = str(tmp_path / compression)
+    config['output']['csv']['compression'] = compression
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+
+    suffix = '.csv' + COMPRESSION_EXTENSIONS[compression]
+    names = sorted(name for name in os.listdir(tmp_path / compression) if name.endswith(suffix))
+    assert names == sorted(name + COMPRESSION_EXTENSIONS[compression]
+                           for name in os.listdir(tmp_path / 'plain') if name.endswith('.csv'))
+    for name in names:
+        with open(tmp_path / 'plain' / name[:-len(COMPRESSION_EXTENSIONS[compression])], 'rb') as f:
+            assert read_bytes(str(tmp_path / compression / name)) == f.read()
+
+
+def test_unknown_compression_is_rejected():
+    with pytest.raises(ValueError, match="Unknown CSV compression 'bz2'"):
+        CsvTableWriter.file_extension({'compression': 'bz2'})
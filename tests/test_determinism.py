@@ -0,0 +1,37 @@
+import copy
+
+
+def sharded(config, workers):
+    config = copy.deepcopy(config)
+    config['sharding'].update(enable=True, shard_size=100, workers=workers)
+    config['scheduler']['workers'] = workers
+    return config
+
+
+def test_repeated_builds_are_byte_identical(config, build):
+    first = build(config, 'first')
+    assert first
+    assert build(config, 'second') == first
+
+
+def test_sharded_builds_do_not_depend_on_worker_count(config, build):
+    one_worker = build(sharded(config, 1), 'one_worker')
+    assert one_worker == build(sharded(config, 4), 'four_workers')
+
+
+
+def test_seed_change_changes_the_data(config, build):
+    before = build(config, 'before')
+    config['seed'] += 1
+
+    assert build(config, 'after') != before
+
+
+def test_dropping_a_table_leaves_the_other_tables_alone(config, build):
+    every_table = build(config, 'every_table')
+    config['catalog']['stock_inventory']['enable'] = False
+    without_stock = build(config, 'without_stock')
+
+    assert not any(name.startswith('stock_inventory') for name in without_stock)
+    assert without_stock == {name: digest for name, digest in every_table.items()
+                             if not name.startswith('stock_inventory')}
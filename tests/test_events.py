@@ -0,0 +1,106 @@
+import os
+
+import numpy as np
+import pytest
+from core.autogen import AutoGen
+from core.order.events import ArrivalProfile, OrderEventGenerator
+from core.output import CsvTableWriter
+
+
+DAYS = ['2024-11-27', '2024-11-28', '2024-11-29', '2024-11-30']
+
+
+@pytest.fixture
+def events_config(config, tmp_path):
+    """The repository config with small web and POS event streams over DAYS, Black Friday included"""
+    events = config['order']['events']
+    events.update(enable=True, folder=str(tmp_path / 'events'), start_date=DAYS[0], end_date=DAYS[-1])
+    events['web']['orders_per_day'] = 40
+    events['pos']['orders_per_day'] = 20
+    config['output']['chunk_size'] = 16
+    return config
+
+
+def partition_rows(folder, table_name):
+    """{date: rows} of every date=<day> partition of an event table"""
+    table_folder = os.path.join(folder, table_name)
+    return {
+        name.split('=', 1)[1]: [row for chunk in CsvTableWriter.read_chunks(
+            os.path.join(table_folder, name, f'{table_name}.csv'), table_name, 1000) for row in chunk]
+        for name in sorted(os.listdir(table_folder))
+    }
+
+
+def test_days_are_yielded_in_time_order(events_config):
+    auto_gen = AutoGen(events_config)
+    auto_gen.generate()
+    generator = OrderEventGenerator(events_config, 'web')
+
+    dates = []
+    created = []
+    ids = []
+    for date, batch in generator.iter_days(auto_gen.load_order_references()):
+        orders = batch['sale_order_web']
+        dates.append(date)
+        created.extend(str(value)[:19].replace('T', ' ') for value in orders['created_at'])
+        ids.extend(np.asarray(orders['id']).tolist())
+
+    # Several chunks of a day come together, and days never go back
+    assert sorted(set(dates)) == DAYS
+    assert dates == sorted(dates)
+    assert len(dates) > len(DAYS)
+    assert created == sorted(created)
+    assert ids == list(range(1, len(ids) + 1))
+
+
+def test_each_day_is_written_to_its_own_partition(events_config):
+    AutoGen(events_config).generate()
+    folder = events_config['order']['events']['folder']
+
+    for table_name in ('sale_order_web', 'sale_order_pos'):
+        partitions = partition_rows(folder, table_name)
+        assert list(partitions) == DAYS
+        rows = [row for date in DAYS for row in partitions[date]]
+        for date, day_rows in partitions.items():
+            assert day_rows and all(row['created_at'].startswith(date) for row in day_rows)
+        # Read in date order the partitions are one time-sorted stream with ids in sequence
+        assert [row['created_at'] for row in rows] == sorted(row['created_at'] for row in rows)
+        assert [int(row['id']) for row in rows] == list(range(1, len(rows) + 1))
+
+    # Items of a day's orders are written beside them
+    orders = partition_rows(folder, 'sale_order_web')
+    for date, items in partition_rows(folder, 'sale_order_web_items').items():
+        assert {row['order_id'] for row in items} == {row['id'] for row in orders[date]}
+
+
+def test_a_day_does_not_depend_on_the_days_before_it(events_config):
+    generator = OrderEventGenerator(events_config, 'web')
+    day = np.datetime64(DAYS[2], 'D')
+    times = generator.arrival_times(day, generator.day_seed(day))
+
+    events_config['order']['events']['start_date'] = DAYS[2]
+    later_start = OrderEventGenerator(events_config, 'web')
+    assert later_start.days()[0] == day
+    assert later_start.arrival_times(day, later_start.day_seed(day)).tolist() == times.tolist()
+    assert times.tolist() == sorted(times.tolist())
+
+
+def test_promotions_and_opening_hours_shape_the_rates(events_config):
+    events = events_config['order']['events']
+    web = ArrivalProfile(events, 'web')
+    pos = ArrivalProfile(events, 'pos')
+
+    # Black Friday triples the web rate of the days it covers
+    _, before = web.bucket_rates(np.datetime64('2024-11-28', 'D'))
+    _, during = web.bucket_rates(np.datetime64('2024-11-29', 'D'))
+    weekly = web.weekly[4] / web.weekly[3]
+    np.testing.assert_allclose(during, before * weekly * 3.0)
+
+    # Stores sell nothing before nine
+    starts, rates = pos.bucket_rates(np.datetime64('2024-11-27', 'D'))
+    hours = (starts - starts[0]).astype(np.int64) // 3600
+    assert not rates[hours < 9].any()
+    assert rates[hours == 17].all()
+
+    with pytest.raises(ValueError, match='divide an hour'):
+        ArrivalProfile(dict(events, bucket_minutes=7), 'web')
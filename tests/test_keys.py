@@ -0,0 +1,142 @@
+import hashlib
+
+import numpy as np
+import pytest
+from core.base_generator import BaseGenerator
+from core.customer.address import CustomerAddressGenerator
+from core.customer.entity import CustomerGenerator
+from core.keys import KeyRanges, KeyRegistry, OwnedKeys
+from core.output import CsvTableWriter
+from core.sampling import build_sampler
+
+
+def fixed_counts(counts):
+    """OwnedKeys counts function handing out the same child counts for every range"""
+    return lambda seed, owner_count: counts[:owner_count]
+
+
+def test_key_ranges_merge_consecutive_ids():
+    keys = KeyRanges.from_ids([7, 3, 4, 5, 9, 8, 12])
+
+    assert list(zip(keys.starts, keys.stops)) == [(3, 6), (7, 10), (12, 13)]
+    assert len(keys) == 7
+    assert keys.at([0, 2, 3, 5, 6]).tolist() == [3, 5, 7, 9, 12]
+
+
+def test_key_ranges_contains():
+    keys = KeyRanges()
+    keys.add(1, 3)
+    keys.add(4, 2)
+    keys.add(10, 1)
+
+    assert keys.starts == [1, 10]
+    assert keys.contains([0, 1, 5, 6, 9, 10, 11]).tolist() == [False, True, True, False, False, True, False]
+    assert KeyRanges().contains([1, 2]).tolist() == [False, False]
+
+
+def test_key_ranges_reject_ids_out_of_order():
+    keys = KeyRanges()
+    keys.add(10, 5)
+    with pytest.raises(ValueError):
+        keys.add(12, 1)
+
+
+def test_key_ranges_sample_only_held_ids():
+    keys = KeyRanges.from_ids([2, 3, 4, 100, 101])
+    ids = keys.sample(np.random.default_rng(0), 10000)
+
+    assert keys.contains(ids).all()
+    assert set(ids.tolist()) == {2, 3, 4, 100, 101}
+    with pytest.raises(ValueError):
+        KeyRanges().sample(np.random.default_rng(0), 1)
+
+
+def test_key_ranges_sample_follows_a_sampler():
+    keys = KeyRanges.from_ids([5, 6, 20])
+    sampler = build_sampler({'type': 'weighted', 'weights': [0, 0, 1]}, 3)
+
+    assert set(keys.sample(np.random.default_rng(0), 100, sampler).tolist()) == {20}
+
+
+def test_owned_keys_children():
+    keys = OwnedKeys(fixed_counts([2, 1, 3]))
+    keys.add(owner_start=1, owner_count=3, child_start=1, seed=None)
+    keys.add(owner_start=10, owner_count=2, child_start=7, seed=None)
+
+    first, counts = keys.children([1, 2, 3, 4, 10, 11, 0])
+    assert first.tolist() == [1, 3, 4, 0, 7, 9, 0]
+    assert counts.tolist() == [2, 1, 3, 0, 2, 1, 0]
+
+
+def test_owned_keys_pick_one_of_each_owners_children():
+    keys = OwnedKeys(fixed_counts([2, 1, 3]))
+    keys.add(owner_start=1, owner_count=3, child_start=1, seed=None)
+
+    picks = keys.pick(np.random.default_rng(0), np.repeat([1, 2, 3, 4], 200)).reshape(4, 200)
+    assert set(picks[0].tolist()) == {1, 2}
+    assert set(picks[1].tolist()) == {3}
+    assert set(picks[2].tolist()) == {4, 5, 6}
+    assert set(picks[3].tolist()) == {0}
+
+
+def test_owned_keys_reject_overlapping_ranges():
+    keys = OwnedKeys(fixed_counts([1, 1]))
+    keys.add(owner_start=1, owner_count=2, child_start=1, seed=None)
+    with pytest.raises(ValueError):
+        keys.add(owner_start=2, owner_count=2, child_start=3, seed=None)
+
+
+def test_registry_hands_out_registered_keys():
+    registry = KeyRegistry()
+    keys = registry.register('customers', KeyRanges.from_ids([1, 2]))
+
+    assert registry.get('customers') is keys
+    assert registry.get('product') is None
+
+
+def test_customer_default_addresses_belong_to_the_customer(config):
+    config['customer']['entity']['limit'] = 50
+    address_generator = CustomerAddressGenerator(config)
+    addresses = address_generator.owned_keys(address_generator.plan_chunks(50))
+
+    owners = {}
+    for chunk in address_generator.iter_chunks(50):
+        for address in chunk.rows():
+            owners[address['id']] = address['customer_id']
+
+    for chunk in CustomerGenerator(config).iter_chunks(addresses=addresses):
+        for customer in chunk.rows():
+            assert owners[customer['default_billing']] == customer['id']
+            assert owners[customer['default_shipping']] == customer['id']
+
+
+def test_standalone_generate_matches_the_build(config, build, tmp_path, monkeypatch):
+    digests = build(config, 'build')
+
+    customer_generator = CustomerGenerator(config)
+    address_generator = CustomerAddressGenerator(config)
+    exported = {}
+    for generator in (customer_generator, address_generator):
+        monkeypatch.setattr(generator, 'export_to_csv',
+                            lambda records, output_file: exported.setdefault(output_file, records))
+
+    limit = config['customer']['entity']['limit']
+    addresses = address_generator.owned_keys(address_generator.plan_chunks(limit))
+    customers = customer_generator.generate(addresses)
+    assert customers is exported['outputs/customers.csv']
+    assert len(customers) == limit
+    assert len(address_generator.generate(limit)) == sum(addresses.children(range(1, limit + 1))[1])
+
+    for table_name, output_file in (('customers', 'outputs/customers.csv'),
+                                    ('customer_address', 'outputs/customer_address.csv')):
+        path = tmp_path / f'{table_name}.csv'
+        with CsvTableWriter(str(path)) as writer:
+            writer.write_chunk(exported[output_file])
+        assert digests[f'{table_name}.csv'] == hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def test_base_generator_methods_must_be_implemented(config):
+    generator = BaseGenerator(config, None, None)
+    for method in (generator.generate, generator.iter_chunks):
+        with pytest.raises(NotImplementedError):
+            method()
@@ -0,0 +1,27 @@
+import json
+
+from core.autogen import AutoGen
+
+
+def test_metrics_are_off_by_default(config, tmp_path, capsys):
+    with open('config.json', 'r', encoding='utf-8') as f:
+        assert not json.load(f)['metrics']['enable']
+
+    config['metrics']['file'] = str(tmp_path / 'metrics.jsonl')
+    AutoGen(config).generate()
+
+    assert not (tmp_path / 'metrics.jsonl').exists()
+    assert 'Stage timings' not in capsys.readouterr().out
+
+
+def test_enabled_metrics_record_every_stage(config, tmp_path, capsys):
+    metrics_file = tmp_path / 'metrics.jsonl'
+    config['metrics'].update(enable=True, file=str(metrics_file))
+    AutoGen(config).generate()
+
+    assert 'Stage timings' in capsys.readouterr().out
+    records = [json.loads(line) for line in metrics_file.read_text().splitlines()]
+    stages = {record['stage']: record for record in records}
+    assert len({record['run'] for record in records}) == 1
+    assert stages['customers']['rows'] == config['customer']['entity']['limit']
+    assert stages['total']['rows'] == sum(record['rows'] for record in records if record['stage'] != 'total')
@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+from core.autogen import AutoGen
+from core.schema import get_schema
+from core.table import CategoricalColumn, ColumnTable
+
+# Parquet output is optional and needs pyarrow
+pa = pytest.importorskip('pyarrow')
+pq = pytest.importorskip('pyarrow.parquet')
+from core.output.parquet_writer import ParquetTableWriter  # noqa: E402
+
+
+def schema_table(table_name):
+    return get_schema('schema/full_schema.xml').get_table(table_name)
+
+
+def write_stock(path, chunks, **options):
+    with ParquetTableWriter(str(path), schema_table('stock_inventory').columns, **options) as writer:
+        for chunk in chunks:
+            writer.write_chunk(chunk)
+    return writer
+
+
+def test_columns_are_typed_from_the_schema(tmp_path):
+    path = tmp_path / 'sale_order_web.parquet'
+    rows = [{'id': '1', 'order_number': 'WEB000000001', 'customer_id': '', 'discount_amount': '2.5',
+             'status': 'complete', 'created_at': '2024-03-01 10:00:00'}]
+    with ParquetTableWriter(str(path), schema_table('sale_order_web').columns) as writer:
+        writer.write_chunk(rows)
+
+    table = pq.read_table(path)
+    assert table.schema.field('id').type == pa.int64()
+    assert table.schema.field('order_number').type == pa.string()
+    assert table.schema.field('discount_amount').type == pa.float64()
+    # Parquet has no second unit, so timestamps come back in milliseconds
+    assert pa.types.is_timestamp(table.schema.field('created_at').type)
+    assert str(table.to_pylist()[0]['created_at']) == '2024-03-01 10:00:00'
+    assert pa.types.is_dictionary(table.schema.field('status').type)
+    # Empty strings in typed columns are written as missing values
+    assert table.to_pylist()[0]['customer_id'] is None
+    assert table.column_names == ['id', 'order_number', 'customer_id', 'discount_amount', 'status', 'created_at']
+
+
+def test_categorical_columns_are_written_as_dictionaries(tmp_path):
+    warehouses = CategoricalColumn(np.array([1, 0, 1, 1]), ['North', 'South'])
+    stock_status = CategoricalColumn(np.array([0, 0, 1, 0]), ['in_stock', 'out_of_stock'])
+    chunk = ColumnTable({
+        'id': np.arange(1, 5), 'product_id': np.array([1, 1, 2, 2]), 'warehouse_id': np.array([2, 1, 2, 2]),
+        'warehouse_name': warehouses, 'stock_status': stock_status, 'stock_quantity': np.array([5, 0, 3, 1]),
+    })
+    path = tmp_path / 'stock_inventory.parquet'
+    write_stock(path, [chunk], dictionary_columns=('warehouse_name',))
+
+    table = pq.read_table(path)
+    assert pa.types.is_dictionary(table.schema.field('warehouse_name').type)
+    # Categorical columns outside dictionary_columns are decoded to plain strings
+    assert table.schema.field('stock_status').type == pa.string()
+    assert table.column('warehouse_name').to_pylist() == ['South', 'North', 'South', 'South']
+    assert table.column('stock_status').to_pylist() == ['in_stock', 'in_stock', 'out_of_stock', 'in_stock']
+
+
+def test_chunks_are_buffered_into_full_row_groups(tmp_path):
+    chunks = [
+        [{'id': row_id, 'product_id': row_id, 'warehouse_name': 'North', 'stock_quantity': 1}
+         for row_id in range(start, start + 3)]
+        for start in range(1, 13, 3)
+    ]
+    path = tmp_path / 'stock_inventory.parquet'
+    writer = write_stock(path, chunks, row_group_size=6)
+
+    parquet_file = pq.ParquetFile(path)
+    assert writer.rows_written == 12
+    assert [parquet_file.metadata.row_group(index).num_rows
+            for index in range(parquet_file.num_row_groups)] == [6, 6]
+    assert [row['id'] for chunk in ParquetTableWriter.read_chunks(str(path), 'stock_inventory', 4)
+            for row in chunk] == list(range(1, 13))
+
+
+def test_parquet_build_keeps_the_csv_values(config, tmp_path):
+    AutoGen(config).generate()
+    csv_rows = [row for chunk in AutoGen(config).read_table('stock_inventory') for row in chunk]
+
+    config['output'].update(format='parquet', folder=str(tmp_path / 'parquet'))
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+
+    table = pq.read_table(auto_gen.get_output_file('stock_inventory'))
+    assert pa.types.is_dictionary(table.schema.field('warehouse_name').type)
+    assert table.schema.field('stock_quantity').type == pa.int64()
+    assert [{name: str(value) for name, value in row.items()} for row in table.to_pylist()] == csv_rows
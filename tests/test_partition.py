@@ -0,0 +1,93 @@
+import copy
+import os
+
+import numpy as np
+from core import columnar
+from core.autogen import AutoGen
+from core.output import CsvTableWriter
+from core.partition import DEFAULT_PARTITION_KEYS, bucket_numbers, split_chunk
+from core.table import ColumnTable
+
+
+def partitioned(config, **options):
+    config = copy.deepcopy(config)
+    config['output']['partitioning'].update(enable=True, buckets=4, **options)
+    return config
+
+
+def rows_of(auto_gen, table_name):
+    return [{name: str(value) for name, value in row.items()}
+            for chunk in auto_gen.read_table(table_name) for row in chunk]
+
+
+def test_split_chunk_keeps_row_order_of_rows_and_columns():
+    ids = np.arange(1, 101, dtype=np.int64)
+    rows = [{'id': int(row_id), 'order_id': int(row_id) // 3} for row_id in ids]
+    columns = ColumnTable({'id': ids, 'order_id': ids // 3})
+
+    row_parts = split_chunk(rows, 'order_id', 4)
+    column_parts = split_chunk(columns, 'order_id', 4)
+
+    assert sorted(row_parts) == sorted(column_parts)
+    assert sum(len(part) for part in row_parts.values()) == 100
+    for bucket, part in row_parts.items():
+        assert [row['id'] for row in part] == column_parts[bucket]['id'].tolist()
+        assert (bucket_numbers(column_parts[bucket]['order_id'], 4) == bucket).all()
+
+
+def test_buckets_are_written_instead_of_table_files(config, tmp_path):
+    plain = AutoGen(config)
+    plain.generate()
+    config = partitioned(config)
+    config['output']['folder'] = str(tmp_path / 'partitioned')
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+
+    # Only the buckets are written, and together they hold every table in order
+    for table_name, key_name in DEFAULT_PARTITION_KEYS.items():
+        assert not os.path.exists(auto_gen.get_output_file(table_name))
+        assert rows_of(auto_gen, table_name) == rows_of(plain, table_name)
+
+        # Rows sharing a key, like a customer and their addresses, share a bucket
+        for bucket_file in auto_gen.partitioner.bucket_files(table_name):
+            bucket = int(os.path.basename(os.path.dirname(bucket_file)).split('=')[1])
+            for chunk in CsvTableWriter.read_chunks(bucket_file, table_name, 1000):
+                assert (bucket_numbers(columnar.chunk_column(chunk, key_name), 4) == bucket).all()
+
+
+def test_table_files_match_an_unpartitioned_build(config, build, tmp_path):
+    digests = build(config, 'plain')
+    assert build(partitioned(config, table_files=True), 'partitioned') == digests
+    assert os.listdir(tmp_path / 'outputs' / 'buckets' / 'customers')
+
+
+def test_sharded_buckets_merge_their_parts(config, tmp_path):
+    config['sharding'].update(enable=True, workers=1, shard_size=40)
+    plain = AutoGen(config)
+    plain.generate()
+
+    config = partitioned(config)
+    config['output']['folder'] = str(tmp_path / 'partitioned')
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+
+    for table_name in ('customers', 'customer_address', 'sale_order_web_items'):
+        bucket_files = auto_gen.partitioner.bucket_files(table_name)
+        assert not [path for path in bucket_files if os.path.basename(path).startswith('part-')]
+        assert rows_of(auto_gen, table_name) == rows_of(plain, table_name)
+
+
+def test_append_only_adds_rows_to_the_buckets(config):
+    config = partitioned(config)
+    AutoGen(config).generate()
+    auto_gen = AutoGen(config)
+    before = {path: open(path, 'rb').read() for path in auto_gen.partitioner.bucket_files('customers')}
+    count = len(rows_of(auto_gen, 'customers'))
+
+    auto_gen.append()
+
+    # Existing bucket rows are left as they are, with the new customers after them
+    for path, content in before.items():
+        assert open(path, 'rb').read().startswith(content)
+    ids = [int(row['id']) for row in rows_of(AutoGen(config), 'customers')]
+    assert ids == list(range(1, 2 * count + 1))
@@ -0,0 +1,109 @@
+import collections
+import random
+
+import numpy as np
+import pytest
+from core import sampling
+from core.autogen import AutoGen
+from core.sampling import AliasTable, build_sampler, distribution_weights
+
+
+DRAWS = 200_000
+
+
+def frequencies(sampler, size, seed=0):
+    """Share of DRAWS draws that landed on each position"""
+    picks = sampling.draw(np.random.default_rng(seed), sampler, size, DRAWS)
+    return np.bincount(picks, minlength=size) / DRAWS
+
+
+def expected(weights):
+    weights = np.asarray(weights, dtype=np.float64)
+    return weights / weights.sum()
+
+
+def test_alias_table_draws_follow_the_weights():
+    weights = [5, 0, 1, 3, 1]
+    shares = frequencies(AliasTable(weights), len(weights))
+
+    np.testing.assert_allclose(shares, expected(weights), atol=0.005)
+    # A zero weight is never drawn
+    assert shares[1] == 0
+
+
+def test_single_draws_follow_the_weights():
+    weights = [5, 0, 1, 3, 1]
+    table = AliasTable(weights)
+    rng = random.Random(0)
+    counts = collections.Counter(table.choice(rng) for _ in range(DRAWS))
+
+    np.testing.assert_allclose([counts[index] / DRAWS for index in range(len(weights))],
+                               expected(weights), atol=0.005)
+
+
+def test_zipf_weights_fall_with_rank():
+    weights = distribution_weights({'type': 'zipf', 's': 2}, 5)
+    np.testing.assert_allclose(weights, [1, 1 / 4, 1 / 9, 1 / 16, 1 / 25])
+
+    shares = frequencies(build_sampler('zipf', 50), 50)
+    np.testing.assert_allclose(shares, expected(distribution_weights('zipf', 50)), atol=0.005)
+    assert shares[0] > shares[1] > shares[10] > shares[49]
+
+
+def test_weighted_specs_take_weights_in_value_order_or_from_a_field():
+    spec = {'type': 'weighted', 'weights': [1, 2, 7]}
+    np.testing.assert_allclose(frequencies(build_sampler(spec, 3), 3), [0.1, 0.2, 0.7], atol=0.005)
+
+    records = [{'name': 'a', 'population': 10}, {'name': 'b'}, {'name': 'c', 'population': 30}]
+    assert distribution_weights({'type': 'weighted', 'field': 'population'}, 3, records).tolist() == [10, 0, 30]
+
+    with pytest.raises(ValueError, match='2 weights for 3 values'):
+        build_sampler({'type': 'weighted', 'weights': [1, 2]}, 3)
+
+
+def test_empirical_counts_are_matched_by_value():
+    values = ['red', 'green', 'blue', 'black']
+    spec = {'type': 'empirical', 'counts': {'blue': 6, 'red': 3}, 'default': 1}
+
+    assert distribution_weights(spec, 4, values).tolist() == [3, 1, 6, 1]
+    np.testing.assert_allclose(frequencies(build_sampler(spec, 4, values), 4), expected([3, 1, 6, 1]), atol=0.005)
+
+    with pytest.raises(ValueError, match='None of the values'):
+        build_sampler({'type': 'empirical', 'counts': {'white': 1}}, 4, values)
+    with pytest.raises(ValueError, match='needs fixture values'):
+        build_sampler({'type': 'empirical', 'counts': {'blue': 1}}, 4)
+
+
+def test_uniform_and_unknown_specs():
+    assert build_sampler(None, 4) is None
+    assert build_sampler('uniform', 4) is None
+    assert sorted(set(sampling.draw(np.random.default_rng(0), None, 4, 1000).tolist())) == [0, 1, 2, 3]
+
+    with pytest.raises(ValueError, match="Unknown distribution 'pareto'"):
+        build_sampler('pareto', 4)
+    with pytest.raises(ValueError, match='not all zero'):
+        AliasTable([0, 0])
+
+
+def test_sample_without_replacement_favours_heavy_values():
+    table = AliasTable([100, 0, 1, 1, 50])
+    rng = random.Random(3)
+    samples = [table.sample(rng, 3) for _ in range(2000)]
+
+    assert all(len(set(sample)) == 3 for sample in samples)
+    assert all(1 not in sample for sample in samples)
+    assert sum(0 in sample and 4 in sample for sample in samples) > 1900
+    # Zero-weight indices are only taken when k needs them
+    assert sorted(table.sample(rng, 5)) == [0, 1, 2, 3, 4]
+    assert table.sample(rng, 5)[-1] == 1
+
+
+def test_customer_distribution_config_skews_the_table(config):
+    config['customer']['entity']['limit'] = 2000
+    config['customer']['entity']['distribution'] = {'group': {'type': 'weighted', 'weights': [0, 1, 0, 3]}}
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+
+    groups = collections.Counter(row['group'] for chunk in auto_gen.read_table('customers') for row in chunk)
+    assert set(groups) == {'Wholesale', 'VIP'}
+    assert groups['VIP'] / 2000 == pytest.approx(0.75, abs=0.04)
@@ -0,0 +1,105 @@
+import threading
+
+import pytest
+from core.scheduler import StageScheduler
+
+
+def recording(calls, name, result=None):
+    """Stage function that records its name and arguments, returning result"""
+    def stage(*args):
+        calls.append((name, args))
+        return result
+
+    return stage
+
+
+def test_duplicate_stage_names_are_rejected():
+    scheduler = StageScheduler()
+    scheduler.add('category', lambda: None)
+    with pytest.raises(ValueError, match="already scheduled"):
+        scheduler.add('category', lambda: None)
+
+
+def test_unknown_needs_are_rejected():
+    scheduler = StageScheduler()
+    scheduler.add('product', lambda category: None, needs=('category',))
+    with pytest.raises(ValueError, match="unknown stage 'category'"):
+        scheduler.order()
+
+
+def test_unknown_after_stages_are_rejected():
+    scheduler = StageScheduler()
+    scheduler.add('stock_inventory', lambda: None, after=('product',))
+    with pytest.raises(ValueError, match="unknown stage 'product'"):
+        scheduler.run()
+
+
+def test_cycles_are_reported():
+    scheduler = StageScheduler()
+    scheduler.add('category', lambda: None)
+    scheduler.add('product', lambda orders: None, needs=('orders',))
+    scheduler.add('orders', lambda: None, after=('product',))
+    with pytest.raises(ValueError, match="cycle: product, orders"):
+        scheduler.order()
+
+
+def test_order_follows_dependencies_and_keeps_added_order_where_free():
+    scheduler = StageScheduler()
+    scheduler.add('orders', lambda product, customers: None, needs=('product', 'customers'))
+    scheduler.add('category', lambda: None)
+    scheduler.add('product', lambda: None, after=('category',))
+    scheduler.add('customers', lambda: None)
+
+    assert scheduler.order() == ['category', 'product', 'customers', 'orders']
+    assert scheduler.dependencies('product') == ('category',)
+    assert scheduler.dependencies('orders') == ('product', 'customers')
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_needs_pass_results_in_listed_order_and_after_only_waits(workers):
+    calls = []
+    scheduler = StageScheduler(workers)
+    scheduler.add('category', recording(calls, 'category', 'categories'))
+    scheduler.add('customers', recording(calls, 'customers', 'customer keys'))
+    scheduler.add('product', recording(calls, 'product', 'product keys'), after=('category',))
+    scheduler.add('orders', recording(calls, 'orders', 'orders'),
+                  needs=('customers', 'product'), after=('category',))
+
+    results = scheduler.run()
+
+    assert results == {'category': 'categories', 'customers': 'customer keys',
+                       'product': 'product keys', 'orders': 'orders'}
+    arguments = dict(calls)
+    assert arguments['product'] == ()
+    assert arguments['orders'] == ('customer keys', 'product keys')
+    names = [name for name, _ in calls]
+    assert names.index('category') < names.index('product') < names.index('orders')
+    assert names.index('customers') < names.index('orders')
+
+
+def test_independent_stages_run_at_the_same_time():
+    # Each stage waits for the other to start, so this only finishes if they overlap
+    barrier = threading.Barrier(2, timeout=5)
+    scheduler = StageScheduler(workers=2)
+    scheduler.add('customers', barrier.wait)
+    scheduler.add('product', barrier.wait)
+
+    assert set(scheduler.run()) == {'customers', 'product'}
+
+
+@pytest.mark.parametrize('workers', [1, 4])
+def test_failures_propagate_and_skip_downstream_stages(workers):
+    calls = []
+
+    def failing():
+        raise RuntimeError("product failed")
+
+    scheduler = StageScheduler(workers)
+    scheduler.add('category', recording(calls, 'category'))
+    scheduler.add('product', failing, after=('category',))
+    scheduler.add('stock_inventory', recording(calls, 'stock_inventory'), needs=('product',))
+    scheduler.add('orders', recording(calls, 'orders'), after=('stock_inventory',))
+
+    with pytest.raises(RuntimeError, match="product failed"):
+        scheduler.run()
+    assert [name for name, _ in calls] == ['category']
@@ -0,0 +1,88 @@
+import sqlite3
+
+import numpy as np
+from core.output.sqlite_writer import SqliteTableWriter
+from core.schema import get_schema
+from core.table import ColumnTable
+
+
+def schema_table(table_name):
+    return get_schema('schema/full_schema.xml').get_table(table_name)
+
+
+def load(database, table_name, chunks, **options):
+    with SqliteTableWriter(str(database), schema_table(table_name), **options) as writer:
+        for chunk in chunks:
+            writer.write_chunk(chunk)
+    return writer
+
+
+def table_info(database, table_name):
+    with sqlite3.connect(database) as connection:
+        return {name: (sql_type, primary_key) for _, name, sql_type, _, _, primary_key
+                in connection.execute(f'PRAGMA table_info("{table_name}")')}
+
+
+def index_columns(database, table_name):
+    with sqlite3.connect(database) as connection:
+        indexes = connection.execute(f'PRAGMA index_list("{table_name}")').fetchall()
+        return {
+            connection.execute(f'PRAGMA index_info("{index[1]}")').fetchone()[2]
+            for index in indexes if index[1].startswith('idx_')
+        }
+
+
+def customer(customer_id, group='General'):
+    return {'id': customer_id, 'email': f'c{customer_id}@example.com', 'group': group,
+            'dob': '1990-01-01', 'default_billing': customer_id, 'created_at': '2024-01-01 00:00:00'}
+
+
+def test_tables_are_created_from_the_schema(tmp_path):
+    database = tmp_path / 'dataset.sqlite'
+    load(database, 'customers', [[customer(1), customer(2, 'Wholesale')]])
+
+    columns = table_info(database, 'customers')
+    assert list(columns) == list(schema_table('customers').column_names)
+    assert columns['id'] == ('INTEGER', 1)
+    assert columns['default_billing'] == ('INTEGER', 0)
+    assert columns['email'] == ('TEXT', 0)
+    assert columns['dob'] == ('TEXT', 0)
+    # Keyword column names are quoted
+    with sqlite3.connect(database) as connection:
+        assert connection.execute('SELECT "group" FROM customers ORDER BY id').fetchall() == \
+            [('General',), ('Wholesale',)]
+
+
+def test_id_columns_are_indexed_after_the_load(tmp_path):
+    database = tmp_path / 'dataset.sqlite'
+    rows = [{'id': row_id, 'order_id': row_id // 2, 'product_id': row_id % 3, 'price': 1.5}
+            for row_id in range(1, 11)]
+    load(database, 'sale_order_web_items', [rows])
+
+    assert index_columns(database, 'sale_order_web_items') == {'order_id', 'product_id'}
+    assert table_info(database, 'sale_order_web_items')['price'] == ('REAL', 0)
+
+
+def test_configured_index_columns_replace_the_default(tmp_path):
+    database = tmp_path / 'dataset.sqlite'
+    rows = [{'id': 1, 'order_id': 1, 'product_id': 2, 'price': 1.5}]
+    load(database, 'sale_order_web_items', [rows], index_columns=['price', 'missing'])
+
+    assert index_columns(database, 'sale_order_web_items') == {'price'}
+
+
+def test_tables_share_one_database_and_appends_keep_rows(tmp_path):
+    database = tmp_path / 'dataset.sqlite'
+    load(database, 'customers', [[customer(1), customer(2)]])
+    load(database, 'customer_address', [ColumnTable({'id': np.array([1, 2]), 'customer_id': np.array([1, 1])})])
+
+    with SqliteTableWriter(str(database), schema_table('customers'), append=True) as writer:
+        writer.write_chunk([customer(3)])
+    assert SqliteTableWriter.high_water_mark(str(database), 'customers') == (3, 3)
+    assert SqliteTableWriter.high_water_mark(str(database), 'customer_address') == (2, 2)
+
+    # Without append the table is loaded again from scratch
+    load(database, 'customers', [[customer(7)]])
+    assert [row['id'] for chunk in SqliteTableWriter.read_chunks(str(database), 'customers', 10)
+            for row in chunk] == [7]
+    assert SqliteTableWriter.high_water_mark(str(database), 'sale_order_web') == (0, 0)
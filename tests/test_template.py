@@ -0,0 +1,50 @@
+import os
+
+import numpy as np
+import pytest
+from core.autogen import AutoGen
+from core.catalog.product.configurable import ConfigurableProductGenerator
+from core.catalog.product.template import NameTemplate, TemplateError
+
+
+def test_unknown_placeholders_are_rejected():
+    with pytest.raises(TemplateError, match=r"\{\{colour\}\} in rule 'Shirt'; known attributes: brand, size"):
+        NameTemplate('{{brand}} {{colour}} Shirt', ['brand', 'size'], 'Shirt')
+    # TemplateError is a ValueError, so callers catching bad config still see it
+    with pytest.raises(ValueError):
+        NameTemplate('{{brand}} Shirt', [], 'Shirt')
+
+
+@pytest.mark.parametrize('template', ['{{brand} Shirt', '{{brand}} Shirt}}', '{{ brand }} Shirt'])
+def test_malformed_placeholders_are_rejected(template):
+    with pytest.raises(TemplateError, match='Malformed placeholder'):
+        NameTemplate(template, ['brand'])
+
+
+def test_placeholders_are_not_checked_without_attribute_names():
+    template = NameTemplate('{{brand}} {{colour}} Shirt')
+
+    assert template.fields == ('brand', 'colour')
+    # A placeholder without a value is kept as written
+    assert template.render({'brand': 'Acme'}) == 'Acme {{colour}} Shirt'
+
+
+def test_render_columns_matches_render():
+    template = NameTemplate(' {{brand}} {size} {{size}} Shirt ', ['brand', 'size'])
+    columns = {'brand': np.array(['Acme', 'Zen', 'Acme'], dtype=object), 'size': np.array([38, 40, 42])}
+
+    names = template.render_columns(columns, 3)
+    assert names.tolist() == [template.render({'brand': brand, 'size': size})
+                              for brand, size in zip(columns['brand'], columns['size'])]
+    # Single braces are literal text
+    assert names[0] == 'Acme {size} 38 Shirt'
+
+
+def test_a_bad_rule_fails_before_any_rows_are_written(config):
+    config['catalog']['product']['configurable']['rules'][0]['rule'] = '{{brand}} {{colour}} Bag'
+
+    with pytest.raises(TemplateError, match="rule 'Bag'"):
+        ConfigurableProductGenerator(config)
+    with pytest.raises(TemplateError):
+        AutoGen(config).generate()
+    assert not os.path.exists(AutoGen(config).get_output_file('product'))
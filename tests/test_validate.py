@@ -0,0 +1,101 @@
+import copy
+
+import numpy as np
+import pytest
+from core.autogen import AutoGen
+from core.validate import IdSet, IntegrityValidator
+
+
+def validator(config, **options):
+    config = copy.deepcopy(config)
+    config['validation'].update(enable=True, foreign_keys=[], **options)
+    return IntegrityValidator(config)
+
+
+def tables_of(**tables):
+    """read_table over in-memory tables, each streamed as chunks of two rows"""
+    def read_table(table_name):
+        rows = tables[table_name]
+        for start in range(0, len(rows), 2):
+            yield rows[start:start + 2]
+
+    return list(tables), read_table
+
+
+def customers_and_addresses(default_billing=(1, 3), address_customers=(1, 1, 2)):
+    customers = [
+        {'id': customer_id, 'default_billing': billing, 'default_shipping': billing}
+        for customer_id, billing in zip((1, 2), default_billing)
+    ]
+    addresses = [
+        {'id': address_id, 'customer_id': customer_id}
+        for address_id, customer_id in enumerate(address_customers, start=1)
+    ]
+    return tables_of(customers=customers, customer_address=addresses)
+
+
+def test_id_set_reports_repeated_ids():
+    id_set = IdSet()
+    assert id_set.add(np.array([1, 2, 70000], dtype=np.int64)).tolist() == []
+    assert sorted(id_set.add(np.array([2, 3, 3, 70000], dtype=np.int64)).tolist()) == [2, 3, 70000]
+    assert id_set.contains(np.array([1, 3, 4, 70000, 140000], dtype=np.int64)).tolist() == \
+        [True, True, False, True, False]
+    assert id_set.count == 4
+
+
+def test_valid_tables_have_no_violations(config):
+    report = validator(config).validate(*customers_and_addresses())
+
+    assert report['violations'] == 0
+    assert all(check['checked'] for check in report['keys'])
+
+
+def test_duplicate_ids_are_violations(config):
+    table_names, read_table = tables_of(category=[{'id': 1, 'parent_id': 0}, {'id': 2, 'parent_id': 1},
+                                                  {'id': 2, 'parent_id': 1}])
+    report = validator(config).validate(table_names, read_table)
+
+    assert report['tables']['category']['duplicate_ids'] == 1
+    assert report['tables']['category']['duplicate_samples'] == [2]
+    assert report['violations'] == 1
+
+
+def test_orphan_foreign_keys_are_sampled(config):
+    # Address 3 belongs to customer 3, who does not exist
+    report = validator(config).validate(*customers_and_addresses(address_customers=(1, 1, 3)))
+
+    check = next(check for check in report['keys'] if check['check'] == 'customer_address.customer_id -> customers.id')
+    assert check['orphans'] == 1
+    assert check['samples'] == [{'id': 3, 'customer_id': 3}]
+
+
+def test_default_address_of_another_customer_is_a_pair_violation(config):
+    # Customer 2's default address 2 exists, but belongs to customer 1
+    table_names, read_table = customers_and_addresses(default_billing=(1, 2))
+    report = validator(config).validate(table_names, read_table)
+
+    pair_checks = [check for check in report['keys'] if check['orphans']]
+    assert {check['check'] for check in pair_checks} == {
+        'customers(id, default_billing) -> customer_address(customer_id, id)',
+        'customers(id, default_shipping) -> customer_address(customer_id, id)',
+    }
+    assert report['violations'] == 2
+
+    # Without pair checks only the plain foreign keys are checked, and those hold
+    assert validator(config, pairs=False).validate(table_names, read_table)['violations'] == 0
+
+
+def test_strict_validation_raises(config):
+    table_names, read_table = customers_and_addresses(default_billing=(1, 9))
+    with pytest.raises(ValueError):
+        validator(config, strict=True).validate(table_names, read_table)
+
+
+def test_built_tables_have_valid_keys(config):
+    config['validation']['enable'] = True
+    auto_gen = AutoGen(config)
+    auto_gen.generate()
+
+    report = auto_gen.validate()
+    assert report['violations'] == 0
+    assert not report['skipped_keys']
@@ -0,0 +1,80 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+from core.catalog.product.variants import VariantSpace
+
+
+def space():
+    return VariantSpace(('brand', 'color', 'size'), [['Acme', 'Zen'], ['red', 'green', 'blue'], ['S', 'M', 'L', 'XL']])
+
+
+def test_indices_decode_in_itertools_product_order():
+    variants = space()
+    expected = [dict(zip(variants.attr_names, values)) for values in itertools.product(*variants.value_lists)]
+
+    assert len(variants) == 24
+    assert list(variants) == expected
+    assert [variants.combination(index) for index in range(len(variants))] == expected
+    # The last attribute varies fastest: index 7 is brand 0, color 1, size 3
+    assert variants.combination(7) == {'brand': 'Acme', 'color': 'green', 'size': 'XL'}
+
+
+def test_columns_decode_many_indices_at_once():
+    variants = space()
+    indices = np.array([23, 0, 7, 13])
+    columns = variants.columns(indices)
+
+    assert list(columns) == ['brand', 'color', 'size']
+    for position, index in enumerate(indices.tolist()):
+        assert {name: values[position] for name, values in columns.items()} == variants.combination(index)
+
+
+def test_out_of_range_indices_are_rejected():
+    with pytest.raises(IndexError):
+        space().combination(24)
+    with pytest.raises(IndexError):
+        space().combination(-1)
+
+
+def test_whole_space_is_enumerated_in_slices():
+    slices = list(space().indices(slice_size=10))
+
+    assert [len(indices) for indices in slices] == [10, 10, 4]
+    assert np.concatenate(slices).tolist() == list(range(24))
+    # A limit covering the whole space enumerates it too
+    assert np.concatenate(list(space().indices(random.Random(0), 30))).tolist() == list(range(24))
+
+
+def test_max_variants_samples_distinct_indices_in_order():
+    slices = list(space().indices(random.Random(1), 5))
+
+    assert len(slices) == 1
+    sample = slices[0].tolist()
+    assert len(set(sample)) == 5
+    assert sample == sorted(sample)
+    assert all(0 <= index < 24 for index in sample)
+    # The draw follows the seed
+    assert list(space().indices(random.Random(1), 5))[0].tolist() == sample
+
+
+def test_sampling_a_huge_space_never_enumerates_it():
+    # 15 attributes of 10 values: far too many combinations to list
+    variants = VariantSpace([f'attr{n}' for n in range(15)], [[str(value) for value in range(10)]] * 15)
+    (sample,) = variants.indices(random.Random(0), 3)
+
+    assert len(variants) == 10 ** 15
+    assert len(sample) == 3
+    for index in sample.tolist():
+        combination = variants.combination(index)
+        assert ''.join(combination[f'attr{n}'] for n in range(15)) == f'{index:015d}'
+
+
+def test_items_pair_indices_with_their_combinations():
+    variants = space()
+    items = list(variants.items(random.Random(2), 4))
+
+    assert len(items) == 4
+    for index, combination in items:
+        assert combination == variants.combination(index)
@@ -0,0 +1,18 @@
+import json
+import sys
+
+from core.autogen import AutoGen
+
+
+def main():
+    """Check the keys of the tables already in the output folder"""
+    with open('config.json', 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    report = AutoGen(config).validate()
+    if report['violations']:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()